@@ -1,20 +1,75 @@
+import threading
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
-from flask_jwt_extended import JWTManager
 from flask_cors import CORS
 from flask_caching import Cache
-from celery import Celery
+from werkzeug.local import LocalProxy
+from app.utils.jwt_manager import BatchJWTManager
 
 # 初始化扩展
 db = SQLAlchemy()
 migrate = Migrate()
-jwt = JWTManager()
+jwt = BatchJWTManager()
 cors = CORS()
 cache = Cache()
-celery = Celery()
+
+# Celery在首次使用时才导入和创建（Web worker大多不需要加载Celery）
+_celery = None
+_celery_app = None
+_celery_lock = threading.Lock()
+
+def _bind_celery(instance, app):
+    """用Flask应用的配置和上下文初始化Celery实例"""
+    from app.utils.tracing import task_span, connect_celery_signals
+    instance.conf.update(app.config)
+    # Celery 5只识别小写配置名
+    instance.conf.update(
+        broker_url=app.config.get('CELERY_BROKER_URL'),
+        result_backend=app.config.get('CELERY_RESULT_BACKEND'),
+        task_always_eager=app.config.get('CELERY_TASK_ALWAYS_EAGER', False),
+        task_eager_propagates=app.config.get('CELERY_TASK_ALWAYS_EAGER', False),
+        # Web请求中提交任务时，broker不可用应尽快失败，而不是按默认策略反复重连
+        broker_connection_timeout=app.config.get('CELERY_BROKER_CONNECTION_TIMEOUT', 2),
+        broker_transport_options={'max_retries': app.config.get('CELERY_BROKER_PUBLISH_MAX_RETRIES', 0)}
+    )
+    
+    class ContextTask(instance.Task):
+        def __call__(self, *args, **kwargs):
+            # 已注册的任务保留定义时的基类，因此每次执行时取最近绑定的应用
+            with (_celery_app or app).app_context():
+                with task_span(self):
+                    return self.run(*args, **kwargs)
+    
+    instance.Task = ContextTask
+    connect_celery_signals()
+
+def get_celery():
+    """获取Celery实例，首次调用时创建并绑定到最近创建的应用"""
+    global _celery
+    if _celery is None:
+        with _celery_lock:
+            if _celery is None:
+                from celery import Celery
+                instance = Celery()
+                if _celery_app is not None:
+                    _bind_celery(instance, _celery_app)
+                _celery = instance
+    return _celery
+
+celery = LocalProxy(get_celery)
+
+def reset_after_fork(app):
+    """fork后在子进程中调用：丢弃从父进程继承的数据库和Redis连接"""
+    from app.utils import helpers, media
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+    helpers.redis_client = None
+    media.reset_pool()
 
 def create_app(config_name='default'):
+    global _celery_app
     app = Flask(__name__)
     
     # 加载配置
@@ -28,6 +83,23 @@ def create_app(config_name='default'):
     cors.init_app(app)
     cache.init_app(app)
     
+    # 请求指标与SQL监控
+    from app.utils.sql_events import init_sql_events
+    from app.utils.metrics import init_metrics
+    from app.utils.query_guard import init_query_guard
+    from app.utils.slow_query import init_slow_query_log
+    from app.utils.profiler import init_profiler
+    from app.utils.tracing import init_tracing
+    from app.utils.memory_profiler import init_memory_profiler
+    init_sql_events(app, db)
+    init_tracing(app)
+    init_metrics(app)
+    # 性能分析的权限校验查询不计入语句预算，需先于query_guard注册
+    init_profiler(app)
+    init_query_guard(app)
+    init_slow_query_log(app)
+    init_memory_profiler(app)
+    
     # JWT错误处理
     @jwt.expired_token_loader
     def expired_token_callback(jwt_header, jwt_payload):
@@ -55,15 +127,10 @@ def create_app(config_name='default'):
         app.logger.error(f"Authorization头内容: {auth_header}")
         return {'code': 422, 'message': '缺少JWT token'}, 422
     
-    # 初始化Celery
-    celery.conf.update(app.config)
-    
-    class ContextTask(celery.Task):
-        def __call__(self, *args, **kwargs):
-            with app.app_context():
-                return self.run(*args, **kwargs)
-    
-    celery.Task = ContextTask
+    # 初始化Celery（已创建过的实例重新绑定到本应用，否则延迟到首次使用）
+    _celery_app = app
+    if _celery is not None:
+        _bind_celery(_celery, app)
     
     # 注册蓝图
     from app.views.auth import auth_bp
@@ -72,6 +139,12 @@ def create_app(config_name='default'):
     from app.views.hospital import hospital_bp
     from app.views.health import health_bp
     from app.views.service_package import service_package_bp
+    from app.views.metrics import metrics_bp
+    from app.views.admin import admin_bp
+    from app.views.batch import batch_bp
+    from app.views.sync import sync_bp
+    from app.views.upload import upload_bp
+    from app.views.media import media_bp
     
     app.register_blueprint(auth_bp)
     app.register_blueprint(patient_bp)
@@ -79,5 +152,11 @@ def create_app(config_name='default'):
     app.register_blueprint(hospital_bp)
     app.register_blueprint(health_bp)
     app.register_blueprint(service_package_bp)
+    app.register_blueprint(metrics_bp)
+    app.register_blueprint(admin_bp)
+    app.register_blueprint(batch_bp)
+    app.register_blueprint(sync_bp)
+    app.register_blueprint(upload_bp)
+    app.register_blueprint(media_bp)
     
     return app
\ No newline at end of file
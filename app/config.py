@@ -1,4 +1,5 @@
 import os
+import tempfile
 from datetime import timedelta
 
 class Config:
@@ -14,17 +15,121 @@ class Config:
     
     # Redis配置
     REDIS_URL = os.environ.get('REDIS_URL') or 'redis://localhost:6379/0'
+    REDIS_SOCKET_TIMEOUT = 2  # 秒，避免Redis故障时请求长时间阻塞
     
     # 文件上传配置
     UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER') or 'uploads'
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB
     
+    # 健康记录照片的派生图（后台任务生成）：名称 -> 最长边像素，输出格式与质量；在多少个子进程中解码（0为在当前进程处理）
+    MEDIA_IMAGE_VARIANTS = {'thumb': 300, 'medium': 800, 'display': 1600}
+    MEDIA_VARIANT_FORMAT = 'WEBP'
+    MEDIA_VARIANT_QUALITY = 80
+    MEDIA_IMAGE_WORKERS = int(os.environ.get('MEDIA_IMAGE_WORKERS', 2))
+    # 提交媒体处理任务失败后，本进程在该秒数内不再连接broker；
+    # 创建超过该分钟数仍在处理中的文件由 flask dispatch_pending_media 重新提交（需大于录音转码的最长时间）
+    MEDIA_DISPATCH_BACKOFF_SECONDS = 30
+    MEDIA_REDISPATCH_AFTER_MINUTES = 15
+    
+    # 录音转码（后台任务，调用本地ffmpeg）：编码方案opus/aac、码率、采样率；原始录音在转码后保留的天数（None为永久保留，0为转码后立即删除）
+    AUDIO_TRANSCODE_CODEC = os.environ.get('AUDIO_TRANSCODE_CODEC') or 'opus'
+    AUDIO_TRANSCODE_BITRATE = '24k'
+    AUDIO_TRANSCODE_SAMPLE_RATE = 16000
+    AUDIO_ORIGINAL_RETENTION_DAYS = 30
+    FFMPEG_BINARY = os.environ.get('FFMPEG_BINARY') or 'ffmpeg'
+    FFPROBE_BINARY = os.environ.get('FFPROBE_BINARY') or 'ffprobe'
+    
+    # 上传文件下载：交给前端代理发送文件（为空时由Flask发送，x-accel为nginx的X-Accel-Redirect，x-sendfile为Apache/lighttpd）、
+    # X-Accel-Redirect指向的nginx内部location、浏览器缓存秒数（文件名唯一且内容不再改变）
+    MEDIA_SENDFILE = os.environ.get('MEDIA_SENDFILE') or None
+    MEDIA_ACCEL_PREFIX = '/_protected_uploads/'
+    MEDIA_CACHE_MAX_AGE = 365 * 24 * 3600
+    # 签名下载URL的有效秒数：<img>、<audio>无法设置请求头时使用，URL会出现在访问日志中，只对单个文件有效且应尽量短
+    # （录音拖动进度时会再次请求，需覆盖一次播放的时长）
+    MEDIA_SIGNED_URL_EXPIRES = int(os.environ.get('MEDIA_SIGNED_URL_EXPIRES', 3600))
+    
+    # 分片续传：单个文件最大字节数、建议客户端使用的分片大小（需小于MAX_CONTENT_LENGTH）、未完成上传的保留小时数、临时文件目录（默认为上传目录下的.incoming）
+    UPLOAD_SESSION_MAX_SIZE = 200 * 1024 * 1024
+    UPLOAD_CHUNK_SIZE = 2 * 1024 * 1024
+    UPLOAD_SESSION_TTL_HOURS = 24
+    UPLOAD_TEMP_FOLDER = os.environ.get('UPLOAD_TEMP_FOLDER')
+    
+    # 内容寻址存储：不超过该字节数的上传在内存中计算摘要，内容已存在时不写磁盘；无引用对象在写入多少秒后才可被清理
+    STORAGE_SPOOL_MAX_BYTES = 4 * 1024 * 1024
+    STORAGE_GC_GRACE_SECONDS = 3600
+    
     # Celery配置
     CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL') or 'redis://localhost:6379/0'
     CELERY_RESULT_BACKEND = os.environ.get('CELERY_RESULT_BACKEND') or 'redis://localhost:6379/0'
+    CELERY_TASK_ALWAYS_EAGER = False  # 为True时任务在调用处同步执行（测试用）
+    # 提交任务时连接broker的超时秒数和重试次数（在Web请求中提交，broker不可用时不能长时间阻塞）
+    CELERY_BROKER_CONNECTION_TIMEOUT = 2
+    CELERY_BROKER_PUBLISH_MAX_RETRIES = 0
+    
+    # 监控指标配置（多进程部署时需设置PROMETHEUS_MULTIPROC_DIR环境变量）
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+    
+    # N+1查询检测：同一请求内同结构语句超过阈值时的处理方式（None/'log'/'raise'）
+    N_PLUS_ONE_THRESHOLD = 10
+    N_PLUS_ONE_ACTION = None
+    
+    # 慢查询日志：超过阈值（毫秒）的语句记录到环形缓冲区，可选写入JSONL文件
+    SLOW_QUERY_THRESHOLD_MS = float(os.environ.get('SLOW_QUERY_THRESHOLD_MS', 200))
+    SLOW_QUERY_BUFFER_SIZE = 1000
+    SLOW_QUERY_LOG_FILE = os.environ.get('SLOW_QUERY_LOG_FILE')
+    SLOW_QUERY_EXPLAIN = True
+    
+    # 按需性能分析：管理员请求携带 X-Profile: sample|trace 头时生效
+    PROFILE_DIR = os.environ.get('PROFILE_DIR') or os.path.join(tempfile.gettempdir(), 'recorder_profiles')
+    PROFILE_STORE_SIZE = 50
+    PROFILE_SAMPLE_INTERVAL_MS = 5
+    
+    # 调用链追踪：配置导出文件后按OTLP JSON格式逐行写入span
+    TRACE_EXPORT_FILE = os.environ.get('TRACE_EXPORT_FILE')
+    TRACE_SERVICE_NAME = 'recorder-server'
+    
+    # 请求内存分析（tracemalloc，有额外开销，按需开启）
+    # 峰值是进程级统计：同一时刻只采样一个请求，其他并发请求不计入报告；
+    # 多线程部署时被采样请求的峰值仍可能包含并发请求的分配，单线程worker下才是精确值
+    MEMORY_PROFILING_ENABLED = os.environ.get('MEMORY_PROFILING_ENABLED', 'false').lower() == 'true'
+    MEMORY_PROFILING_SAMPLE_RATE = float(os.environ.get('MEMORY_PROFILING_SAMPLE_RATE', 0.1))
+    MEMORY_PROFILING_FRAMES = 1
+    MEMORY_PROFILING_TOP_N = 10
+    
+    # 健康检查：就绪探测结果缓存时间与单项检查超时（秒）
+    HEALTH_CACHE_SECONDS = 5
+    HEALTH_CHECK_TIMEOUT = 2
+    
+    # 家庭批量导入：每批插入的家庭数、同步处理的最大上传大小（超过则转为后台任务）、保留的错误行数
+    FAMILY_IMPORT_CHUNK_SIZE = 200
+    FAMILY_IMPORT_SYNC_MAX_BYTES = 256 * 1024
+    FAMILY_IMPORT_MAX_ERRORS = 1000
+    
+    # 周期预约：记录员每日可排预约的时间段、冲突时顺延的步长和未指定结束时间时的默认时长（分钟）
+    APPOINTMENT_WORKDAY_START = '08:00'
+    APPOINTMENT_WORKDAY_END = '18:00'
+    APPOINTMENT_SLOT_MINUTES = 30
+    APPOINTMENT_DEFAULT_DURATION_MINUTES = 60
+    
+    # 批量请求：单次最多子请求数、并行处理只读子请求的线程数（1表示不并行）
+    BATCH_MAX_REQUESTS = 20
+    BATCH_MAX_WORKERS = 4
+    
+    # 增量同步：默认/最大分页条数、只返回早于当前时间若干秒的变更（等待并发事务提交）、墓碑保留天数、响应压缩阈值（字节）
+    SYNC_PAGE_SIZE = 500
+    SYNC_MAX_PAGE_SIZE = 1000
+    SYNC_SAFETY_LAG_SECONDS = 2
+    SYNC_TOMBSTONE_RETENTION_DAYS = 90
+    SYNC_COMPRESS_MIN_BYTES = 1024
+    
+    # 幂等键：创建接口的第一次响应保留多久（秒），期间用同一个 Idempotency-Key 重试直接返回该响应
+    IDEMPOTENCY_KEY_TTL_SECONDS = 24 * 3600
+    # 处理中的幂等键超过该秒数未完成（处理请求的worker被超时终止、OOM等）时，允许重试接管；需大于gunicorn的timeout
+    IDEMPOTENCY_PROCESSING_TIMEOUT = 120
 
 class DevelopmentConfig(Config):
     DEBUG = True
+    N_PLUS_ONE_ACTION = 'log'
 
 class ProductionConfig(Config):
     DEBUG = False
@@ -32,10 +137,22 @@ class ProductionConfig(Config):
 class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    N_PLUS_ONE_ACTION = 'raise'
+    CELERY_TASK_ALWAYS_EAGER = True
+    SYNC_SAFETY_LAG_SECONDS = 0
+    MEDIA_IMAGE_WORKERS = 0
+
+class BenchmarkConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = os.environ.get('BENCHMARK_DATABASE_URL') or \
+        'sqlite:///' + os.path.join(tempfile.gettempdir(), 'recorder_benchmark.db')
+    METRICS_ENABLED = False
+    SLOW_QUERY_EXPLAIN = False
 
 config = {
     'development': DevelopmentConfig,
     'production': ProductionConfig,
     'testing': TestingConfig,
+    'benchmark': BenchmarkConfig,
     'default': DevelopmentConfig
 }
\ No newline at end of file
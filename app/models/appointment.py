@@ -27,6 +27,7 @@ class ServicePackage(db.Model):
     is_active = db.Column(db.Boolean, default=True)
     is_system_default = db.Column(db.Boolean, default=False)  # 是否为系统默认套餐
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     # 关系
     subscriptions = db.relationship('PatientSubscription', backref='package')
@@ -84,11 +85,16 @@ class PatientSubscription(db.Model):
 
 class Appointment(db.Model):
     __tablename__ = 'appointments'
+    __table_args__ = (
+        # 记录员日程冲突检查和按日期范围加载日程
+        db.Index('ix_appointments_recorder_schedule', 'recorder_id', 'scheduled_date', 'start_time', 'end_time'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     patient_id = db.Column(db.Integer, db.ForeignKey('patients.id'), nullable=False)
     recorder_id = db.Column(db.Integer, db.ForeignKey('recorders.id'), nullable=False)
     service_type_id = db.Column(db.Integer, db.ForeignKey('service_types.id'))  # 新增：服务类型外键
+    series_id = db.Column(db.Integer, db.ForeignKey('appointment_series.id'), index=True)  # 由订阅生成的周期预约
     scheduled_date = db.Column(db.Date, nullable=False)
     start_time = db.Column(db.Time, nullable=False)  # 重命名：开始时间
     end_time = db.Column(db.Time)  # 新增：结束时间
@@ -96,7 +102,7 @@ class Appointment(db.Model):
     status = db.Column(db.Enum('scheduled', 'confirmed', 'completed', 'cancelled', 'rescheduled'), default='scheduled')  # 新增confirmed和rescheduled状态
     notes = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     # 关系
     health_record = db.relationship('HealthRecord', backref='appointment', uselist=False)
@@ -117,6 +123,7 @@ class Appointment(db.Model):
             'patient_id': self.patient_id,
             'recorder_id': self.recorder_id,
             'service_type_id': self.service_type_id,
+            'series_id': self.series_id,
             'scheduled_date': self.scheduled_date.isoformat() if self.scheduled_date else None,
             'start_time': self.start_time.isoformat() if self.start_time else None,
             'end_time': self.end_time.isoformat() if self.end_time else None,
@@ -159,6 +166,46 @@ class Appointment(db.Model):
         
         return result
 
+class AppointmentSeries(db.Model):
+    """周期预约：按订阅套餐的服务频率（次/月）在订阅期内批量生成的预约"""
+    __tablename__ = 'appointment_series'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    subscription_id = db.Column(db.Integer, db.ForeignKey('patient_subscriptions.id'), nullable=False, index=True)
+    patient_id = db.Column(db.Integer, db.ForeignKey('patients.id'), nullable=False)
+    recorder_id = db.Column(db.Integer, db.ForeignKey('recorders.id'), nullable=False)
+    service_type_id = db.Column(db.Integer, db.ForeignKey('service_types.id'))
+    start_date = db.Column(db.Date, nullable=False)
+    end_date = db.Column(db.Date, nullable=False)
+    visits_per_month = db.Column(db.Integer, nullable=False)
+    start_time = db.Column(db.Time, nullable=False)  # 首选上门时间，冲突时顺延
+    duration_minutes = db.Column(db.Integer, nullable=False)
+    notes = db.Column(db.Text)
+    status = db.Column(db.Enum('active', 'cancelled'), default='active')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # 关系
+    appointments = db.relationship('Appointment', backref='series', order_by='Appointment.scheduled_date')
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'subscription_id': self.subscription_id,
+            'patient_id': self.patient_id,
+            'recorder_id': self.recorder_id,
+            'service_type_id': self.service_type_id,
+            'start_date': self.start_date.isoformat() if self.start_date else None,
+            'end_date': self.end_date.isoformat() if self.end_date else None,
+            'visits_per_month': self.visits_per_month,
+            'start_time': self.start_time.strftime('%H:%M') if self.start_time else None,
+            'duration_minutes': self.duration_minutes,
+            'notes': self.notes,
+            'status': self.status,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
 class ServiceType(db.Model):
     __tablename__ = 'service_types'
     
@@ -200,7 +247,7 @@ class Payment(db.Model):
     refund_reason = db.Column(db.Text)
     notes = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     def to_dict(self):
         return {
@@ -17,13 +17,17 @@ class HealthRecord(db.Model):
     vital_signs = db.Column(db.Text)  # JSON格式存储生命体征
     symptoms = db.Column(db.Text)  # 症状记录
     notes = db.Column(db.Text)  # 记录员备注
-    audio_file = db.Column(db.String(255))  # 录音文件URL
+    audio_file = db.Column(db.String(255))  # 录音文件URL（转码完成后为转码文件）
+    audio_duration_seconds = db.Column(db.Float)  # 录音时长，后台处理后写入
+    audio_size_bytes = db.Column(db.Integer)  # audio_file指向文件的字节数
     photos = db.Column(db.Text)  # JSON格式存储照片URLs
     patient_signature = db.Column(db.String(255))  # 患者签名图片URL
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # 关系
     medical_orders = db.relationship('MedicalOrder', backref='health_record')
+    media = db.relationship('MediaFile', backref='health_record', lazy=True, cascade='all, delete-orphan',
+                            order_by='MediaFile.id')
     
     def get_vital_signs(self):
         return json.loads(self.vital_signs) if self.vital_signs else {}
@@ -52,11 +56,53 @@ class HealthRecord(db.Model):
             'symptoms': self.symptoms,
             'notes': self.notes,
             'audio_file': self.audio_file,
+            'audio_duration_seconds': self.audio_duration_seconds,
+            'audio_size_bytes': self.audio_size_bytes,
             'photos': self.get_photos(),
             'patient_signature': self.patient_signature,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
+class MediaFile(db.Model):
+    """健康记录的上传文件，缩略图和元数据由后台任务生成"""
+    __tablename__ = 'media_files'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    health_record_id = db.Column(db.Integer, db.ForeignKey('health_records.id'), nullable=False, index=True)
+    kind = db.Column(db.Enum('audio', 'photo', 'signature'), nullable=False)
+    url = db.Column(db.String(255), nullable=False)  # 原始文件URL；原始录音按保留策略删除后为转码文件URL
+    storage_key = db.Column(db.String(64), index=True)  # URL中的文件标识，派生文件与原文件相同，下载时用于权限校验
+    thumbnail_url = db.Column(db.String(255))
+    variants = db.Column(db.Text)  # JSON格式存储各尺寸派生图：{名称: {url, width, height, bytes}}
+    status = db.Column(db.Enum('processing', 'ready', 'failed'), default='processing')
+    size_bytes = db.Column(db.Integer)
+    media_metadata = db.Column(db.Text)  # JSON格式存储宽高、格式、时长等
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    processed_at = db.Column(db.DateTime)
+    original_expires_at = db.Column(db.DateTime, index=True)  # 原始录音的删除时间，为空表示不删除
+    
+    def get_metadata(self):
+        return json.loads(self.media_metadata) if self.media_metadata else {}
+    
+    def get_variants(self):
+        return json.loads(self.variants) if self.variants else {}
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'url': self.url,
+            'thumbnail_url': self.thumbnail_url,
+            'variants': self.get_variants(),
+            'status': self.status,
+            'size_bytes': self.size_bytes,
+            'metadata': self.get_metadata(),
+            'error': self.error,
+            'processed_at': self.processed_at.isoformat() if self.processed_at else None,
+            'original_expires_at': self.original_expires_at.isoformat() if self.original_expires_at else None
+        }
+
 class MedicalOrder(db.Model):
     __tablename__ = 'medical_orders'
     
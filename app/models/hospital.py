@@ -13,6 +13,7 @@ class PartnerHospital(db.Model):
     departments = db.Column(db.Text)  # JSON格式存储科室信息
     cooperation_status = db.Column(db.Enum('active', 'inactive', 'suspended'), default='active')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     # 关系
     departments_rel = db.relationship('HospitalDepartment', backref='hospital', cascade='all, delete-orphan')
@@ -46,6 +47,7 @@ class HospitalDepartment(db.Model):
     description = db.Column(db.Text)
     available_times = db.Column(db.Text)  # JSON格式存储可预约时间段
     is_active = db.Column(db.Boolean, default=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     # 关系
     doctors = db.relationship('HospitalDoctor', backref='department')
@@ -79,6 +81,7 @@ class HospitalDoctor(db.Model):
     schedule = db.Column(db.Text)  # JSON格式存储出诊时间
     consultation_fee = db.Column(db.Numeric(8,2))
     is_available = db.Column(db.Boolean, default=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     # 关系
     appointments = db.relationship('HospitalAppointment', backref='doctor')
@@ -0,0 +1,18 @@
+from app import db
+from datetime import datetime
+
+class IdempotencyKey(db.Model):
+    """创建接口的幂等键：记录第一次请求的响应，重试时直接返回"""
+    __tablename__ = 'idempotency_keys'
+    __table_args__ = (db.UniqueConstraint('user_id', 'key', name='uq_idempotency_keys_user_key'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    key = db.Column(db.String(255), nullable=False)  # 客户端 Idempotency-Key 请求头
+    endpoint = db.Column(db.String(100), nullable=False)
+    fingerprint = db.Column(db.String(64), nullable=False)  # 请求方法、路径和参数的sha256，防止同一个键用于不同请求
+    status = db.Column(db.Enum('processing', 'completed'), default='processing')
+    response_code = db.Column(db.Integer)
+    response_body = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
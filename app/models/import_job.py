@@ -0,0 +1,45 @@
+from app import db
+from datetime import datetime
+import json
+
+class ImportJob(db.Model):
+    """批量导入任务（后台执行，客户端轮询进度）"""
+    __tablename__ = 'import_jobs'
+
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex
+    recorder_id = db.Column(db.Integer, db.ForeignKey('recorders.id'), nullable=False)
+    filename = db.Column(db.String(255))
+    file_format = db.Column(db.Enum('csv', 'jsonl'), nullable=False)
+    file_path = db.Column(db.String(500))  # 暂存的上传文件，任务完成后删除
+    status = db.Column(db.Enum('pending', 'running', 'completed', 'failed'), default='pending')
+    total_rows = db.Column(db.Integer, default=0)  # 按行数估算的总数，完成后修正为实际处理数
+    processed_rows = db.Column(db.Integer, default=0)
+    succeeded_rows = db.Column(db.Integer, default=0)
+    failed_rows = db.Column(db.Integer, default=0)
+    errors = db.Column(db.Text)  # JSON格式存储出错行 [{row, message}]
+    message = db.Column(db.Text)  # 任务整体失败的原因
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    def get_errors(self):
+        return json.loads(self.errors) if self.errors else []
+
+    def to_dict(self):
+        total = max(self.total_rows or 0, self.processed_rows or 0)
+        return {
+            'id': self.id,
+            'filename': self.filename,
+            'format': self.file_format,
+            'status': self.status,
+            'total_rows': total,
+            'processed_rows': self.processed_rows or 0,
+            'succeeded_rows': self.succeeded_rows or 0,
+            'failed_rows': self.failed_rows or 0,
+            'progress': round((self.processed_rows or 0) * 100.0 / total, 1) if total else 0.0,
+            'errors': self.get_errors(),
+            'message': self.message,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
@@ -13,7 +13,7 @@ class Family(db.Model):
     emergency_contact = db.Column(db.String(100))  # 紧急联系人（可选）
     emergency_phone = db.Column(db.String(20))  # 紧急联系电话（可选）
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     # 关系
     members = db.relationship('Patient', backref='family', lazy=True, cascade='all, delete-orphan')
@@ -24,7 +24,7 @@ class Family(db.Model):
             'householdHead': self.householdHead,
             'address': self.address,
             'phone': self.phone,
-            'totalMembers': len(self.members),
+            'totalMembers': sum(1 for member in self.members if member.is_active),
             'lastService': self.get_last_service_date(),
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
@@ -35,8 +35,26 @@ class Family(db.Model):
             
         return result
     
+    @staticmethod
+    def preload_last_service_dates(families):
+        """一次分组查询批量计算最近服务日期，避免列表序列化时逐个家庭查询"""
+        from app.models.health_record import HealthRecord
+        if not families:
+            return
+        rows = db.session.query(Patient.family_id, db.func.max(HealthRecord.visit_date))\
+            .join(HealthRecord, HealthRecord.patient_id == Patient.id)\
+            .filter(Patient.family_id.in_([family.id for family in families]))\
+            .group_by(Patient.family_id)\
+            .all()
+        last_dates = dict(rows)
+        for family in families:
+            visit_date = last_dates.get(family.id)
+            family._last_service_date = visit_date.strftime('%Y-%m-%d') if visit_date else None
+    
     def get_last_service_date(self):
         """获取最近服务日期"""
+        if hasattr(self, '_last_service_date'):
+            return self._last_service_date
         from app.models.health_record import HealthRecord
         last_record = db.session.query(HealthRecord)\
             .join(Patient)\
@@ -63,7 +81,7 @@ class Patient(db.Model):
     phone = db.Column(db.String(20))  # 个人电话（可选）
     is_active = db.Column(db.Boolean, default=True)  # 是否激活
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     # 关系
     health_records = db.relationship('HealthRecord', backref='patient', lazy=True)
@@ -0,0 +1,19 @@
+from app import db
+from datetime import datetime
+
+class SyncTombstone(db.Model):
+    """已删除记录的墓碑，供离线设备增量同步时删除本地数据"""
+    __tablename__ = 'sync_tombstones'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(50), nullable=False)  # 同步实体名称，如 appointments
+    entity_id = db.Column(db.Integer, nullable=False)
+    recorder_id = db.Column(db.Integer, index=True)  # 只对该记录员可见；为空时所有记录员都会收到
+    deleted_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    
+    def to_dict(self):
+        return {
+            'entity': self.entity,
+            'id': self.entity_id,
+            'deleted_at': self.deleted_at.isoformat() if self.deleted_at else None
+        }
@@ -0,0 +1,34 @@
+from app import db
+from datetime import datetime
+
+class UploadSession(db.Model):
+    """分片续传会话：客户端按字节区间分片上传，断线后从已接收的位置继续"""
+    __tablename__ = 'upload_sessions'
+
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex
+    recorder_id = db.Column(db.Integer, db.ForeignKey('recorders.id'), nullable=False, index=True)
+    file_type = db.Column(db.Enum('audio', 'image'), nullable=False)
+    filename = db.Column(db.String(255), nullable=False)
+    total_size = db.Column(db.BigInteger, nullable=False)
+    received_size = db.Column(db.BigInteger, default=0)  # 已连续接收的字节数，即下一个分片的起始位置
+    sha256 = db.Column(db.String(64))  # 客户端声明的整个文件摘要（可选），完成时校验
+    status = db.Column(db.Enum('uploading', 'completed', 'attached'), default='uploading')
+    temp_path = db.Column(db.String(500))  # 上传中的临时文件
+    url = db.Column(db.String(255))  # 完成后的文件URL
+    health_record_id = db.Column(db.Integer, db.ForeignKey('health_records.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'file_type': self.file_type,
+            'filename': self.filename,
+            'size': self.total_size,
+            'offset': self.received_size or 0,
+            'status': self.status,
+            'url': self.url,
+            'health_record_id': self.health_record_id,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None
+        }
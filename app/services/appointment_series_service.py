@@ -0,0 +1,408 @@
+from app.models.appointment import Appointment, AppointmentSeries, PatientSubscription, ServiceType
+from app import db
+from app.utils.tracing import traced_service
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import joinedload
+from collections import defaultdict
+from datetime import datetime, date, time, timedelta
+from flask import current_app
+import calendar
+
+# 占用记录员时间的预约状态
+ACTIVE_STATUSES = ('scheduled', 'confirmed')
+MINUTES_PER_DAY = 24 * 60
+
+def _add_months(day, months):
+    """日期加若干个月，目标月份没有该日时取月末"""
+    month_index = day.month - 1 + months
+    year, month = day.year + month_index // 12, month_index % 12 + 1
+    return day.replace(year=year, month=month, day=min(day.day, calendar.monthrange(year, month)[1]))
+
+def _to_minutes(value):
+    return value.hour * 60 + value.minute
+
+def _to_time(minutes):
+    return time(minutes // 60, minutes % 60)
+
+def _check_within_day(start, end):
+    """预约不能跨过当天24:00（start、end为当天的分钟数）"""
+    if end > MINUTES_PER_DAY:
+        raise ValueError(f'{_to_time(start).strftime("%H:%M")} 开始的预约需 {end - start} 分钟，不能超过当天24:00')
+
+def plan_visit_dates(start_date, end_date, visits_per_month):
+    """按每月服务次数在 [start_date, end_date) 内均匀分布上门日期，以订阅开始日为每个服务月的起点"""
+    dates = []
+    months = 0
+    while True:
+        period_start = _add_months(start_date, months)
+        if period_start >= end_date:
+            break
+        period_days = (_add_months(start_date, months + 1) - period_start).days
+        for i in range(visits_per_month):
+            visit_date = period_start + timedelta(days=i * period_days // visits_per_month)
+            if visit_date >= end_date:
+                break
+            dates.append(visit_date)
+        months += 1
+    return dates
+
+class AppointmentConflict(Exception):
+    """预约时间与记录员的其他预约重叠，conflicts为冲突的预约"""
+    def __init__(self, conflicts):
+        super().__init__('预约时间与已有预约冲突')
+        self.conflicts = conflicts
+
+def _overlaps(start, end):
+    """与 [start, end) 分钟区间重叠的预约条件
+
+    只对start_time做范围比较，配合 (recorder_id, scheduled_date, start_time) 索引只扫描当天start_time < end的预约；
+    没有结束时间的预约按默认时长计算。
+    """
+    default_duration = current_app.config.get('APPOINTMENT_DEFAULT_DURATION_MINUTES', 60)
+    open_ended = Appointment.end_time.is_(None)
+    if start - default_duration >= 0:
+        open_ended = and_(open_ended, Appointment.start_time > _to_time(start - default_duration))
+    condition = or_(Appointment.end_time > _to_time(start), open_ended)
+    if end < 24 * 60:
+        condition = and_(Appointment.start_time < _to_time(end), condition)
+    return condition
+
+def find_conflicts(recorder_id, day, start, end, exclude_ids=()):
+    """查询记录员当天与 [start, end) 分钟区间重叠的有效预约，返回冲突预约列表"""
+    query = db.session.query(Appointment.id, Appointment.patient_id, Appointment.start_time, Appointment.end_time)\
+        .filter(
+            Appointment.recorder_id == recorder_id,
+            Appointment.scheduled_date == day,
+            _overlaps(start, end),
+            Appointment.status.in_(ACTIVE_STATUSES)
+        )
+    if exclude_ids:
+        query = query.filter(Appointment.id.notin_(list(exclude_ids)))
+    # 检查时预约可能已被修改，不能先把修改写入数据库
+    with db.session.no_autoflush:
+        rows = query.order_by(Appointment.start_time).all()
+    return [{
+        'appointment_id': row.id,
+        'patient_id': row.patient_id,
+        'scheduled_date': day.isoformat(),
+        'start_time': row.start_time.strftime('%H:%M'),
+        'end_time': row.end_time.strftime('%H:%M') if row.end_time else None
+    } for row in rows]
+
+def check_conflicts(appointment, exclude_ids=()):
+    """预约占用记录员时间时检查冲突，有冲突时抛出AppointmentConflict"""
+    if appointment.status not in ACTIVE_STATUSES:
+        return
+    start = _to_minutes(appointment.start_time)
+    end = _to_minutes(appointment.end_time) if appointment.end_time else \
+        start + current_app.config.get('APPOINTMENT_DEFAULT_DURATION_MINUTES', 60)
+    conflicts = find_conflicts(appointment.recorder_id, appointment.scheduled_date, start, end, exclude_ids)
+    if conflicts:
+        raise AppointmentConflict(conflicts)
+
+class RecorderCalendar:
+    """记录员在一段日期内已占用的时间段（分钟区间），一次查询加载，批量生成或修改预约时在内存中检查冲突"""
+
+    def __init__(self, recorder_id, date_from, date_to, exclude_ids=()):
+        self.busy = defaultdict(list)
+        query = db.session.query(Appointment.id, Appointment.scheduled_date, Appointment.start_time, Appointment.end_time)\
+            .filter(
+                Appointment.recorder_id == recorder_id,
+                Appointment.scheduled_date.between(date_from, date_to),
+                Appointment.status.in_(ACTIVE_STATUSES)
+            )
+        if exclude_ids:
+            query = query.filter(Appointment.id.notin_(list(exclude_ids)))
+        default_duration = current_app.config.get('APPOINTMENT_DEFAULT_DURATION_MINUTES', 60)
+        for appointment_id, scheduled_date, start_time, end_time in query:
+            start = _to_minutes(start_time)
+            end = _to_minutes(end_time) if end_time else start + default_duration
+            self.busy[scheduled_date].append((start, end, appointment_id))
+
+    def conflicts(self, day, start, end):
+        """当天与 [start, end) 重叠的预约id（本次批量中新安排的时段id为None）"""
+        return [appointment_id for busy_start, busy_end, appointment_id in self.busy[day]
+                if start < busy_end and busy_start < end]
+
+    def is_free(self, day, start, end):
+        return not self.conflicts(day, start, end)
+
+    def reserve(self, day, start, end, appointment_id=None):
+        self.busy[day].append((start, end, appointment_id))
+
+    def find_slot(self, day, preferred, duration):
+        """优先使用首选时间，冲突时在工作时间内先向后、再向前按步长寻找空闲时段"""
+        day_start = _to_minutes(datetime.strptime(current_app.config.get('APPOINTMENT_WORKDAY_START', '08:00'), '%H:%M'))
+        day_end = _to_minutes(datetime.strptime(current_app.config.get('APPOINTMENT_WORKDAY_END', '18:00'), '%H:%M'))
+        step = current_app.config.get('APPOINTMENT_SLOT_MINUTES', 30)
+        candidates = [preferred] + list(range(preferred + step, day_end - duration + 1, step)) + \
+            list(range(day_start, min(preferred, day_end - duration + 1), step))
+        for start in candidates:
+            if self.is_free(day, start, start + duration):
+                return start
+        return None
+
+@traced_service
+class AppointmentSeriesService:
+
+    @staticmethod
+    def create_series(data, recorder_id):
+        """按订阅套餐的服务频率生成整个订阅期的周期预约，避开记录员已有的预约，一次事务批量写入
+
+        返回 (series, skipped)，skipped 为当天及顺延后都排不下的计划日期；订阅不存在或无权限时返回 (None, [])。
+        """
+        try:
+            current_app.logger.info(f"AppointmentSeriesService.create_series - 记录员: {recorder_id}, 数据: {data}")
+
+            subscription = db.session.query(PatientSubscription)\
+                .options(joinedload(PatientSubscription.package))\
+                .filter(
+                    PatientSubscription.id == data['subscription_id'],
+                    PatientSubscription.recorder_id == recorder_id
+                ).first()
+            if not subscription:
+                current_app.logger.warning(f"AppointmentSeriesService.create_series - 订阅不存在或无权限: {data['subscription_id']}")
+                return None, []
+            if subscription.status != 'active':
+                raise ValueError('只能为生效中的订阅生成周期预约')
+            if AppointmentSeries.query.filter_by(subscription_id=subscription.id, status='active').first():
+                raise ValueError('该订阅已有生效中的周期预约，请修改已有的周期预约')
+
+            visits_per_month = subscription.package.service_frequency
+            if not visits_per_month or visits_per_month <= 0:
+                raise ValueError('套餐未设置服务频率')
+
+            start_time = datetime.strptime(data['scheduled_time'], '%H:%M').time()
+            if data.get('end_time'):
+                duration = _to_minutes(datetime.strptime(data['end_time'], '%H:%M').time()) - _to_minutes(start_time)
+            else:
+                service_type = db.session.get(ServiceType, data['service_type_id']) if data.get('service_type_id') else None
+                duration = (service_type.default_duration if service_type else None) or \
+                    current_app.config.get('APPOINTMENT_DEFAULT_DURATION_MINUTES', 60)
+            _check_within_day(_to_minutes(start_time), _to_minutes(start_time) + duration)
+
+            from_date = datetime.strptime(data['from_date'], '%Y-%m-%d').date() if data.get('from_date') else date.today()
+            planned = [d for d in plan_visit_dates(subscription.start_date, subscription.end_date, visits_per_month)
+                       if d >= from_date]
+            if not planned:
+                raise ValueError('订阅剩余期限内没有需要安排的上门服务')
+
+            last_day = subscription.end_date - timedelta(days=1)
+            schedule = RecorderCalendar(recorder_id, planned[0], last_day)
+            preferred = _to_minutes(start_time)
+            visits, skipped = [], []
+            for index, planned_date in enumerate(planned):
+                # 当天排不下时顺延，但不越过下一次计划上门日和订阅结束日
+                limit = planned[index + 1] - timedelta(days=1) if index + 1 < len(planned) else last_day
+                day = planned_date
+                while day <= limit:
+                    start = schedule.find_slot(day, preferred, duration)
+                    if start is not None:
+                        schedule.reserve(day, start, start + duration)
+                        visits.append((day, start))
+                        break
+                    day += timedelta(days=1)
+                else:
+                    skipped.append(planned_date)
+
+            series = AppointmentSeries(
+                subscription_id=subscription.id,
+                patient_id=subscription.patient_id,
+                recorder_id=recorder_id,
+                service_type_id=data.get('service_type_id'),
+                start_date=max(subscription.start_date, from_date),
+                end_date=subscription.end_date,
+                visits_per_month=visits_per_month,
+                start_time=start_time,
+                duration_minutes=duration,
+                notes=data.get('notes', ''),
+                status='active'
+            )
+            db.session.add(series)
+            db.session.flush()
+
+            now = datetime.utcnow()
+            if visits:
+                db.session.execute(Appointment.__table__.insert(), [{
+                    'patient_id': subscription.patient_id,
+                    'recorder_id': recorder_id,
+                    'service_type_id': series.service_type_id,
+                    'series_id': series.id,
+                    'scheduled_date': day,
+                    'start_time': _to_time(start),
+                    'end_time': _to_time(start + duration),
+                    'appointment_type': 'regular',
+                    'status': 'scheduled',
+                    'notes': series.notes,
+                    'created_at': now,
+                    'updated_at': now
+                } for day, start in visits])
+            db.session.commit()
+
+            current_app.logger.info(
+                f"AppointmentSeriesService.create_series - 周期预约 {series.id} 创建成功，生成 {len(visits)} 次，未能安排 {len(skipped)} 次"
+            )
+            return series, skipped
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"AppointmentSeriesService.create_series - 创建周期预约失败: {str(e)}", exc_info=True)
+            raise e
+
+    @staticmethod
+    def get_series(series_id, recorder_id=None):
+        """获取周期预约，指定recorder_id时只返回该记录员的"""
+        query = AppointmentSeries.query.filter_by(id=series_id)
+        if recorder_id:
+            query = query.filter_by(recorder_id=recorder_id)
+        return query.first()
+
+    @staticmethod
+    def series_to_dict(series):
+        """周期预约及其全部预约（一次查询）"""
+        appointments = Appointment.query.filter_by(series_id=series.id)\
+            .order_by(Appointment.scheduled_date, Appointment.start_time).all()
+        result = series.to_dict()
+        result['appointments'] = [appointment.to_dict() for appointment in appointments]
+        return result
+
+    @staticmethod
+    def update_series_appointment(series_id, appointment_id, data, recorder_id=None):
+        """修改周期预约中的预约，scope为 this（仅此次）/ following（此次及以后）/ all（全部未完成的）
+
+        following从中间某次开始修改时拆分出新的周期预约，之前的预约保持不变。
+        修改后与记录员其他预约冲突时不做任何修改，返回 {'conflicts': [...]}；预约不存在或无权限时返回None。
+        """
+        try:
+            current_app.logger.info(f"AppointmentSeriesService.update_series_appointment - 周期预约: {series_id}, 预约: {appointment_id}, 数据: {data}")
+
+            query = db.session.query(Appointment)\
+                .options(joinedload(Appointment.series))\
+                .filter(Appointment.id == appointment_id, Appointment.series_id == series_id)
+            if recorder_id:
+                query = query.filter(Appointment.recorder_id == recorder_id)
+            anchor = query.first()
+            if not anchor:
+                current_app.logger.warning(f"AppointmentSeriesService.update_series_appointment - 预约不存在或无权限: {appointment_id}")
+                return None
+            series = anchor.series
+            scope = data.get('scope', 'this')
+
+            if scope == 'this':
+                targets = [anchor]
+            else:
+                query = Appointment.query.filter(
+                    Appointment.series_id == series_id,
+                    Appointment.status.in_(ACTIVE_STATUSES),
+                    Appointment.id != anchor.id
+                )
+                if scope == 'following':
+                    query = query.filter(or_(
+                        Appointment.scheduled_date > anchor.scheduled_date,
+                        and_(Appointment.scheduled_date == anchor.scheduled_date, Appointment.id > anchor.id)
+                    ))
+                else:
+                    query = query.filter(Appointment.scheduled_date >= date.today())
+                targets = [anchor] + query.order_by(Appointment.scheduled_date).all()
+
+            # 计算每个预约修改后的日期和时间：日期按锚点的偏移量平移，只改开始时间时保持原时长
+            shift = timedelta(0)
+            if data.get('scheduled_date'):
+                shift = datetime.strptime(data['scheduled_date'], '%Y-%m-%d').date() - anchor.scheduled_date
+            new_start = datetime.strptime(data['scheduled_time'], '%H:%M').time() if data.get('scheduled_time') else None
+            new_end = datetime.strptime(data['end_time'], '%H:%M').time() if data.get('end_time') else None
+            default_duration = current_app.config.get('APPOINTMENT_DEFAULT_DURATION_MINUTES', 60)
+
+            changes = []
+            for appointment in targets:
+                start = _to_minutes(new_start or appointment.start_time)
+                if new_end:
+                    end = _to_minutes(new_end)
+                else:
+                    old_start = _to_minutes(appointment.start_time)
+                    end = start + ((_to_minutes(appointment.end_time) - old_start) if appointment.end_time else default_duration)
+                if end <= start:
+                    raise ValueError('结束时间必须晚于开始时间')
+                _check_within_day(start, end)
+                changes.append((appointment, appointment.scheduled_date + shift, start, end))
+
+            # 取消不需要检查冲突；改期或恢复已取消的预约时，一次加载涉及日期范围内记录员的其他预约
+            reactivated = data.get('status') in ACTIVE_STATUSES and any(
+                appointment.status not in ACTIVE_STATUSES for appointment in targets)
+            if data.get('status') != 'cancelled' and (shift or new_start or new_end or reactivated):
+                days = [day for _, day, _, _ in changes]
+                schedule = RecorderCalendar(anchor.recorder_id, min(days), max(days),
+                                            exclude_ids=[appointment.id for appointment in targets])
+                conflicts = []
+                for appointment, day, start, end in changes:
+                    overlapping = schedule.conflicts(day, start, end)
+                    if overlapping:
+                        conflicts.append({'appointment_id': appointment.id, 'scheduled_date': day.isoformat(),
+                                          'start_time': _to_time(start).strftime('%H:%M'),
+                                          'conflicts_with': overlapping})
+                    schedule.reserve(day, start, end, appointment.id)
+                if conflicts:
+                    current_app.logger.warning(f"AppointmentSeriesService.update_series_appointment - 与已有预约冲突: {conflicts}")
+                    return {'conflicts': conflicts}
+
+            if scope == 'following' and db.session.query(Appointment.id).filter(
+                    Appointment.series_id == series_id,
+                    Appointment.scheduled_date < anchor.scheduled_date).first():
+                # 从中间开始修改：原周期预约在此结束，此次及以后的预约归入新的周期预约
+                new_series = AppointmentSeries(
+                    subscription_id=series.subscription_id,
+                    patient_id=series.patient_id,
+                    recorder_id=series.recorder_id,
+                    service_type_id=series.service_type_id,
+                    start_date=anchor.scheduled_date + shift,
+                    end_date=series.end_date,
+                    visits_per_month=series.visits_per_month,
+                    start_time=series.start_time,
+                    duration_minutes=series.duration_minutes,
+                    notes=series.notes,
+                    status='active'
+                )
+                db.session.add(new_series)
+                db.session.flush()
+                series.end_date = anchor.scheduled_date
+                series = new_series
+                for appointment in targets:
+                    appointment.series_id = series.id
+
+            for appointment, day, start, end in changes:
+                appointment.scheduled_date = day
+                appointment.start_time = _to_time(start)
+                appointment.end_time = _to_time(end)
+                for field in ('service_type_id', 'notes', 'status'):
+                    if field in data:
+                        setattr(appointment, field, data[field])
+                appointment.updated_at = datetime.utcnow()
+
+            # 对以后所有预约生效的修改同时更新周期预约本身，作为之后查看和修改的默认值
+            if scope != 'this':
+                if new_start:
+                    series.start_time = new_start
+                if new_start or new_end:
+                    _, _, start, end = changes[0]
+                    series.duration_minutes = end - start
+                for field in ('service_type_id', 'notes'):
+                    if field in data:
+                        setattr(series, field, data[field])
+                if data.get('status') == 'cancelled':
+                    series.status = 'cancelled'
+                series.updated_at = datetime.utcnow()
+
+            # 提交前生成返回数据，避免提交后逐个重新加载过期的预约
+            db.session.flush()
+            result = {
+                'series': series.to_dict(),
+                'appointments': [appointment.to_dict() for appointment in targets]
+            }
+            db.session.commit()
+            current_app.logger.info(
+                f"AppointmentSeriesService.update_series_appointment - 修改成功，范围: {scope}，共 {len(targets)} 个预约"
+            )
+            return result
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"AppointmentSeriesService.update_series_appointment - 修改周期预约失败: {str(e)}", exc_info=True)
+            raise e
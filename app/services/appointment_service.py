@@ -1,12 +1,25 @@
 from app.models.appointment import Appointment, ServiceType, Payment
 from app.models.patient import Patient
 from app import db
+from app.utils.tracing import traced_service
+from app.services.appointment_series_service import AppointmentConflict, check_conflicts
 from sqlalchemy import and_, or_
+from sqlalchemy.orm import contains_eager, joinedload, selectinload
 from datetime import datetime, date
 from flask import current_app
 
+@traced_service
 class AppointmentService:
     
+    @staticmethod
+    def _with_details(query, patient_joined=False):
+        """预加载to_dict(include_patient=True, include_payment=True)用到的患者、家庭和支付记录"""
+        patient_load = contains_eager(Appointment.patient) if patient_joined else joinedload(Appointment.patient)
+        return query.options(
+            patient_load.joinedload(Patient.family),
+            selectinload(Appointment.payments)
+        )
+    
     @staticmethod
     def get_today_appointments(recorder_id):
         """获取今日预约列表"""
@@ -14,7 +27,7 @@ class AppointmentService:
             current_app.logger.info(f"AppointmentService.get_today_appointments - 获取记录员 {recorder_id} 的今日预约")
             
             today = date.today()
-            appointments = db.session.query(Appointment)\
+            query = db.session.query(Appointment)\
                 .join(Patient)\
                 .filter(
                     and_(
@@ -23,8 +36,8 @@ class AppointmentService:
                         Appointment.status.in_(['scheduled', 'confirmed'])
                     )
                 )\
-                .order_by(Appointment.start_time)\
-                .all()
+                .order_by(Appointment.start_time)
+            appointments = AppointmentService._with_details(query, patient_joined=True).all()
             
             current_app.logger.info(f"AppointmentService.get_today_appointments - 找到 {len(appointments)} 条今日预约")
             
@@ -61,30 +74,13 @@ class AppointmentService:
             if date_to:
                 current_app.logger.info(f"AppointmentService.get_appointments - 添加结束日期过滤: {date_to} (类型: {type(date_to)})")
                 query = query.filter(Appointment.scheduled_date <= date_to)
-                
-            # 🔍 调试：查看过滤后的SQL查询
-            current_app.logger.info(f"🔍 调试：过滤后的SQL查询: {str(query)}")
-            
-            # 🔍 先查看过滤后的查询结果（未分页）
-            filtered_appointments = query.all()
-            current_app.logger.info(f"🔍 调试：过滤后的预约 (共{len(filtered_appointments)}条):")
-            for appt in filtered_appointments:
-                current_app.logger.info(f"  - ID:{appt.id}, 患者:{appt.patient.name}, 日期:{appt.scheduled_date}, 时间:{appt.start_time}")
-            
-            # 🔍 调试：查询该记录员的所有预约看看实际数据
-            debug_query = db.session.query(Appointment)\
-                .join(Patient)\
-                .filter(Appointment.recorder_id == recorder_id)
-            debug_appointments = debug_query.all()
-            current_app.logger.info(f"🔍 调试：记录员 {recorder_id} 的所有预约:")
-            for appt in debug_appointments:
-                current_app.logger.info(f"  - ID:{appt.id}, 患者:{appt.patient.name}, 日期:{appt.scheduled_date}, 时间:{appt.start_time}")
-            
+
             # 排序
             query = query.order_by(Appointment.scheduled_date.desc(), Appointment.start_time)
             
             total = query.count()
-            appointments = query.offset((page - 1) * limit).limit(limit).all()
+            appointments = AppointmentService._with_details(query, patient_joined=True)\
+                .offset((page - 1) * limit).limit(limit).all()
             
             current_app.logger.info(f"AppointmentService.get_appointments - 找到 {total} 条预约记录，返回 {len(appointments)} 条")
             
@@ -106,7 +102,7 @@ class AppointmentService:
     
     @staticmethod
     def create_appointment(data, recorder_id):
-        """创建预约"""
+        """创建预约，与记录员当天其他预约时间重叠时抛出AppointmentConflict"""
         try:
             current_app.logger.info(f"AppointmentService.create_appointment - 创建预约，记录员: {recorder_id}, 数据: {data}")
             
@@ -122,6 +118,7 @@ class AppointmentService:
                 status=data.get('status', 'scheduled'),
                 notes=data.get('notes', '')
             )
+            check_conflicts(appointment)
             
             db.session.add(appointment)
             db.session.flush()  # 获取appointment.id
@@ -143,6 +140,10 @@ class AppointmentService:
             current_app.logger.info(f"AppointmentService.create_appointment - 预约创建成功，ID: {appointment.id}")
             
             return appointment
+        except AppointmentConflict as e:
+            db.session.rollback()
+            current_app.logger.warning(f"AppointmentService.create_appointment - 与已有预约冲突: {e.conflicts}")
+            raise e
         except Exception as e:
             db.session.rollback()
             current_app.logger.error(f"AppointmentService.create_appointment - 创建预约失败: {str(e)}", exc_info=True)
@@ -160,7 +161,7 @@ class AppointmentService:
             if recorder_id:
                 query = query.filter(Appointment.recorder_id == recorder_id)
             
-            appointment = query.first()
+            appointment = AppointmentService._with_details(query).first()
             if not appointment:
                 current_app.logger.warning(f"AppointmentService.get_appointment_by_id - 预约不存在或无权限，ID: {appointment_id}")
                 return None
@@ -173,7 +174,7 @@ class AppointmentService:
     
     @staticmethod
     def update_appointment(appointment_id, data, recorder_id=None):
-        """更新预约信息"""
+        """更新预约信息，修改日期、时间或状态后与记录员其他预约重叠时抛出AppointmentConflict"""
         try:
             current_app.logger.info(f"AppointmentService.update_appointment - 更新预约，ID: {appointment_id}, 记录员: {recorder_id}, 数据: {data}")
             
@@ -206,6 +207,8 @@ class AppointmentService:
                 appointment.status = data['status']
             if 'notes' in data:
                 appointment.notes = data['notes']
+            if any(field in data for field in ('scheduled_date', 'scheduled_time', 'end_time', 'status')):
+                check_conflicts(appointment, exclude_ids=[appointment.id])
             
             appointment.updated_at = datetime.utcnow()
             
@@ -244,6 +247,10 @@ class AppointmentService:
             current_app.logger.info(f"AppointmentService.update_appointment - 预约更新成功，ID: {appointment.id}")
             
             return appointment
+        except AppointmentConflict as e:
+            db.session.rollback()
+            current_app.logger.warning(f"AppointmentService.update_appointment - 与已有预约冲突: {e.conflicts}")
+            raise e
         except Exception as e:
             db.session.rollback()
             current_app.logger.error(f"AppointmentService.update_appointment - 更新预约失败: {str(e)}", exc_info=True)
@@ -0,0 +1,318 @@
+from app.models.patient import Patient, Family
+from app.models.appointment import ServicePackage, PatientSubscription
+from app.models.import_job import ImportJob
+from app.services.family_service import FamilyService
+from app.utils.validators import validate_family_data
+from app import db
+from app.utils.tracing import traced_service
+from datetime import datetime, date, timedelta
+from flask import current_app
+import os
+import csv
+import json
+import uuid
+
+# 支持的导入格式及对应的文件扩展名
+IMPORT_FORMATS = {
+    'csv': ('.csv',),
+    'jsonl': ('.jsonl', '.ndjson', '.json')
+}
+
+def detect_import_format(filename, explicit=None):
+    """根据显式指定的格式或文件扩展名确定导入格式，无法识别时返回None"""
+    if explicit:
+        explicit = explicit.lower()
+        return explicit if explicit in IMPORT_FORMATS else None
+    ext = os.path.splitext(filename or '')[1].lower()
+    for file_format, extensions in IMPORT_FORMATS.items():
+        if ext in extensions:
+            return file_format
+    return None
+
+def _text_lines(stream):
+    """逐行解码字节流（兼容Excel导出CSV常带的UTF-8 BOM）"""
+    first = True
+    for raw in stream:
+        try:
+            line = raw.decode('utf-8-sig' if first else 'utf-8')
+        except UnicodeDecodeError:
+            raise ValueError('文件编码必须为UTF-8')
+        first = False
+        yield line
+
+def _csv_record(row):
+    """CSV行转为与POST /families相同结构的字典，members列为JSON数组"""
+    record = {}
+    for key, value in row.items():
+        # 多出的列会以None为键放入列表，忽略
+        if key is None or value is None:
+            continue
+        value = value.strip()
+        if value:
+            record[key.strip()] = value
+    if 'members' in record:
+        record['members'] = json.loads(record['members'])
+    return record
+
+def iter_import_rows(stream, file_format):
+    """流式解析上传文件，逐行产出 (行号, 记录, 解析错误)"""
+    lines = _text_lines(stream)
+    if file_format == 'csv':
+        reader = csv.DictReader(lines)
+        for row in reader:
+            try:
+                yield reader.line_num, _csv_record(row), None
+            except ValueError:
+                yield reader.line_num, None, 'members列必须是JSON数组'
+    else:
+        for line_no, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                yield line_no, None, '不是有效的JSON'
+                continue
+            if not isinstance(record, dict):
+                yield line_no, None, '每行必须是JSON对象'
+                continue
+            yield line_no, record, None
+
+@traced_service
+class FamilyImportService:
+
+    @staticmethod
+    def import_rows(rows, recorder_id, chunk_size=None, max_errors=None, progress=None):
+        """逐行校验并分批插入家庭，出错的行记录后跳过，不中断整个导入
+
+        rows为iter_import_rows产出的迭代器；progress(summary)在每批提交后调用。
+        """
+        chunk_size = chunk_size or current_app.config.get('FAMILY_IMPORT_CHUNK_SIZE', 200)
+        max_errors = max_errors or current_app.config.get('FAMILY_IMPORT_MAX_ERRORS', 1000)
+        summary = {'processed': 0, 'succeeded': 0, 'failed': 0, 'errors': []}
+
+        def fail(row, message):
+            summary['failed'] += 1
+            if len(summary['errors']) < max_errors:
+                summary['errors'].append({'row': row, 'message': message})
+
+        # 套餐只查询一次，缓存 (id, 有效天数)，提交后无需重新加载ORM对象
+        packages = {
+            pkg.name: (pkg.id, pkg.duration_days)
+            for pkg in ServicePackage.query.filter_by(is_active=True).all()
+        }
+
+        chunk = []
+        for row, record, error in rows:
+            summary['processed'] += 1
+            if error is None:
+                error = validate_family_data(record, valid_packages=packages)
+            if error is None and not record.get('phone'):
+                error = '缺少联系电话: phone'
+            if error:
+                fail(row, error)
+                continue
+
+            package_name = record['householdHeadPackageType']
+            if package_name not in packages:
+                # 系统中没有任何套餐时与create_family一致，创建默认套餐
+                package = FamilyService.create_default_package(package_name)
+                db.session.commit()
+                packages[package_name] = (package.id, package.duration_days)
+
+            chunk.append((row, record))
+            if len(chunk) >= chunk_size:
+                FamilyImportService._insert_chunk(chunk, recorder_id, packages, summary, fail)
+                chunk = []
+                if progress:
+                    progress(summary)
+
+        if chunk:
+            FamilyImportService._insert_chunk(chunk, recorder_id, packages, summary, fail)
+        if progress:
+            progress(summary)
+        return summary
+
+    @staticmethod
+    def _insert_chunk(chunk, recorder_id, packages, summary, fail):
+        """整批插入并提交；失败时回滚并逐行重试，定位出错的行"""
+        try:
+            FamilyImportService._add_families([record for _, record in chunk], recorder_id, packages)
+            db.session.commit()
+            summary['succeeded'] += len(chunk)
+            return
+        except Exception as e:
+            db.session.rollback()
+            if len(chunk) == 1:
+                fail(chunk[0][0], f'写入失败: {str(getattr(e, "orig", e))}')
+                return
+            current_app.logger.warning(f"FamilyImportService - 批量写入失败，逐行重试: {str(e)}")
+
+        for row, record in chunk:
+            FamilyImportService._insert_chunk([(row, record)], recorder_id, packages, summary, fail)
+
+    @staticmethod
+    def _add_families(records, recorder_id, packages):
+        """按层级批量写入家庭、成员和户主订阅，每层一次flush"""
+        families = [
+            Family(
+                householdHead=record['householdHead'],
+                address=record['address'],
+                phone=record['phone'],
+                emergency_contact=record.get('emergency_contact'),
+                emergency_phone=record.get('emergency_phone')
+            )
+            for record in records
+        ]
+        db.session.add_all(families)
+        db.session.flush()
+
+        heads = []
+        patients = []
+        for family, record in zip(families, records):
+            head = Patient(
+                family_id=family.id,
+                name=record['householdHead'],
+                age=int(record['householdHeadAge']),
+                gender=record['householdHeadGender'],
+                relationship='户主',
+                conditions='',
+                packageType=record['householdHeadPackageType'],
+                paymentStatus='normal',
+                phone=record['phone'],
+                medications=''
+            )
+            FamilyService._apply_member_fields(head, {
+                key: record[source]
+                for key, source in (('conditions', 'householdHeadConditions'), ('medications', 'householdHeadMedications'))
+                if source in record
+            })
+            heads.append(head)
+            patients.append(head)
+
+            # 成员不设置套餐类型，只有户主有套餐
+            for member_data in record.get('members', []):
+                member = Patient(
+                    family_id=family.id,
+                    name=member_data['name'],
+                    age=int(member_data['age']),
+                    gender=member_data['gender'],
+                    relationship=member_data['relationship'],
+                    conditions='',
+                    packageType='',
+                    paymentStatus='normal',
+                    phone=member_data.get('phone'),
+                    medications=''
+                )
+                FamilyService._apply_member_fields(member, {
+                    key: member_data[key] for key in ('conditions', 'medications') if key in member_data
+                })
+                patients.append(member)
+        db.session.add_all(patients)
+
+        if recorder_id:
+            db.session.flush()
+            start_date = date.today()
+            subscriptions = []
+            for head in heads:
+                package_id, duration_days = packages[head.packageType]
+                subscriptions.append(PatientSubscription(
+                    patient_id=head.id,
+                    package_id=package_id,
+                    recorder_id=recorder_id,
+                    start_date=start_date,
+                    end_date=start_date + timedelta(days=duration_days),
+                    status='active'
+                ))
+            db.session.add_all(subscriptions)
+
+    @staticmethod
+    def create_job(file_storage, file_format, recorder_id):
+        """把上传文件分块写入暂存目录并创建导入任务（不把整个文件读入内存）"""
+        job_id = uuid.uuid4().hex
+        import_folder = os.path.join(current_app.config['UPLOAD_FOLDER'], 'imports')
+        os.makedirs(import_folder, exist_ok=True)
+        file_path = os.path.join(import_folder, f'{job_id}.{file_format}')
+
+        lines = 0
+        last = b''
+        with open(file_path, 'wb') as f:
+            while True:
+                block = file_storage.stream.read(64 * 1024)
+                if not block:
+                    break
+                f.write(block)
+                lines += block.count(b'\n')
+                last = block
+        if last and not last.endswith(b'\n'):
+            lines += 1
+
+        job = ImportJob(
+            id=job_id,
+            recorder_id=recorder_id,
+            filename=file_storage.filename,
+            file_format=file_format,
+            file_path=file_path,
+            status='pending',
+            # CSV首行为表头；总行数按行数估算（带引号的多行字段会使估算偏大）
+            total_rows=max(lines - 1, 0) if file_format == 'csv' else lines
+        )
+        db.session.add(job)
+        db.session.commit()
+        return job
+
+    @staticmethod
+    def run_job(job_id):
+        """执行导入任务（由Celery worker调用），每批提交后更新进度"""
+        job = db.session.get(ImportJob, job_id)
+        if not job or job.status != 'pending':
+            return None
+        job.status = 'running'
+        job.started_at = datetime.utcnow()
+        file_path, file_format, recorder_id = job.file_path, job.file_format, job.recorder_id
+        db.session.commit()
+
+        def save_progress(summary):
+            ImportJob.query.filter_by(id=job_id).update({
+                'processed_rows': summary['processed'],
+                'succeeded_rows': summary['succeeded'],
+                'failed_rows': summary['failed'],
+                'errors': json.dumps(summary['errors'], ensure_ascii=False)
+            })
+            db.session.commit()
+
+        try:
+            with open(file_path, 'rb') as f:
+                summary = FamilyImportService.import_rows(
+                    iter_import_rows(f, file_format), recorder_id, progress=save_progress
+                )
+            ImportJob.query.filter_by(id=job_id).update({
+                'status': 'completed',
+                'total_rows': summary['processed'],
+                'finished_at': datetime.utcnow()
+            })
+            db.session.commit()
+            current_app.logger.info(
+                f"FamilyImportService.run_job - 导入完成 {job_id}: 成功{summary['succeeded']}行, 失败{summary['failed']}行"
+            )
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"FamilyImportService.run_job - 导入任务失败 {job_id}: {str(e)}", exc_info=True)
+            ImportJob.query.filter_by(id=job_id).update({
+                'status': 'failed',
+                'message': str(e),
+                'finished_at': datetime.utcnow()
+            })
+            db.session.commit()
+        finally:
+            if file_path and os.path.exists(file_path):
+                os.remove(file_path)
+        return db.session.get(ImportJob, job_id)
+
+    @staticmethod
+    def get_job(job_id, recorder_id=None):
+        """查询导入任务，指定recorder_id时只返回该记录员的任务"""
+        query = ImportJob.query.filter_by(id=job_id)
+        if recorder_id:
+            query = query.filter_by(recorder_id=recorder_id)
+        return query.first()
@@ -1,11 +1,17 @@
 from app.models.patient import Patient, Family
 from app.models.appointment import ServicePackage, PatientSubscription
 from app import db
+from app.utils.tracing import traced_service
 from sqlalchemy import and_, or_
+from sqlalchemy.orm import selectinload
 from datetime import datetime, date
 from flask import current_app
 import json
 
+# 成员数据中可直接写入Patient的字段
+MEMBER_FIELDS = ('name', 'gender', 'relationship', 'packageType', 'paymentStatus', 'phone')
+
+@traced_service
 class FamilyService:
     
     @staticmethod
@@ -43,24 +49,10 @@ class FamilyService:
             
             # 为户主创建PatientSubscription记录
             if recorder_id:
-                from app.models.appointment import ServicePackage, PatientSubscription
-                
                 # 查找对应的服务套餐
                 package = ServicePackage.query.filter_by(name=household_patient.packageType).first()
                 if not package:
-                    # 如果套餐不存在，创建一个默认套餐
-                    package = ServicePackage(
-                        name=household_patient.packageType,
-                        price=0.00,
-                        duration_days=30,
-                        service_frequency=4,
-                        description=f'默认{household_patient.packageType}',
-                        package_level=1,  # 设置默认等级
-                        is_active=True,
-                        is_system_default=False
-                    )
-                    db.session.add(package)
-                    db.session.flush()
+                    package = FamilyService.create_default_package(household_patient.packageType)
                 
                 # 创建户主的订阅记录
                 from datetime import timedelta
@@ -110,6 +102,23 @@ class FamilyService:
             db.session.rollback()
             raise e
     
+    @staticmethod
+    def create_default_package(name):
+        """套餐不存在时创建同名的默认套餐"""
+        package = ServicePackage(
+            name=name,
+            price=0.00,
+            duration_days=30,
+            service_frequency=4,
+            description=f'默认{name}',
+            package_level=1,  # 设置默认等级
+            is_active=True,
+            is_system_default=False
+        )
+        db.session.add(package)
+        db.session.flush()
+        return package
+    
     @staticmethod
     def get_families(recorder_id=None, page=1, limit=20, search=None):
         """获取家庭列表"""
@@ -134,7 +143,10 @@ class FamilyService:
                 )
             
             total = query.count()
-            families = query.offset((page - 1) * limit).limit(limit).all()
+            families = query.options(selectinload(Family.members))\
+                .order_by(Family.id)\
+                .offset((page - 1) * limit).limit(limit).all()
+            Family.preload_last_service_dates(families)
             
             result = {
                 'families': [family.to_dict(include_members=True) for family in families],
@@ -160,7 +172,7 @@ class FamilyService:
                 .join(PatientSubscription)\
                 .filter(PatientSubscription.recorder_id == recorder_id)
         
-        family = query.first()
+        family = query.options(selectinload(Family.members)).first()
         if not family:
             return None
         
@@ -173,6 +185,9 @@ class FamilyService:
             current_app.logger.info(f"FamilyService.update_family - 参数: family_id={family_id}, recorder_id={recorder_id}, data={data}")
             
             query = db.session.query(Family).filter(Family.id == family_id)
+            if 'members' in data:
+                # 合并成员时需要全部成员；只改基本信息时不预加载（提交后会过期重新加载）
+                query = query.options(selectinload(Family.members))
             current_app.logger.info("FamilyService.update_family - 创建基础查询")
             
             # 如果指定了recorder_id，验证权限
@@ -208,35 +223,10 @@ class FamilyService:
                 current_app.logger.info(f"更新emergency_phone: {family.emergency_phone} -> {data['emergency_phone']}")
                 family.emergency_phone = data['emergency_phone']
             
-            # 更新家庭成员（如果提供了members数据）
+            # 更新家庭成员（如果提供了members数据）：只对有差异的成员插入、更新或软删除
             if 'members' in data:
-                current_app.logger.info("FamilyService.update_family - 更新家庭成员")
-                # 删除现有成员（级联删除会自动处理关联数据）
-                Patient.query.filter(Patient.family_id == family_id).delete()
-                
-                # 创建新的成员记录
-                for i, member_data in enumerate(data['members']):
-                    current_app.logger.info(f"创建第{i+1}个成员: {member_data}")
-                    patient = Patient(
-                        family_id=family.id,
-                        name=member_data['name'],
-                        age=int(member_data['age']),
-                        gender=member_data['gender'],
-                        relationship=member_data['relationship'],
-                        conditions=member_data.get('conditions', ''),
-                        packageType=member_data.get('packageType', '基础套餐'),
-                        paymentStatus=member_data.get('paymentStatus', 'normal'),
-                        phone=member_data.get('phone'),
-                        medications=member_data.get('medications', '')
-                    )
-                    
-                    # 处理列表格式的数据
-                    if isinstance(member_data.get('conditions'), list):
-                        patient.set_conditions_list(member_data['conditions'])
-                    if isinstance(member_data.get('medications'), list):
-                        patient.set_medications_list(member_data['medications'])
-                    
-                    db.session.add(patient)
+                stats = FamilyService._reconcile_members(family, data['members'])
+                current_app.logger.info(f"FamilyService.update_family - 成员合并结果: {stats}")
             
             family.updated_at = datetime.utcnow()
             current_app.logger.info("FamilyService.update_family - 提交数据库更改")
@@ -250,6 +240,84 @@ class FamilyService:
             db.session.rollback()
             raise e
     
+    @staticmethod
+    def _apply_member_fields(patient, member_data):
+        """写入成员数据中提供的字段，只修改值有变化的字段，返回是否有修改"""
+        values = {field: member_data[field] for field in MEMBER_FIELDS if field in member_data}
+        if 'age' in member_data:
+            values['age'] = int(member_data['age'])
+        for field in ('conditions', 'medications'):
+            if field in member_data:
+                value = member_data[field]
+                # 列表格式与Patient.set_conditions_list/set_medications_list保持一致
+                values[field] = (', '.join(value) if value else '') if isinstance(value, list) else value
+        
+        changed = False
+        for field, value in values.items():
+            if getattr(patient, field) != value:
+                setattr(patient, field, value)
+                changed = True
+        return changed
+    
+    @staticmethod
+    def _reconcile_members(family, members_data):
+        """按差异合并家庭成员
+        
+        先按id、再按姓名+关系匹配已有成员：匹配到的只更新有变化的字段（已停用的重新启用），
+        未匹配的数据插入为新成员，未被提及的已有成员软删除（is_active=False），
+        患者id及其预约、健康记录、订阅保持不变。所有修改在提交时一次flush写入。
+        """
+        unmatched = {member.id: member for member in family.members}
+        matches = [None] * len(members_data)
+        
+        for i, member_data in enumerate(members_data):
+            member_id = member_data.get('id')
+            if member_id and int(member_id) in unmatched:
+                matches[i] = unmatched.pop(int(member_id))
+        
+        # 同名同关系的多条已停用/启用记录中优先匹配启用的
+        by_identity = {}
+        for member in sorted(unmatched.values(), key=lambda m: (not m.is_active, m.id)):
+            by_identity.setdefault((member.name, member.relationship), []).append(member)
+        for i, member_data in enumerate(members_data):
+            if matches[i] is not None:
+                continue
+            candidates = by_identity.get((member_data.get('name'), member_data.get('relationship')))
+            if candidates:
+                matches[i] = candidates.pop(0)
+                del unmatched[matches[i].id]
+        
+        stats = {'inserted': 0, 'updated': 0, 'deactivated': 0, 'unchanged': 0}
+        for member_data, patient in zip(members_data, matches):
+            if patient is None:
+                patient = Patient(
+                    family_id=family.id,
+                    packageType=member_data.get('packageType', '基础套餐'),
+                    paymentStatus=member_data.get('paymentStatus', 'normal'),
+                    conditions='',
+                    medications='',
+                    is_active=True
+                )
+                FamilyService._apply_member_fields(patient, member_data)
+                family.members.append(patient)
+                stats['inserted'] += 1
+                continue
+            changed = FamilyService._apply_member_fields(patient, member_data)
+            if not patient.is_active:
+                patient.is_active = True
+                changed = True
+            stats['updated' if changed else 'unchanged'] += 1
+        
+        # 户主由家庭信息单独维护（创建时不在members中），未出现在members里时保留
+        includes_head = any(member_data.get('relationship') == '户主' for member_data in members_data)
+        for patient in unmatched.values():
+            if not patient.is_active or (patient.relationship == '户主' and not includes_head):
+                continue
+            patient.is_active = False
+            stats['deactivated'] += 1
+        
+        return stats
+    
     @staticmethod
     def delete_family(family_id, recorder_id=None):
         """删除家庭档案"""
@@ -266,6 +334,11 @@ class FamilyService:
             if not family:
                 return False
             
+            # 先删除成员的PatientSubscription记录（未配置级联，否则会将patient_id置空）
+            member_ids = db.session.query(Patient.id).filter(Patient.family_id == family.id)
+            PatientSubscription.query.filter(PatientSubscription.patient_id.in_(member_ids))\
+                .delete(synchronize_session=False)
+            
             db.session.delete(family)  # 级联删除会自动删除关联的患者
             db.session.commit()
             return True
@@ -338,30 +411,7 @@ class FamilyService:
                 return None
             
             # 更新成员信息
-            if 'name' in member_data:
-                patient.name = member_data['name']
-            if 'age' in member_data:
-                patient.age = int(member_data['age'])
-            if 'gender' in member_data:
-                patient.gender = member_data['gender']
-            if 'relationship' in member_data:
-                patient.relationship = member_data['relationship']
-            if 'conditions' in member_data:
-                if isinstance(member_data['conditions'], list):
-                    patient.set_conditions_list(member_data['conditions'])
-                else:
-                    patient.conditions = member_data['conditions']
-            if 'packageType' in member_data:
-                patient.packageType = member_data['packageType']
-            if 'paymentStatus' in member_data:
-                patient.paymentStatus = member_data['paymentStatus']
-            if 'phone' in member_data:
-                patient.phone = member_data['phone']
-            if 'medications' in member_data:
-                if isinstance(member_data['medications'], list):
-                    patient.set_medications_list(member_data['medications'])
-                else:
-                    patient.medications = member_data['medications']
+            FamilyService._apply_member_fields(patient, member_data)
             
             patient.updated_at = datetime.utcnow()
             
@@ -1,9 +1,12 @@
 from app.models.hospital import PartnerHospital, HospitalDepartment, HospitalDoctor, HospitalAppointment
 from app.models.patient import Patient
 from app import db
+from app.utils.tracing import traced_service
 from sqlalchemy import and_, or_
+from sqlalchemy.orm import contains_eager, joinedload
 from datetime import datetime
 
+@traced_service
 class HospitalService:
     
     @staticmethod
@@ -100,6 +103,12 @@ class HospitalService:
             .join(Patient)\
             .join(PartnerHospital)\
             .join(HospitalDepartment)\
+            .options(
+                contains_eager(HospitalAppointment.patient),
+                contains_eager(HospitalAppointment.hospital),
+                contains_eager(HospitalAppointment.department),
+                joinedload(HospitalAppointment.doctor)
+            )\
             .filter(
                 and_(
                     HospitalAppointment.id == appointment_id,
@@ -0,0 +1,257 @@
+from app.models.health_record import HealthRecord, MediaFile
+from app import db
+from app.utils.media import process_image, probe_audio, probe_duration, transcode_audio, run_in_pool
+from app.utils import storage
+from app.utils.tracing import traced_service
+from datetime import datetime, timedelta
+from flask import current_app
+import os
+import time
+import hmac
+import json
+import hashlib
+
+# 提交任务失败后到该时间之前不再连接broker（进程内共享）
+_broker_retry_at = 0.0
+
+def url_to_path(url):
+    """/static/uploads/<类型>/<文件名> 转为上传目录下的文件路径"""
+    relative = url[len('/static/uploads/'):] if url.startswith('/static/uploads/') else url.lstrip('/')
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], *relative.split('/'))
+
+def path_to_url(path):
+    relative = os.path.relpath(path, current_app.config['UPLOAD_FOLDER']).replace(os.sep, '/')
+    return f"/static/uploads/{relative}"
+
+def storage_key(url):
+    """上传文件的标识：文件名去掉扩展名和派生后缀（_thumb、_speech等），原文件和派生文件相同"""
+    name = url.rsplit('/', 1)[-1]
+    return name.split('.', 1)[0].split('_', 1)[0]
+
+def _download_signature(file_type, name, expires):
+    message = f'{file_type}/{storage_key(name)}:{expires}'.encode('utf-8')
+    return hmac.new(current_app.config['SECRET_KEY'].encode('utf-8'), message, hashlib.sha256).hexdigest()
+
+def sign_download(url, expires_in=None):
+    """返回上传文件的签名下载参数 expires=...&signature=...，只对该文件及其派生文件有效"""
+    file_type, name = url.rsplit('/', 2)[-2:]
+    if expires_in is None:
+        expires_in = current_app.config.get('MEDIA_SIGNED_URL_EXPIRES', 3600)
+    expires = int(time.time()) + expires_in
+    return f'expires={expires}&signature={_download_signature(file_type, name, expires)}'
+
+def verify_download(file_type, name, expires, signature):
+    """校验签名下载参数：签名匹配该文件且未过期"""
+    try:
+        expires = int(expires)
+    except (TypeError, ValueError):
+        return False
+    if expires < time.time():
+        return False
+    return hmac.compare_digest(_download_signature(file_type, name, expires), signature or '')
+
+def media_status(media):
+    """健康记录所有文件的整体处理状态：无文件为none，有未处理完的为processing，有失败的为failed"""
+    statuses = {item.status for item in media}
+    if not statuses:
+        return 'none'
+    if 'processing' in statuses:
+        return 'processing'
+    return 'failed' if 'failed' in statuses else 'ready'
+
+def select_variant(variants, width=None, height=None):
+    """返回不小于请求宽高的最小派生图；都不够大时返回最大的，没有派生图时返回None"""
+    if not variants:
+        return None
+    ordered = sorted(variants.values(), key=lambda item: item['width'] * item['height'])
+    for variant in ordered:
+        if variant['width'] >= (width or 0) and variant['height'] >= (height or 0):
+            return variant
+    return ordered[-1]
+
+def _process_audio(path):
+    """读取录音元数据并转码为单声道语音，转码结果放在variants['speech']；转码失败时保留原文件"""
+    config = current_app.config
+    metadata = probe_audio(path)
+    if 'duration_seconds' not in metadata:
+        duration = probe_duration(path, config.get('FFPROBE_BINARY', 'ffprobe'))
+        if duration is not None:
+            metadata['duration_seconds'] = duration
+    try:
+        speech = transcode_audio(path, config.get('AUDIO_TRANSCODE_CODEC', 'opus'),
+                                 config.get('AUDIO_TRANSCODE_BITRATE', '24k'),
+                                 config.get('AUDIO_TRANSCODE_SAMPLE_RATE', 16000),
+                                 config.get('FFMPEG_BINARY', 'ffmpeg'), config.get('FFPROBE_BINARY', 'ffprobe'))
+    except ValueError as e:
+        current_app.logger.error(f"MediaService.process - 录音转码失败 {path}: {str(e)}，保留原文件")
+        metadata['transcode_error'] = str(e)
+        speech = None
+    if speech:
+        metadata['variants'] = {'speech': speech}
+    return metadata
+
+def _process_file(kind, path):
+    """图片在子进程池中解码，调用进程只接收元数据"""
+    if kind == 'audio':
+        return _process_audio(path)
+    config = current_app.config
+    return run_in_pool(config.get('MEDIA_IMAGE_WORKERS', 0), process_image, path,
+                       dict(config.get('MEDIA_IMAGE_VARIANTS', {'thumb': 300})),
+                       config.get('MEDIA_VARIANT_FORMAT', 'WEBP'), config.get('MEDIA_VARIANT_QUALITY', 80))
+
+@traced_service
+class MediaService:
+
+    @staticmethod
+    def build_media(entries):
+        """根据 (类型, URL) 列表创建待处理的媒体记录（随健康记录一起提交）"""
+        return [MediaFile(kind=kind, url=url, storage_key=storage_key(url), status='processing')
+                for kind, url in entries if url]
+
+    @staticmethod
+    def dispatch(media_ids):
+        """每个文件提交一个后台任务（Celery worker以多进程并行处理），返回未能提交的文件id
+
+        无法提交的文件保持processing，不在Web请求中处理，由 flask dispatch_pending_media 定时重新提交。
+        提交失败后 MEDIA_DISPATCH_BACKOFF_SECONDS 内本进程不再连接broker。
+        """
+        global _broker_retry_at
+        pending = list(media_ids)
+        if not pending or time.time() < _broker_retry_at:
+            return pending
+        from app.tasks.media import process_media_file
+        while pending:
+            try:
+                process_media_file.apply_async((pending[0],), retry=False)
+                pending.pop(0)
+            except Exception as e:
+                _broker_retry_at = time.time() + current_app.config.get('MEDIA_DISPATCH_BACKOFF_SECONDS', 30)
+                current_app.logger.error(f"MediaService.dispatch - 提交媒体处理任务失败 {pending[0]}: {str(e)}，"
+                                         f"{len(pending)} 个文件等待重新提交")
+                break
+        return pending
+
+    @staticmethod
+    def dispatch_pending(older_than_minutes=None, inline=False):
+        """重新提交创建超过指定分钟数仍在processing的文件，返回 (已提交数, 当前进程处理数)
+
+        inline为True时无法提交的文件在当前进程处理（只在命令行中使用）。
+        """
+        if older_than_minutes is None:
+            older_than_minutes = current_app.config.get('MEDIA_REDISPATCH_AFTER_MINUTES', 15)
+        cutoff = datetime.utcnow() - timedelta(minutes=older_than_minutes)
+        media_ids = [row[0] for row in db.session.query(MediaFile.id)
+                     .filter(MediaFile.status == 'processing', MediaFile.created_at <= cutoff)
+                     .order_by(MediaFile.id)]
+        pending = MediaService.dispatch(media_ids)
+        if inline:
+            for media_id in pending:
+                MediaService.process(media_id)
+        return len(media_ids) - len(pending), len(pending) if inline else 0
+
+    @staticmethod
+    def process(media_id):
+        """生成图片派生图、转码录音、提取元数据（由Celery worker调用），返回处理后的状态"""
+        media = db.session.get(MediaFile, media_id)
+        if not media or media.status != 'processing':
+            return None
+        path = url_to_path(media.url)
+        values = {'processed_at': datetime.utcnow()}
+        record_values = None
+        try:
+            metadata = _process_file(media.kind, path)
+            variants = metadata.pop('variants', {})
+            for variant in variants.values():
+                variant['url'] = path_to_url(variant.pop('path'))
+            thumbnail = select_variant(variants) if media.kind != 'audio' else None
+            if media.kind == 'audio':
+                media_values, record_values = MediaService._apply_audio_retention(variants.get('speech'), metadata,
+                                                                                  os.path.getsize(path))
+                values.update(media_values)
+            values.update({
+                'status': 'ready',
+                'size_bytes': os.path.getsize(path),
+                'thumbnail_url': thumbnail['url'] if thumbnail else None,
+                'variants': json.dumps(variants, ensure_ascii=False) if variants else None,
+                'media_metadata': json.dumps(metadata, ensure_ascii=False)
+            })
+        except (OSError, ValueError) as e:
+            current_app.logger.error(f"MediaService.process - 处理文件失败 {media.url}: {str(e)}")
+            values.update({'status': 'failed', 'error': str(e)})
+        # 只更新仍在处理中的记录，任务重复投递时不覆盖已有结果
+        updated = MediaFile.query.filter_by(id=media_id, status='processing').update(values, synchronize_session=False)
+        if updated and record_values:
+            HealthRecord.query.filter_by(id=media.health_record_id, audio_file=media.url)\
+                .update(record_values, synchronize_session=False)
+        db.session.commit()
+        if updated and values.get('url', media.url) != media.url:
+            storage.release(media.url)
+        return values['status']
+
+    @staticmethod
+    def _apply_audio_retention(speech, metadata, original_size):
+        """转码成功后健康记录改为引用转码文件，并按保留策略处理原始录音
+
+        返回 (媒体记录要更新的字段, 健康记录要更新的字段)。AUDIO_ORIGINAL_RETENTION_DAYS为0时立即删除原始录音，
+        为正数时到期后由 prune_audio_originals 删除，为None时永久保留。
+        """
+        if not speech:
+            return {}, {'audio_duration_seconds': metadata.get('duration_seconds'), 'audio_size_bytes': original_size}
+        retention_days = current_app.config.get('AUDIO_ORIGINAL_RETENTION_DAYS')
+        record_values = {
+            'audio_file': speech['url'],
+            'audio_duration_seconds': speech.get('duration_seconds') or metadata.get('duration_seconds'),
+            'audio_size_bytes': speech['bytes']
+        }
+        if retention_days == 0:
+            return {'url': speech['url']}, record_values
+        if retention_days is None:
+            return {}, record_values
+        return {'original_expires_at': datetime.utcnow() + timedelta(days=retention_days)}, record_values
+
+    @staticmethod
+    def find_owner(file_type, name):
+        """返回上传文件（含派生文件）所属健康记录的记录员id，不属于任何健康记录时返回None"""
+        row = db.session.query(HealthRecord.recorder_id)\
+            .join(MediaFile, MediaFile.health_record_id == HealthRecord.id)\
+            .filter(MediaFile.storage_key == storage_key(name),
+                    MediaFile.url.like(f'/static/uploads/{file_type}/%')).first()
+        return row[0] if row else None
+
+    @staticmethod
+    def prune_audio_originals():
+        """删除保留期已过的原始录音（已有转码文件），返回删除数"""
+        expired = MediaFile.query.filter(MediaFile.kind == 'audio',
+                                         MediaFile.original_expires_at < datetime.utcnow()).all()
+        for media in expired:
+            speech = media.get_variants().get('speech')
+            media.original_expires_at = None
+            if speech and media.url != speech['url']:
+                storage.release(media.url)
+                media.url = speech['url']
+        db.session.commit()
+        return len(expired)
+
+    @staticmethod
+    def get_record_media(record_id, recorder_id, width=None, height=None):
+        """获取健康记录文件的处理状态，记录不存在或不属于该记录员时返回None
+
+        给出width/height（显示区域的像素尺寸）时，每张图片的best_url为足够清晰的最小派生图。
+        download_query为签名下载参数，可加在该文件及其派生文件的URL后，供无法设置请求头的<img>、<audio>使用。
+        """
+        record = HealthRecord.query.filter_by(id=record_id, recorder_id=recorder_id).first()
+        if not record:
+            return None
+        media = []
+        for item in record.media:
+            data = item.to_dict()
+            data['download_query'] = sign_download(item.url)
+            if (width or height) and item.kind != 'audio':
+                variant = select_variant(data['variants'], width, height)
+                data['best_url'] = variant['url'] if variant else item.url
+            media.append(data)
+        return {
+            'record_id': record.id,
+            'status': media_status(record.media),
+            'media': media
+        }
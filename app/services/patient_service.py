@@ -2,10 +2,12 @@ from app.models.patient import Patient, Family
 from app.models.health_record import HealthRecord
 from app.models.appointment import PatientSubscription, Appointment
 from app import db
+from app.utils.tracing import traced_service
 from sqlalchemy import and_, or_
 from datetime import datetime, date
 import json
 
+@traced_service
 class PatientService:
     
     @staticmethod
@@ -100,8 +102,17 @@ class PatientService:
                 photos=data.get('photos'),
                 patient_signature=data.get('patient_signature')
             )
+            # 上传文件先记为处理中，提交后再交给后台任务
+            record.media = data.get('media') or []
             
             db.session.add(record)
+            uploads = data.get('uploads') or []
+            if uploads:
+                # 引用的分片续传文件与健康记录一起提交，不能再被其他记录使用
+                db.session.flush()
+                for upload in uploads:
+                    upload.status = 'attached'
+                    upload.health_record_id = record.id
             db.session.commit()
             
             return record
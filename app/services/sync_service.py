@@ -0,0 +1,168 @@
+from app.models.patient import Family, Patient
+from app.models.appointment import ServicePackage, PatientSubscription, Appointment, Payment
+from app.models.hospital import PartnerHospital, HospitalDepartment, HospitalDoctor
+from app.models.sync import SyncTombstone
+from app import db
+from app.utils.tracing import traced_service
+from sqlalchemy import and_, or_, event, select
+from sqlalchemy.orm import Mapper, Session, object_session, selectinload
+from datetime import datetime, timedelta
+from flask import current_app
+import base64
+import heapq
+
+class SyncCursorExpired(Exception):
+    """同步游标早于墓碑保留期，客户端需要全量同步"""
+    pass
+
+def _family_scope(recorder_id):
+    """记录员负责的家庭：家庭中有患者订阅分配给该记录员"""
+    return select(Patient.family_id)\
+        .join(PatientSubscription, PatientSubscription.patient_id == Patient.id)\
+        .where(PatientSubscription.recorder_id == recorder_id)
+
+def _serialize_families(families):
+    Family.preload_last_service_dates(families)
+    return [family.to_dict() for family in families]
+
+def _serialize_patients(patients):
+    return [dict(patient.to_dict(), family_id=patient.family_id) for patient in patients]
+
+def _serialize(rows):
+    return [row.to_dict() for row in rows]
+
+# 同步实体：(名称, 模型, 时间列, 记录员范围过滤, 预加载的关系, 序列化函数)，顺序即同一时间戳内的排序
+SYNC_ENTITIES = (
+    ('service_packages', ServicePackage, ServicePackage.updated_at, None, (), _serialize),
+    ('hospitals', PartnerHospital, PartnerHospital.updated_at, None, (), _serialize),
+    ('hospital_departments', HospitalDepartment, HospitalDepartment.updated_at, None, (), _serialize),
+    ('hospital_doctors', HospitalDoctor, HospitalDoctor.updated_at, None, (), _serialize),
+    ('families', Family, Family.updated_at,
+     lambda recorder_id: Family.id.in_(_family_scope(recorder_id)),
+     (Family.members,), _serialize_families),
+    ('patients', Patient, Patient.updated_at,
+     lambda recorder_id: Patient.family_id.in_(_family_scope(recorder_id)), (), _serialize_patients),
+    ('appointments', Appointment, Appointment.updated_at,
+     lambda recorder_id: Appointment.recorder_id == recorder_id, (), _serialize),
+    ('payments', Payment, Payment.updated_at,
+     lambda recorder_id: Payment.appointment_id.in_(select(Appointment.id).where(Appointment.recorder_id == recorder_id)),
+     (), _serialize),
+    ('tombstones', SyncTombstone, SyncTombstone.deleted_at,
+     lambda recorder_id: or_(SyncTombstone.recorder_id == recorder_id, SyncTombstone.recorder_id.is_(None)),
+     (), None),
+)
+
+# 删除时需要写墓碑的模型 -> 同步实体名称
+_TOMBSTONE_ENTITIES = {model: name for name, model, _, _, _, _ in SYNC_ENTITIES if model is not SyncTombstone}
+
+@event.listens_for(Mapper, 'after_delete')
+def _collect_tombstone(mapper, connection, target):
+    """ORM删除同步实体（含级联删除）时记下墓碑，flush结束后一次写入"""
+    entity = _TOMBSTONE_ENTITIES.get(type(target))
+    if entity is None:
+        return
+    object_session(target).info.setdefault('sync_tombstones', []).append({
+        'entity': entity,
+        'entity_id': target.id,
+        'recorder_id': target.recorder_id if isinstance(target, Appointment) else None,
+        'deleted_at': datetime.utcnow()
+    })
+
+@event.listens_for(Session, 'after_flush')
+def _write_tombstones(session, flush_context):
+    """在删除所在的事务中批量插入本次flush产生的墓碑"""
+    rows = session.info.pop('sync_tombstones', None)
+    if rows:
+        session.connection().execute(SyncTombstone.__table__.insert(), rows)
+
+def encode_cursor(timestamp, entity_index, row_id):
+    raw = f'{timestamp.isoformat()}|{entity_index}|{row_id}'
+    return base64.urlsafe_b64encode(raw.encode('ascii')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """解析游标为 (时间戳, 实体序号, 行id)，格式错误时抛出ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('ascii')
+        timestamp, entity_index, row_id = raw.split('|')
+        return datetime.fromisoformat(timestamp), int(entity_index), int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError('同步游标无效')
+
+@traced_service
+class SyncService:
+
+    @staticmethod
+    def get_changes(recorder_id, cursor=None, limit=500):
+        """返回游标之后记录员范围内的变更（新增/修改及删除墓碑），按 (时间戳, 实体, id) 单调排序分页
+
+        只返回早于 当前时间-SYNC_SAFETY_LAG_SECONDS 的变更，避免跳过时间戳更早但尚未提交的事务。
+        每页每个实体一次查询，与分页大小无关。
+        """
+        watermark = datetime.utcnow() - timedelta(seconds=current_app.config.get('SYNC_SAFETY_LAG_SECONDS', 2))
+        position = decode_cursor(cursor) if cursor else None
+        if position:
+            retention = timedelta(days=current_app.config.get('SYNC_TOMBSTONE_RETENTION_DAYS', 90))
+            if position[0] < datetime.utcnow() - retention:
+                raise SyncCursorExpired('同步游标已超过墓碑保留期，请全量同步')
+
+        streams = []
+        for index, (name, model, column, scope, preload, _) in enumerate(SYNC_ENTITIES):
+            query = db.session.query(model).options(*[selectinload(rel) for rel in preload])\
+                .filter(column <= watermark)
+            if scope is not None:
+                query = query.filter(scope(recorder_id))
+            if position:
+                since, since_index, since_id = position
+                if index < since_index:
+                    query = query.filter(column > since)
+                elif index == since_index:
+                    query = query.filter(or_(column > since, and_(column == since, model.id > since_id)))
+                else:
+                    query = query.filter(column >= since)
+            elif name == 'tombstones':
+                # 全量同步时客户端没有本地数据，不需要墓碑
+                continue
+            rows = query.order_by(column, model.id).limit(limit + 1).all()
+            streams.append([(getattr(row, column.key), index, row.id, row) for row in rows])
+
+        merged = list(heapq.merge(*streams, key=lambda item: item[:3]))
+        page, has_more = merged[:limit], len(merged) > limit
+
+        # 按实体批量序列化（家庭的最近服务日期一次查询）
+        by_entity = {}
+        for _, index, _, row in page:
+            by_entity.setdefault(index, []).append(row)
+        payloads = {}
+        for index, rows in by_entity.items():
+            serializer = SYNC_ENTITIES[index][5]
+            if serializer is not None:
+                payloads.update({id(row): data for row, data in zip(rows, serializer(rows))})
+
+        changes = []
+        for timestamp, index, row_id, row in page:
+            if isinstance(row, SyncTombstone):
+                changes.append({'entity': row.entity, 'id': row.entity_id, 'op': 'delete',
+                                'updated_at': timestamp.isoformat()})
+            else:
+                changes.append({'entity': SYNC_ENTITIES[index][0], 'id': row_id, 'op': 'upsert',
+                                'updated_at': timestamp.isoformat(), 'data': payloads[id(row)]})
+
+        if has_more:
+            timestamp, index, row_id, _ = page[-1]
+            next_cursor = encode_cursor(timestamp, index, row_id)
+        else:
+            # 水位线之前的变更已全部返回
+            last = max(watermark, position[0]) if position else watermark
+            next_cursor = encode_cursor(last, len(SYNC_ENTITIES), 0)
+
+        current_app.logger.info(f"SyncService.get_changes - 记录员 {recorder_id} 返回 {len(changes)} 条变更，has_more={has_more}")
+        return {'changes': changes, 'cursor': next_cursor, 'has_more': has_more}
+
+    @staticmethod
+    def prune_tombstones(days=None):
+        """删除超过保留期的墓碑，返回删除数"""
+        days = days or current_app.config.get('SYNC_TOMBSTONE_RETENTION_DAYS', 90)
+        deleted = SyncTombstone.query.filter(SyncTombstone.deleted_at < datetime.utcnow() - timedelta(days=days))\
+            .delete(synchronize_session=False)
+        db.session.commit()
+        return deleted
@@ -0,0 +1,166 @@
+from app.models.upload import UploadSession
+from app import db
+from app.utils.helpers import allowed_file
+from app.utils.tracing import traced_service
+from app.utils import storage
+from datetime import datetime, timedelta
+from flask import current_app
+from werkzeug.utils import secure_filename
+import os
+import uuid
+import hashlib
+
+# 分片写入磁盘时每次读取的字节数
+STREAM_BLOCK_SIZE = 64 * 1024
+
+class UploadOffsetMismatch(Exception):
+    """分片起始位置与服务端已接收的字节数不一致，客户端应从offset处继续"""
+    def __init__(self, offset):
+        super().__init__(f'分片起始位置错误，应从第{offset}字节继续上传')
+        self.offset = offset
+
+@traced_service
+class UploadService:
+
+    @staticmethod
+    def create_session(data, recorder_id):
+        """创建上传会话，参数不合法时抛出ValueError"""
+        file_type = data.get('file_type')
+        filename = secure_filename(data.get('filename') or '')
+        if file_type not in ('audio', 'image'):
+            raise ValueError('file_type必须为audio或image')
+        if not filename or not allowed_file(filename, file_type):
+            raise ValueError('不支持的文件类型')
+        try:
+            size = int(data.get('size'))
+        except (TypeError, ValueError):
+            raise ValueError('size必须为文件字节数')
+        max_size = current_app.config.get('UPLOAD_SESSION_MAX_SIZE', 200 * 1024 * 1024)
+        if size <= 0 or size > max_size:
+            raise ValueError(f'文件大小必须在1到{max_size}字节之间')
+        sha256 = (data.get('sha256') or '').lower() or None
+        if sha256 and (len(sha256) != 64 or any(c not in '0123456789abcdef' for c in sha256)):
+            raise ValueError('sha256格式错误')
+
+        upload_id = uuid.uuid4().hex
+        os.makedirs(storage.incoming_folder(), exist_ok=True)
+        temp_path = os.path.join(storage.incoming_folder(), upload_id)
+        open(temp_path, 'wb').close()
+
+        session = UploadSession(
+            id=upload_id,
+            recorder_id=recorder_id,
+            file_type=file_type,
+            filename=filename,
+            total_size=size,
+            received_size=0,
+            sha256=sha256,
+            temp_path=temp_path,
+            expires_at=datetime.utcnow() + timedelta(hours=current_app.config.get('UPLOAD_SESSION_TTL_HOURS', 24))
+        )
+        db.session.add(session)
+        db.session.commit()
+        current_app.logger.info(f"UploadService.create_session - 记录员 {recorder_id} 创建上传 {upload_id}: {filename} {size}字节")
+        return session
+
+    @staticmethod
+    def get_session(upload_id, recorder_id):
+        return UploadSession.query.filter_by(id=upload_id, recorder_id=recorder_id).first()
+
+    @staticmethod
+    def is_expired(session):
+        return session.status == 'uploading' and session.expires_at < datetime.utcnow()
+
+    @staticmethod
+    def write_chunk(session, start, length, stream, checksum):
+        """把请求体中的分片直接流式写入临时文件的 [start, start+length) 区间，返回新的offset
+
+        分片必须从已接收的位置开始；摘要不一致时丢弃本次写入并抛出ValueError。
+        """
+        if session.status != 'uploading':
+            raise ValueError('上传已完成，不能继续写入')
+        if start != session.received_size:
+            raise UploadOffsetMismatch(session.received_size)
+        if length <= 0 or start + length > session.total_size:
+            raise ValueError('分片超出文件大小')
+
+        digest = hashlib.sha256()
+        written = 0
+        with open(session.temp_path, 'r+b') as f:
+            f.seek(start)
+            while written < length:
+                block = stream.read(min(STREAM_BLOCK_SIZE, length - written))
+                if not block:
+                    break
+                digest.update(block)
+                f.write(block)
+                written += len(block)
+            if written != length or digest.hexdigest() != checksum.lower():
+                f.truncate(start)
+                raise ValueError('分片不完整或校验失败，请重新上传该分片')
+
+        offset = start + length
+        # 以起始位置作为条件，同一分片的并发请求只有一个生效
+        updated = UploadSession.query.filter_by(id=session.id, received_size=start, status='uploading').update({
+            'received_size': offset,
+            'updated_at': datetime.utcnow(),
+            'expires_at': datetime.utcnow() + timedelta(hours=current_app.config.get('UPLOAD_SESSION_TTL_HOURS', 24))
+        }, synchronize_session=False)
+        db.session.commit()
+        if not updated:
+            db.session.refresh(session)
+            raise UploadOffsetMismatch(session.received_size)
+        return offset
+
+    @staticmethod
+    def finalize(session):
+        """校验完整文件并存入内容寻址存储，返回会话；重复调用直接返回已完成的会话"""
+        if session.status != 'uploading':
+            return session
+        if session.received_size != session.total_size:
+            raise ValueError(f'文件尚未上传完整，已接收{session.received_size}/{session.total_size}字节')
+        # 整个文件的摘要既用于校验，也作为内容寻址存储的地址
+        digest = storage.file_sha256(session.temp_path)
+        if session.sha256 and digest != session.sha256:
+            # 整个文件损坏，从头重新上传
+            open(session.temp_path, 'wb').close()
+            session.received_size = 0
+            db.session.commit()
+            raise ValueError('文件校验失败，请重新上传')
+
+        ext = os.path.splitext(session.filename)[1].lower()
+        session.url = storage.store_file(session.temp_path, session.file_type, ext, digest=digest)
+        session.status = 'completed'
+        session.temp_path = None
+        db.session.commit()
+        current_app.logger.info(f"UploadService.finalize - 上传 {session.id} 完成: {session.url}")
+        return session
+
+    @staticmethod
+    def resolve_completed(upload_ids, recorder_id, file_type):
+        """按顺序返回记录员已完成且未使用的上传，有任一不可用时抛出ValueError"""
+        upload_ids = [upload_id for upload_id in upload_ids if upload_id]
+        if not upload_ids:
+            return []
+        sessions = {s.id: s for s in UploadSession.query.filter(
+            UploadSession.id.in_(upload_ids),
+            UploadSession.recorder_id == recorder_id,
+            UploadSession.file_type == file_type,
+            UploadSession.status == 'completed'
+        ).all()}
+        missing = [upload_id for upload_id in upload_ids if upload_id not in sessions]
+        if missing:
+            raise ValueError(f"上传不存在、未完成或已被使用: {', '.join(missing)}")
+        return [sessions[upload_id] for upload_id in upload_ids]
+
+    @staticmethod
+    def prune_expired():
+        """删除过期未完成的上传会话及其临时文件，返回删除数"""
+        sessions = UploadSession.query.filter(UploadSession.status == 'uploading',
+                                              UploadSession.expires_at < datetime.utcnow()).all()
+        for session in sessions:
+            if session.temp_path and os.path.exists(session.temp_path):
+                os.remove(session.temp_path)
+            db.session.delete(session)
+        db.session.commit()
+        return len(sessions)
@@ -0,0 +1 @@
+# Celery任务模块（Web进程只在提交任务时按需导入，避免启动时加载Celery）
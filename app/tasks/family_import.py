@@ -0,0 +1,8 @@
+from app import celery
+
+@celery.task(name='tasks.import_families')
+def import_families(job_id):
+    """后台执行家庭批量导入任务"""
+    from app.services.family_import_service import FamilyImportService
+    job = FamilyImportService.run_job(job_id)
+    return job.status if job else None
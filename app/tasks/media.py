@@ -0,0 +1,8 @@
+from app import celery
+
+# 处理结果写入数据库，不需要结果后端（提交时也不会订阅结果频道）
+@celery.task(name='tasks.process_media_file', ignore_result=True)
+def process_media_file(media_id):
+    """后台生成健康记录上传文件的派生图、转码录音并提取元数据"""
+    from app.services.media_service import MediaService
+    return MediaService.process(media_id)
@@ -1,8 +1,22 @@
 from functools import wraps
-from flask import jsonify, current_app
+from datetime import datetime, timedelta
+from flask import jsonify, current_app, g, request
 from flask_jwt_extended import get_jwt_identity
+from sqlalchemy.exc import IntegrityError
 from app.models.user import User
+from app.models.idempotency import IdempotencyKey
 from app import db
+import hashlib
+import json
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+
+def _get_user(user_id):
+    """查询当前用户；批量请求的子请求复用外层请求已查询的用户"""
+    user = g.get('_batch_user')
+    if user is not None and user.id == user_id:
+        return user
+    return db.session.query(User).filter(User.id == user_id).first()
 
 def recorder_required(f):
     """记录员权限装饰器"""
@@ -30,7 +44,7 @@ def recorder_required(f):
                 'message': '用户ID格式错误'
             }), 422
             
-        user = db.session.query(User).filter(User.id == user_id).first()
+        user = _get_user(user_id)
         current_app.logger.info(f"recorder_required - 查询到的用户: {user.name if user else None}, 角色: {user.role if user else 'None'}")
         
         if not user or user.role != 'recorder':
@@ -63,7 +77,7 @@ def admin_required(f):
                 'message': '用户ID格式错误'
             }), 422
             
-        user = db.session.query(User).filter(User.id == user_id).first()
+        user = _get_user(user_id)
         
         if not user or user.role != 'admin':
             return jsonify({
@@ -100,7 +114,7 @@ def admin_or_recorder_required(f):
                 'message': '用户ID格式错误'
             }), 422
             
-        user = db.session.query(User).filter(User.id == user_id).first()
+        user = _get_user(user_id)
         current_app.logger.info(f"admin_or_recorder_required - 查询到的用户: {user}, 角色: {user.role if user else 'None'}")
         
         if not user or user.role not in ['admin', 'recorder']:
@@ -133,7 +147,7 @@ def doctor_required(f):
                 'message': '用户ID格式错误'
             }), 422
             
-        user = db.session.query(User).filter(User.id == user_id).first()
+        user = _get_user(user_id)
         
         if not user or user.role != 'doctor':
             return jsonify({
@@ -142,4 +156,129 @@ def doctor_required(f):
             }), 403
         
         return f(*args, **kwargs)
-    return decorated_function
\ No newline at end of file
+    return decorated_function
+
+def _request_fingerprint():
+    """请求方法、路径和参数的摘要；上传文件只计入字段名和文件名，不读取文件内容"""
+    digest = hashlib.sha256(f'{request.method} {request.path}?{request.query_string.decode("latin-1")}\n'.encode('utf-8'))
+    if request.is_json:
+        digest.update(json.dumps(request.get_json(silent=True), sort_keys=True, ensure_ascii=False).encode('utf-8'))
+    else:
+        for name, value in sorted(request.form.items(multi=True)):
+            digest.update(f'{name}={value}\n'.encode('utf-8'))
+        for name, storage in sorted(request.files.items(multi=True), key=lambda item: (item[0], item[1].filename or '')):
+            digest.update(f'{name}:{storage.filename}\n'.encode('utf-8'))
+    return digest.hexdigest()
+
+def _claim_idempotency_key(user_id, key, fingerprint):
+    """占用幂等键，返回 (记录, 是否由本次请求占用)
+
+    过期的记录直接复用；处理中的记录超过 IDEMPOTENCY_PROCESSING_TIMEOUT 秒（处理请求的进程已被终止）时由重试接管。
+    """
+    now = datetime.utcnow()
+    config = current_app.config
+    expires_at = now + timedelta(seconds=config.get('IDEMPOTENCY_KEY_TTL_SECONDS', 86400))
+    values = {
+        'endpoint': request.endpoint,
+        'fingerprint': fingerprint,
+        'status': 'processing',
+        'response_code': None,
+        'response_body': None,
+        'created_at': now,
+        'expires_at': expires_at
+    }
+    record = IdempotencyKey.query.filter_by(user_id=user_id, key=key).first()
+    if record is None:
+        record = IdempotencyKey(user_id=user_id, key=key, **values)
+        db.session.add(record)
+        try:
+            db.session.commit()
+            return record, True
+        except IntegrityError:
+            # 并发的重试已先占用
+            db.session.rollback()
+            return IdempotencyKey.query.filter_by(user_id=user_id, key=key).first(), False
+
+    lease_expired = record.status == 'processing' and \
+        record.created_at <= now - timedelta(seconds=config.get('IDEMPOTENCY_PROCESSING_TIMEOUT', 120))
+    if record.expires_at > now and not lease_expired:
+        return record, False
+    # 按原占用时间条件更新，并发的重试只有一个能接管
+    claimed = IdempotencyKey.query.filter_by(id=record.id, created_at=record.created_at)\
+        .update(values, synchronize_session=False)
+    db.session.commit()
+    if not claimed:
+        return IdempotencyKey.query.filter_by(user_id=user_id, key=key).first(), False
+    if lease_expired:
+        current_app.logger.warning(f"idempotent - 用户 {user_id} 的幂等键处理超时，由重试接管: {key}")
+    db.session.refresh(record)
+    return record, True
+
+def _release_idempotency_key(record_id, claimed_at):
+    """处理失败时释放幂等键，允许客户端重试（已被其他请求接管时不释放）"""
+    try:
+        db.session.rollback()
+        IdempotencyKey.query.filter_by(id=record_id, created_at=claimed_at).delete(synchronize_session=False)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"idempotent - 释放幂等键失败: {str(e)}")
+
+def idempotent(f):
+    """幂等装饰器：带 Idempotency-Key 请求头的创建请求在有效期内重试时返回第一次的响应，不再执行接口逻辑和文件上传
+
+    需放在权限装饰器之后；第一次请求返回5xx或抛出异常时不记录响应，客户端可用同一个键重试。
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return f(*args, **kwargs)
+        if len(key) > 255:
+            return jsonify({
+                'code': 422,
+                'message': f'{IDEMPOTENCY_HEADER} 长度不能超过255'
+            }), 422
+
+        user_id = int(get_jwt_identity())
+        fingerprint = _request_fingerprint()
+        record, claimed = _claim_idempotency_key(user_id, key, fingerprint)
+        if not claimed:
+            if record is None or record.status == 'processing':
+                return jsonify({
+                    'code': 409,
+                    'message': '相同幂等键的请求正在处理中，请稍后重试'
+                }), 409
+            if record.fingerprint != fingerprint or record.endpoint != request.endpoint:
+                return jsonify({
+                    'code': 422,
+                    'message': f'{IDEMPOTENCY_HEADER} 已用于其他请求'
+                }), 422
+            current_app.logger.info(f"idempotent - 用户 {user_id} 重试 {request.endpoint}，返回已记录的响应")
+            response = current_app.response_class(record.response_body, status=record.response_code,
+                                                  mimetype='application/json')
+            response.headers['Idempotent-Replayed'] = 'true'
+            return response
+
+        record_id, claimed_at = record.id, record.created_at
+        try:
+            response = current_app.make_response(f(*args, **kwargs))
+        except Exception:
+            _release_idempotency_key(record_id, claimed_at)
+            raise
+        if response.status_code >= 500:
+            _release_idempotency_key(record_id, claimed_at)
+            return response
+
+        try:
+            IdempotencyKey.query.filter_by(id=record_id, created_at=claimed_at).update({
+                'status': 'completed',
+                'response_code': response.status_code,
+                'response_body': response.get_data(as_text=True)
+            }, synchronize_session=False)
+            db.session.commit()
+        except Exception as e:
+            current_app.logger.error(f"idempotent - 记录响应失败: {str(e)}", exc_info=True)
+            _release_idempotency_key(record_id, claimed_at)
+        return response
+    return decorated_function
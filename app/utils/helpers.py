@@ -1,11 +1,10 @@
 import os
-import uuid
 import json
 from datetime import datetime
 from flask import request, current_app
 from werkzeug.utils import secure_filename
-from PIL import Image, UnidentifiedImageError
-import redis
+from app.utils.tracing import span, traced
+from app.utils.storage import store_stream
 
 # Redis客户端
 redis_client = None
@@ -14,7 +13,13 @@ def get_redis_client():
     """获取Redis客户端实例"""
     global redis_client
     if redis_client is None:
-        redis_client = redis.Redis.from_url(current_app.config.get('REDIS_URL', 'redis://localhost:6379/0'))
+        import redis
+        timeout = current_app.config.get('REDIS_SOCKET_TIMEOUT', 2)
+        redis_client = redis.Redis.from_url(
+            current_app.config.get('REDIS_URL', 'redis://localhost:6379/0'),
+            socket_connect_timeout=timeout,
+            socket_timeout=timeout
+        )
     return redis_client
 
 def get_client_ip():
@@ -39,49 +44,21 @@ def allowed_file(filename, file_type):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS[file_type]
 
+@traced('handle_file_upload')
 def handle_file_upload(file, file_type):
-    """处理文件上传"""
+    """保存上传文件的原始内容并返回URL（缩略图等由后台任务生成，见 MediaService）"""
     if not file or not allowed_file(file.filename, file_type):
         return None
     
     try:
-        # 生成唯一文件名
         filename = secure_filename(file.filename)
         name, ext = os.path.splitext(filename)
-        unique_filename = f"{uuid.uuid4().hex}{ext}"
-        
-        # 创建上传目录
-        upload_folder = os.path.join(current_app.config['UPLOAD_FOLDER'], file_type)
-        os.makedirs(upload_folder, exist_ok=True)
-        
-        file_path = os.path.join(upload_folder, unique_filename)
-        file.save(file_path)
-        
-        # 如果是图片，生成缩略图
-        if file_type == 'image':
-            generate_thumbnail(file_path)
-        
-        # 返回文件URL
-        return f"/static/uploads/{file_type}/{unique_filename}"
+        # 按内容去重保存，返回的URL格式不变
+        return store_stream(file.stream, file_type, ext)
     except Exception as e:
         current_app.logger.error(f"文件上传失败: {str(e)}")
         return None
 
-def generate_thumbnail(image_path):
-    """生成缩略图"""
-    try:
-        with Image.open(image_path) as img:
-            img.thumbnail((300, 300), Image.Resampling.LANCZOS)
-            
-            # 保存缩略图
-            name, ext = os.path.splitext(image_path)
-            thumbnail_path = f"{name}_thumb{ext}"
-            img.save(thumbnail_path)
-    except UnidentifiedImageError:
-        current_app.logger.error(f"无法识别的图片文件: {image_path}")
-    except Exception as e:
-        current_app.logger.error(f"生成缩略图失败: {str(e)}")
-
 def cache_key(prefix, *args):
     """生成缓存键"""
     key_parts = [prefix] + [str(arg) for arg in args]
@@ -91,7 +68,8 @@ def set_cache(key, value, expire=3600):
     """设置缓存"""
     try:
         redis_client = get_redis_client()
-        redis_client.setex(key, expire, json.dumps(value, ensure_ascii=False, default=str))
+        with span('redis.SETEX', kind='client', **{'db.system': 'redis'}):
+            redis_client.setex(key, expire, json.dumps(value, ensure_ascii=False, default=str))
         return True
     except Exception as e:
         current_app.logger.error(f"设置缓存失败: {str(e)}")
@@ -101,7 +79,8 @@ def get_cache(key):
     """获取缓存"""
     try:
         redis_client = get_redis_client()
-        value = redis_client.get(key)
+        with span('redis.GET', kind='client', **{'db.system': 'redis'}):
+            value = redis_client.get(key)
         if value:
             return json.loads(value)
         return None
@@ -113,8 +92,23 @@ def delete_cache(key):
     """删除缓存"""
     try:
         redis_client = get_redis_client()
-        redis_client.delete(key)
+        with span('redis.DEL', kind='client', **{'db.system': 'redis'}):
+            redis_client.delete(key)
         return True
     except Exception as e:
         current_app.logger.error(f"删除缓存失败: {str(e)}")
-        return False
\ No newline at end of file
+        return False
+
+def compress_response(response, min_size=1024, level=6):
+    """客户端支持gzip且响应体超过min_size字节时压缩响应"""
+    import gzip
+    response.vary.add('Accept-Encoding')
+    if 'gzip' not in request.headers.get('Accept-Encoding', '').lower() \
+            or response.direct_passthrough or 'Content-Encoding' in response.headers:
+        return response
+    data = response.get_data()
+    if len(data) < min_size:
+        return response
+    response.set_data(gzip.compress(data, compresslevel=level))
+    response.headers['Content-Encoding'] = 'gzip'
+    return response
@@ -0,0 +1,11 @@
+from flask import g, has_app_context
+from flask_jwt_extended import JWTManager
+
+class BatchJWTManager(JWTManager):
+    """批量请求的子请求复用批量请求已验证过的token，每个批量请求只验证一次签名"""
+
+    def _decode_jwt_from_config(self, encoded_token, csrf_value=None, allow_expired=False):
+        verified = g.get('_batch_jwt') if has_app_context() else None
+        if verified is not None and verified[0] == encoded_token:
+            return verified[1]
+        return super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
@@ -0,0 +1,171 @@
+"""上传媒体文件的后台处理（派生图、音频转码、元数据）
+
+这里的函数只依赖文件路径，不访问Flask应用和数据库，可以在Celery worker进程或子进程池中直接调用。
+"""
+import os
+import wave
+import shutil
+import threading
+import subprocess
+
+# 子进程处理多少张图片后重启，把解码大图占用的内存还给系统
+MAX_TASKS_PER_CHILD = 50
+
+VARIANT_EXTENSIONS = {'WEBP': '.webp', 'JPEG': '.jpg', 'PNG': '.png'}
+
+# 语音转码方案：编码器、扩展名、容器格式、额外参数（opus体积最小；aac兼容不支持ogg的旧版iOS）
+AUDIO_PROFILES = {
+    'opus': ('libopus', '.ogg', 'ogg', ['-application', 'voip']),
+    'aac': ('aac', '.m4a', 'ipod', ['-movflags', '+faststart'])
+}
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def variant_path_for(path, name, fmt='WEBP'):
+    """派生图与原图同目录，文件名加 _<名称> 后缀"""
+    base = os.path.splitext(path)[0]
+    return f"{base}_{name}{VARIANT_EXTENSIONS.get(fmt.upper(), '.' + fmt.lower())}"
+
+def _draft_size(size, longest_edge):
+    """按最长边缩放后的尺寸，不放大"""
+    scale = min(1.0, longest_edge / float(max(size)))
+    return max(1, round(size[0] * scale)), max(1, round(size[1] * scale))
+
+def _save_variant(img, path, fmt, quality):
+    if fmt == 'JPEG' or img.mode not in ('RGB', 'RGBA'):
+        has_alpha = fmt != 'JPEG' and (img.mode in ('RGBA', 'LA', 'PA') or 'transparency' in img.info)
+        img = img.convert('RGBA' if has_alpha else 'RGB')
+    # 先写临时文件再rename，客户端不会读到写了一半的图片
+    temp_path = f"{path}.tmp"
+    img.save(temp_path, fmt, quality=quality)
+    os.replace(temp_path, path)
+
+def process_image(path, variants=None, fmt='WEBP', quality=80):
+    """按 {名称: 最长边像素} 生成派生图并返回图片元数据；无法识别的图片抛出ValueError
+
+    原图只解码一次：JPEG按最大派生图的尺寸以draft模式解码（只解码1/2、1/4或1/8分辨率），
+    再按EXIF方向旋转，从大到小依次缩放，每个派生图都由上一个缩放得到。
+    """
+    from PIL import Image, ImageOps, UnidentifiedImageError
+    variants = variants or {'thumb': 300}
+    fmt = fmt.upper()
+    try:
+        with Image.open(path) as img:
+            orientation = img.getexif().get(0x0112, 1)
+            # 宽高为按EXIF方向旋转后的显示尺寸
+            width, height = (img.height, img.width) if orientation in (5, 6, 7, 8) else img.size
+            metadata = {'width': width, 'height': height, 'format': img.format, 'mode': img.mode,
+                        'orientation': orientation}
+            img.draft(img.mode, _draft_size(img.size, max(variants.values())))
+            current = ImageOps.exif_transpose(img)
+    except UnidentifiedImageError:
+        raise ValueError('无法识别的图片文件')
+    except (SyntaxError, Image.DecompressionBombError) as e:
+        raise ValueError(f'无法解码的图片文件: {str(e)}')
+
+    metadata['variants'] = {}
+    for name, edge in sorted(variants.items(), key=lambda item: item[1], reverse=True):
+        current.thumbnail(_draft_size((width, height), edge), Image.Resampling.LANCZOS, reducing_gap=2.0)
+        variant_path = variant_path_for(path, name, fmt)
+        _save_variant(current, variant_path, fmt, quality)
+        metadata['variants'][name] = {
+            'path': variant_path,
+            'width': current.width,
+            'height': current.height,
+            'bytes': os.path.getsize(variant_path)
+        }
+    return metadata
+
+def probe_audio(path):
+    """返回音频元数据；WAV文件读取时长，其他格式只返回格式"""
+    ext = os.path.splitext(path)[1].lower().lstrip('.')
+    metadata = {'format': ext}
+    if ext == 'wav':
+        try:
+            with wave.open(path, 'rb') as audio:
+                metadata['duration_seconds'] = round(audio.getnframes() / float(audio.getframerate()), 3)
+                metadata['channels'] = audio.getnchannels()
+                metadata['sample_rate'] = audio.getframerate()
+        except (wave.Error, EOFError):
+            raise ValueError('无法识别的音频文件')
+    return metadata
+
+def probe_duration(path, ffprobe='ffprobe'):
+    """用ffprobe读取时长（秒），没有ffprobe或无法读取时返回None"""
+    executable = shutil.which(ffprobe)
+    if not executable:
+        return None
+    try:
+        result = subprocess.run([executable, '-v', 'error', '-show_entries', 'format=duration', '-of', 'csv=p=0', path],
+                                check=True, capture_output=True, timeout=60)
+        return round(float(result.stdout.decode().strip()), 3)
+    except (subprocess.SubprocessError, ValueError):
+        return None
+
+def transcode_audio(path, codec='opus', bitrate='24k', sample_rate=16000, ffmpeg='ffmpeg', ffprobe='ffprobe',
+                    timeout=600):
+    """用本地ffmpeg把录音转码为单声道语音，输出与原文件同目录的 <文件名>_speech.<扩展名>
+
+    返回 {path, bytes, duration_seconds, codec, bitrate}；没有ffmpeg或转码后不比原文件小时返回None，
+    转码失败抛出ValueError。
+    """
+    executable = shutil.which(ffmpeg)
+    if not executable:
+        return None
+    encoder, ext, container, extra = AUDIO_PROFILES[codec]
+    output = f"{os.path.splitext(path)[0]}_speech{ext}"
+    temp_path = f"{output}.tmp"
+    command = [executable, '-nostdin', '-hide_banner', '-loglevel', 'error', '-y', '-i', path,
+               '-vn', '-map_metadata', '-1', '-ac', '1', '-ar', str(sample_rate),
+               '-c:a', encoder, '-b:a', bitrate] + extra + ['-f', container, temp_path]
+    try:
+        subprocess.run(command, check=True, capture_output=True, timeout=timeout)
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        if isinstance(e, subprocess.TimeoutExpired):
+            raise ValueError('音频转码超时')
+        raise ValueError(f"音频转码失败: {e.stderr.decode(errors='replace').strip()[-200:]}")
+
+    size = os.path.getsize(temp_path)
+    if size >= os.path.getsize(path):
+        os.remove(temp_path)
+        return None
+    os.replace(temp_path, output)
+    return {
+        'path': output,
+        'bytes': size,
+        'duration_seconds': probe_duration(output, ffprobe),
+        'codec': codec,
+        'bitrate': bitrate
+    }
+
+def _get_pool(workers):
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                import multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
+                # spawn启动的子进程不继承父进程的数据库连接和Celery状态
+                _pool = ProcessPoolExecutor(max_workers=workers,
+                                            mp_context=multiprocessing.get_context('spawn'),
+                                            max_tasks_per_child=MAX_TASKS_PER_CHILD)
+    return _pool
+
+def reset_pool():
+    """fork后或子进程池损坏时丢弃进程池，下次使用时重建"""
+    global _pool
+    _pool = None
+
+def run_in_pool(workers, func, *args, **kwargs):
+    """在子进程池中执行并等待结果，解码大图的峰值内存不留在调用进程；workers为0时在当前进程执行"""
+    if not workers:
+        return func(*args, **kwargs)
+    from concurrent.futures.process import BrokenProcessPool
+    try:
+        return _get_pool(workers).submit(func, *args, **kwargs).result()
+    except BrokenProcessPool:
+        reset_pool()
+        raise OSError('图片处理子进程异常退出')
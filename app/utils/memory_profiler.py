@@ -0,0 +1,121 @@
+import random
+import threading
+import tracemalloc
+from collections import Counter, defaultdict
+from flask import g, request, current_app
+from app.utils.metrics import REQUEST_PEAK_MEMORY, EXCLUDED_ENDPOINTS
+
+# 排除tracemalloc和本模块自身的分配
+_SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+)
+
+class EndpointAllocations:
+    """按端点汇总的内存分配统计"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sites = defaultdict(Counter)
+        self._site_counts = defaultdict(Counter)
+        self._requests = Counter()
+        self._snapshots = Counter()
+        self._peak_total = Counter()
+        self._peak_max = Counter()
+
+    def clear(self):
+        with self._lock:
+            for stats in (self._sites, self._site_counts, self._requests, self._snapshots,
+                          self._peak_total, self._peak_max):
+                stats.clear()
+
+    def record_peak(self, endpoint, peak):
+        with self._lock:
+            self._requests[endpoint] += 1
+            self._peak_total[endpoint] += peak
+            self._peak_max[endpoint] = max(self._peak_max[endpoint], peak)
+
+    def record_sites(self, endpoint, stats):
+        with self._lock:
+            self._snapshots[endpoint] += 1
+            for stat in stats:
+                frame = stat.traceback[0]
+                site = f'{frame.filename}:{frame.lineno}'
+                self._sites[endpoint][site] += stat.size_diff
+                self._site_counts[endpoint][site] += stat.count_diff
+
+    def report(self, top_n=10):
+        """按平均峰值内存从高到低返回各端点的统计"""
+        with self._lock:
+            result = []
+            for endpoint, requests in self._requests.items():
+                snapshots = self._snapshots[endpoint]
+                result.append({
+                    'endpoint': endpoint,
+                    'requests': requests,
+                    'avg_peak_bytes': int(self._peak_total[endpoint] / requests),
+                    'max_peak_bytes': self._peak_max[endpoint],
+                    'snapshots': snapshots,
+                    'top_sites': [
+                        {
+                            'site': site,
+                            'avg_size_bytes': int(size / snapshots),
+                            'avg_count': round(self._site_counts[endpoint][site] / snapshots, 1)
+                        }
+                        for site, size in self._sites[endpoint].most_common(top_n)
+                        if size > 0
+                    ]
+                })
+        result.sort(key=lambda item: item['avg_peak_bytes'], reverse=True)
+        return result
+
+endpoint_allocations = EndpointAllocations()
+
+# tracemalloc的峰值是进程级的，reset_peak会影响其他线程中正在采样的请求，
+# 因此同一时刻只采样一个请求，锁被占用时跳过本次请求
+_sample_lock = threading.Lock()
+
+def _before_request():
+    if not tracemalloc.is_tracing() or request.endpoint in EXCLUDED_ENDPOINTS:
+        return
+    if not _sample_lock.acquire(blocking=False):
+        return
+    g._mem_start = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    # 快照开销较大，只对部分请求采集分配位置
+    if random.random() < current_app.config.get('MEMORY_PROFILING_SAMPLE_RATE', 0.1):
+        g._mem_snapshot = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+
+def _teardown_request(exc):
+    start = g.pop('_mem_start', None)
+    if start is None:
+        return
+    try:
+        _record_sample(start, g.pop('_mem_snapshot', None))
+    finally:
+        _sample_lock.release()
+
+def _record_sample(start, snapshot):
+    if not tracemalloc.is_tracing():
+        return
+    endpoint = request.endpoint or 'unmatched'
+
+    peak = max(tracemalloc.get_traced_memory()[1] - start, 0)
+    endpoint_allocations.record_peak(endpoint, peak)
+    REQUEST_PEAK_MEMORY.labels(request.method, endpoint).observe(peak)
+
+    if snapshot is not None:
+        after = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+        top_n = current_app.config.get('MEMORY_PROFILING_TOP_N', 10)
+        stats = [stat for stat in after.compare_to(snapshot, 'lineno') if stat.size_diff > 0]
+        endpoint_allocations.record_sites(endpoint, stats[:top_n * 2])
+
+def init_memory_profiler(app):
+    """按配置开启基于tracemalloc的请求内存分析"""
+    if not app.config.get('MEMORY_PROFILING_ENABLED'):
+        return
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(app.config.get('MEMORY_PROFILING_FRAMES', 1))
+    app.before_request(_before_request)
+    app.teardown_request(_teardown_request)
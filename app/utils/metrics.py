@@ -0,0 +1,110 @@
+import os
+import time
+from flask import g, request, has_request_context
+from prometheus_client import Counter, Gauge, Histogram, CollectorRegistry, REGISTRY, generate_latest, multiprocess
+from prometheus_client import CONTENT_TYPE_LATEST
+from app.utils.sql_events import on_after_statement
+
+# 请求级指标（按蓝图端点聚合，避免URL参数导致标签爆炸）
+REQUEST_LATENCY = Histogram(
+    'recorder_http_request_duration_seconds',
+    '请求处理耗时（秒）',
+    ['method', 'endpoint'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+REQUEST_COUNT = Counter(
+    'recorder_http_requests_total',
+    '请求总数',
+    ['method', 'endpoint', 'status']
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    'recorder_http_requests_in_progress',
+    '正在处理的请求数',
+    ['method', 'endpoint'],
+    multiprocess_mode='livesum'
+)
+REQUEST_DB_TIME = Histogram(
+    'recorder_http_request_db_seconds',
+    '单个请求内数据库耗时（秒）',
+    ['method', 'endpoint'],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+REQUEST_DB_QUERIES = Histogram(
+    'recorder_http_request_db_queries',
+    '单个请求内SQL语句数',
+    ['method', 'endpoint'],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144)
+)
+REQUEST_PEAK_MEMORY = Histogram(
+    'recorder_http_request_peak_memory_bytes',
+    '单个请求内Python内存分配峰值（字节，需开启MEMORY_PROFILING_ENABLED）',
+    ['method', 'endpoint'],
+    buckets=(64e3, 256e3, 1e6, 4e6, 16e6, 64e6, 256e6)
+)
+
+# 不统计的端点（Prometheus抓取本身）
+EXCLUDED_ENDPOINTS = {'metrics.get_metrics'}
+
+def _endpoint_label():
+    return request.endpoint or 'unmatched'
+
+def _should_track():
+    return has_request_context() and getattr(g, '_metrics_start', None) is not None
+
+@on_after_statement
+def _record_statement(conn, statement, parameters, context, elapsed):
+    """累计当前请求的数据库耗时和语句数"""
+    if not _should_track():
+        return
+    g.db_query_count += 1
+    g.db_time += elapsed
+
+def _before_request():
+    if request.endpoint in EXCLUDED_ENDPOINTS:
+        return
+    g._metrics_start = time.perf_counter()
+    g._metrics_recorded = False
+    g.db_query_count = 0
+    g.db_time = 0.0
+    REQUESTS_IN_PROGRESS.labels(request.method, _endpoint_label()).inc()
+
+def _observe(status_code):
+    endpoint = _endpoint_label()
+    elapsed = time.perf_counter() - g._metrics_start
+    REQUEST_LATENCY.labels(request.method, endpoint).observe(elapsed)
+    REQUEST_COUNT.labels(request.method, endpoint, str(status_code)).inc()
+    REQUEST_DB_TIME.labels(request.method, endpoint).observe(g.db_time)
+    REQUEST_DB_QUERIES.labels(request.method, endpoint).observe(g.db_query_count)
+    g._metrics_recorded = True
+
+def _after_request(response):
+    if _should_track():
+        _observe(response.status_code)
+    return response
+
+def _teardown_request(exc):
+    if not _should_track():
+        return
+    # 未捕获异常时after_request不会执行，这里补记为500
+    if not g._metrics_recorded:
+        _observe(500)
+    REQUESTS_IN_PROGRESS.labels(request.method, _endpoint_label()).dec()
+    g._metrics_start = None
+
+def init_metrics(app):
+    """注册请求指标采集中间件"""
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+
+def generate_metrics():
+    """生成Prometheus文本格式的指标数据"""
+    # gunicorn多进程模式下从共享目录汇总各worker的指标
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,214 @@
+import os
+import sys
+import json
+import time
+import uuid
+import threading
+from collections import Counter
+from functools import lru_cache
+from datetime import datetime
+from flask import g, request, current_app
+from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+from app.utils.decorators import admin_required
+
+@lru_cache(maxsize=4096)
+def _frame_label(code):
+    """生成火焰图中的帧名称（不含分号）"""
+    filename = code.co_filename
+    for path in sys.path:
+        if path and filename.startswith(path):
+            filename = os.path.relpath(filename, path)
+            break
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(';', ',')
+
+class SamplingProfiler:
+    """采样分析器：后台线程定时采集目标线程的调用栈"""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.stacks = Counter()
+        self._thread_id = threading.get_ident()
+        self._stop = threading.Event()
+        self._sampler = None
+
+    def start(self):
+        self._sampler = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+        self._sampler.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+
+    def collapsed(self):
+        return self.stacks
+
+class TracingProfiler:
+    """确定性分析器：记录每个调用栈的自身耗时（微秒）"""
+
+    def __init__(self):
+        self.stacks = Counter()
+        self._stack = []
+        self._last = None
+
+    def start(self):
+        self._last = time.perf_counter()
+        sys.setprofile(self._profile)
+
+    def stop(self):
+        sys.setprofile(None)
+        self._charge(time.perf_counter())
+
+    def _charge(self, now):
+        if self._stack:
+            self.stacks[';'.join(self._stack)] += (now - self._last) * 1e6
+        self._last = now
+
+    def _profile(self, frame, event, arg):
+        now = time.perf_counter()
+        if event == 'call':
+            self._charge(now)
+            self._stack.append(_frame_label(frame.f_code))
+        elif event == 'c_call':
+            self._charge(now)
+            self._stack.append(f"{getattr(arg, '__qualname__', repr(arg))} (builtin)".replace(';', ','))
+        elif event in ('return', 'c_return', 'c_exception'):
+            self._charge(now)
+            if self._stack:
+                self._stack.pop()
+
+    def collapsed(self):
+        return Counter({stack: int(weight) for stack, weight in self.stacks.items() if int(weight) > 0})
+
+class ProfileStore:
+    """基于目录的分析结果存储，多个worker共享"""
+
+    def __init__(self, directory, max_profiles=50):
+        self.directory = directory
+        self.max_profiles = max_profiles
+
+    def save(self, meta, stacks):
+        os.makedirs(self.directory, exist_ok=True)
+        profile_id = meta['id']
+        with open(os.path.join(self.directory, f'{profile_id}.collapsed'), 'w', encoding='utf-8') as f:
+            for stack, count in stacks.most_common():
+                f.write(f'{stack} {count}\n')
+        with open(os.path.join(self.directory, f'{profile_id}.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        self._prune()
+
+    def list(self):
+        if not os.path.isdir(self.directory):
+            return []
+        metas = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.json'):
+                try:
+                    with open(os.path.join(self.directory, name), encoding='utf-8') as f:
+                        metas.append(json.load(f))
+                except (OSError, ValueError):
+                    continue
+        metas.sort(key=lambda m: m['created_at'], reverse=True)
+        return metas
+
+    def load(self, profile_id):
+        # profile_id来自URL，只允许十六进制字符
+        if not profile_id or not all(c in '0123456789abcdef' for c in profile_id):
+            return None
+        path = os.path.join(self.directory, f'{profile_id}.collapsed')
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding='utf-8') as f:
+            return f.read()
+
+    def _prune(self):
+        for meta in self.list()[self.max_profiles:]:
+            for ext in ('.collapsed', '.json'):
+                try:
+                    os.remove(os.path.join(self.directory, meta['id'] + ext))
+                except OSError:
+                    pass
+
+def get_profile_store():
+    return ProfileStore(
+        current_app.config['PROFILE_DIR'],
+        current_app.config.get('PROFILE_STORE_SIZE', 50)
+    )
+
+def _is_admin_request():
+    """校验请求是否携带管理员令牌"""
+    try:
+        verify_jwt_in_request()
+    except Exception:
+        return False
+    return admin_required(lambda: None)() is None
+
+def _before_request():
+    # 未携带X-Profile头的请求只有这一次字典查找的开销
+    mode = request.headers.get('X-Profile')
+    if not mode or not _is_admin_request():
+        return
+
+    if mode == 'trace':
+        profiler = TracingProfiler()
+    else:
+        mode = 'sample'
+        profiler = SamplingProfiler(current_app.config.get('PROFILE_SAMPLE_INTERVAL_MS', 5) / 1000.0)
+    g._profiler = profiler
+    g._profile_mode = mode
+    g._profile_start = time.perf_counter()
+    profiler.start()
+
+def _finish_profile(status_code):
+    profiler = g.pop('_profiler', None)
+    if profiler is None:
+        return None
+    profiler.stop()
+
+    meta = {
+        'id': uuid.uuid4().hex,
+        'mode': g._profile_mode,
+        'method': request.method,
+        'path': request.path,
+        'endpoint': request.endpoint,
+        'status': status_code,
+        'duration_ms': round((time.perf_counter() - g._profile_start) * 1000, 3),
+        'admin_id': get_jwt_identity(),
+        'created_at': datetime.utcnow().isoformat()
+    }
+    try:
+        get_profile_store().save(meta, profiler.collapsed())
+    except OSError as e:
+        current_app.logger.error(f"保存性能分析结果失败: {str(e)}")
+        return None
+    current_app.logger.info(f"请求性能分析完成: {meta['method']} {meta['path']}, profile_id={meta['id']}")
+    return meta['id']
+
+def _after_request(response):
+    if g.get('_profiler') is not None:
+        profile_id = _finish_profile(response.status_code)
+        if profile_id:
+            response.headers['X-Profile-Id'] = profile_id
+    return response
+
+def _teardown_request(exc):
+    # 视图抛出未处理异常时也要停止分析器
+    if g.get('_profiler') is not None:
+        _finish_profile(500)
+
+def init_profiler(app):
+    """注册按需请求性能分析（X-Profile: sample|trace，需管理员令牌）"""
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
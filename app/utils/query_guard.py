@@ -0,0 +1,117 @@
+import re
+from collections import Counter
+from contextlib import contextmanager
+from functools import lru_cache
+from flask import g, request, current_app, has_request_context
+from app.utils.sql_events import on_before_statement
+
+class QueryBudgetExceeded(Exception):
+    """请求内SQL语句数超出预算（N+1查询）"""
+    pass
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\bIN\s*\((?:\s*(?:\?|%s|%\(\w+\)s|:\w+)\s*,?)+\)", re.IGNORECASE)
+_POSTCOMPILE_RE = re.compile(r"\(__\[POSTCOMPILE_\w+\]\)")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+@lru_cache(maxsize=2048)
+def normalize_sql(statement):
+    """将SQL归一化为语句结构（去掉字面量和IN列表长度差异）"""
+    sql = _STRING_RE.sub('?', statement)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = _POSTCOMPILE_RE.sub('(?)', sql)
+    sql = _IN_LIST_RE.sub('IN (?)', sql)
+    return _WHITESPACE_RE.sub(' ', sql).strip()
+
+class StatementStats:
+    """按语句结构统计SQL执行次数"""
+
+    def __init__(self):
+        self.total = 0
+        self.shapes = Counter()
+
+    def record(self, statement):
+        shape = normalize_sql(statement)
+        self.total += 1
+        self.shapes[shape] += 1
+        return shape, self.shapes[shape]
+
+    def repeated(self, threshold):
+        """返回执行次数超过阈值的语句结构"""
+        return {shape: count for shape, count in self.shapes.items() if count > threshold}
+
+# 测试中通过capture_statements()收集的统计对象
+_active_captures = []
+
+@contextmanager
+def capture_statements():
+    """收集代码块内执行的全部SQL语句，供测试断言语句数
+
+    with capture_statements() as stats:
+        client.get('/api/v1/families')
+    assert stats.total <= 5
+    """
+    stats = StatementStats()
+    _active_captures.append(stats)
+    try:
+        yield stats
+    finally:
+        _active_captures.remove(stats)
+
+def statement_budget(max_statements):
+    """声明视图函数单次请求允许执行的SQL语句数上限"""
+    def decorator(f):
+        f._statement_budget = max_statements
+        return f
+    return decorator
+
+def get_statement_budget(endpoint):
+    """获取端点声明的语句预算"""
+    view = current_app.view_functions.get(endpoint)
+    return getattr(view, '_statement_budget', None)
+
+def _report(message):
+    action = current_app.config.get('N_PLUS_ONE_ACTION')
+    if action == 'raise':
+        raise QueryBudgetExceeded(message)
+    current_app.logger.warning(message)
+
+@on_before_statement
+def _check_statement(conn, statement, parameters, context):
+    """检测同一请求内重复执行的同结构语句"""
+    for stats in _active_captures:
+        stats.record(statement)
+
+    if not has_request_context():
+        return
+    stats = g.get('_statement_stats')
+    if stats is None:
+        return
+
+    shape, count = stats.record(statement)
+    threshold = current_app.config.get('N_PLUS_ONE_THRESHOLD', 10)
+    # 每种语句结构只在首次超出阈值时报告一次
+    if count == threshold + 1:
+        _report(f"疑似N+1查询: {request.endpoint} 中同结构语句执行超过{threshold}次: {shape}")
+
+def _before_request():
+    g._statement_stats = StatementStats()
+
+def _after_request(response):
+    stats = g.get('_statement_stats')
+    if stats is None:
+        return response
+    g._statement_stats = None
+
+    budget = get_statement_budget(request.endpoint)
+    if budget is not None and stats.total > budget:
+        _report(f"SQL语句数超出预算: {request.endpoint} 执行了{stats.total}条语句，预算为{budget}条")
+    return response
+
+def init_query_guard(app):
+    """在开发和测试环境启用N+1检测与语句预算检查"""
+    if not app.config.get('N_PLUS_ONE_ACTION'):
+        return
+    app.before_request(_before_request)
+    app.after_request(_after_request)
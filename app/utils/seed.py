@@ -0,0 +1,409 @@
+import json
+import time
+import random
+from datetime import date, datetime, timedelta, time as dtime
+from werkzeug.security import generate_password_hash
+from app import db
+from app.models.user import User, Recorder
+from app.models.patient import Family, Patient
+from app.models.appointment import ServicePackage, PatientSubscription, Appointment, Payment
+from app.models.health_record import HealthRecord
+from app.models.hospital import PartnerHospital, HospitalDepartment, HospitalDoctor, HospitalAppointment
+
+SURNAMES = '王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗郑梁谢宋唐许韩冯邓曹彭曾肖田董袁潘于蒋蔡余杜叶程苏魏吕丁任沈姚卢'
+GIVEN_NAMES = '伟芳娜秀英敏静丽强磊军洋勇艳杰娟涛明超兰霞平刚桂英华玉梅建国淑珍德福海燕志红春兰'
+STREETS = ['人民路', '解放路', '建设路', '中山路', '和平街', '幸福里', '光明路', '长江路', '黄河路', '新华街']
+DISTRICTS = ['东城区', '西城区', '南湖区', '北苑区', '高新区', '滨江区']
+CONDITIONS = ['高血压', '糖尿病', '冠心病', '高血脂', '慢阻肺', '骨质疏松', '关节炎', '脑卒中后遗症']
+MEDICATIONS = ['硝苯地平', '二甲双胍', '阿司匹林', '阿托伐他汀', '胰岛素', '钙片', '氨氯地平']
+DEPARTMENTS = ['心内科', '内分泌科', '神经内科', '呼吸内科', '骨科', '老年病科', '康复科', '消化内科']
+DOCTOR_TITLES = ['主任医师', '副主任医师', '主治医师', '住院医师']
+PAYMENT_METHODS = ['wechat', 'alipay', 'cash', 'bank_card']
+
+# 家庭人数分布（居家养老家庭以1-2人为主）
+FAMILY_SIZE_WEIGHTS = ((1, 0.30), (2, 0.40), (3, 0.15), (4, 0.10), (5, 0.05))
+# 与户主关系及年龄范围（按家庭中的成员序号）
+MEMBER_ROLES = (('户主', 60, 92), ('配偶', 58, 90), ('子女', 30, 62), ('孙辈', 4, 30), ('其他', 20, 80))
+
+# 无套餐数据时使用的10级套餐（名称、月费、次/月），与init_service_packages.py一致
+PACKAGE_TIERS = (
+    ('贴心关怀型', 98, 1), ('基础保障型', 168, 2), ('健康守护型', 298, 4), ('专业护理型', 498, 6),
+    ('贴心陪护型', 798, 8), ('高级护理型', 1280, 12), ('专家指导型', 1880, 16), ('专属护理型', 2280, 20),
+    ('全程陪护型', 2680, 25), ('尊享专家型', 2980, 30)
+)
+# 低等级套餐订阅者占多数
+PACKAGE_LEVEL_WEIGHTS = (30, 25, 15, 10, 7, 5, 3, 2, 2, 1)
+
+# 上门时间段：上午和下午各一个高峰
+VISIT_SLOTS = [dtime(h, m) for h in range(8, 18) for m in (0, 30) if h != 12]
+VISIT_SLOT_WEIGHTS = [3 if s.hour in (9, 10, 14, 15) else 1 for s in VISIT_SLOTS]
+
+class SeedGenerator:
+    """生成大规模模拟数据，使用批量INSERT写入，同一随机种子生成的数据一致"""
+
+    def __init__(self, seed=42, anchor_date=None, history_days=90, future_days=14,
+                 chunk_size=5000, password='123456', echo=print):
+        self.rng = random.Random(seed)
+        self.anchor_date = anchor_date or date.today()
+        self.history_days = history_days
+        self.future_days = future_days
+        self.chunk_size = chunk_size
+        self.password = password
+        self.echo = echo
+        self.counts = {}
+        self._next_ids = {}
+
+    # ========== 基础工具 ==========
+
+    def _reserve_ids(self, model):
+        """从当前最大ID之后连续分配主键，便于不回查数据库直接关联外键"""
+        table = model.__table__
+        if table.name not in self._next_ids:
+            max_id = db.session.execute(db.select(db.func.max(table.c.id))).scalar() or 0
+            self._next_ids[table.name] = max_id + 1
+        return table.name
+
+    def _new_id(self, key):
+        value = self._next_ids[key]
+        self._next_ids[key] = value + 1
+        return value
+
+    def _bulk_insert(self, model, rows):
+        """按块执行executemany插入"""
+        table = model.__table__
+        start = time.perf_counter()
+        total = 0
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) >= self.chunk_size:
+                db.session.execute(table.insert(), chunk)
+                total += len(chunk)
+                chunk = []
+        if chunk:
+            db.session.execute(table.insert(), chunk)
+            total += len(chunk)
+        db.session.commit()
+        self.counts[table.name] = self.counts.get(table.name, 0) + total
+        self.echo(f'{table.name}: {total} 条 ({time.perf_counter() - start:.1f}s)')
+
+    def _name(self):
+        rng = self.rng
+        return rng.choice(SURNAMES) + ''.join(rng.choice(GIVEN_NAMES) for _ in range(rng.choice((1, 2))))
+
+    def _address(self):
+        rng = self.rng
+        return f'{rng.choice(DISTRICTS)}{rng.choice(STREETS)}{rng.randint(1, 300)}号{rng.randint(1, 30)}栋{rng.randint(101, 2806)}室'
+
+    def _phone(self, prefix, serial):
+        return f'{prefix}{serial:09d}'[-11:]
+
+    def _weighted(self, pairs):
+        values, weights = zip(*pairs)
+        return self.rng.choices(values, weights)[0]
+
+    # ========== 各类数据 ==========
+
+    def _ensure_packages(self):
+        packages = ServicePackage.query.filter_by(is_active=True).order_by(ServicePackage.package_level).all()
+        if not packages:
+            key = self._reserve_ids(ServicePackage)
+            self._bulk_insert(ServicePackage, ({
+                'id': self._new_id(key),
+                'name': name,
+                'description': f'{name}上门服务套餐',
+                'price': price,
+                'duration_days': 30,
+                'service_frequency': frequency,
+                'package_level': level,
+                'is_active': True,
+                'is_system_default': True
+            } for level, (name, price, frequency) in enumerate(PACKAGE_TIERS, start=1)))
+            packages = ServicePackage.query.filter_by(is_active=True).order_by(ServicePackage.package_level).all()
+        return [(p.id, p.name, float(p.price), p.service_frequency, p.duration_days) for p in packages]
+
+    def _seed_recorders(self, count):
+        user_key = self._reserve_ids(User)
+        recorder_key = self._reserve_ids(Recorder)
+        # 接口以登录用户ID作为记录员ID，生成的记录员ID与用户ID保持一致
+        next_id = max(self._next_ids[user_key], self._next_ids[recorder_key])
+        self._next_ids[user_key] = self._next_ids[recorder_key] = next_id + count
+        password_hash = generate_password_hash(self.password)
+        users, recorders = [], []
+        for user_id in range(next_id, next_id + count):
+            users.append({
+                'id': user_id,
+                'username': f'seed_recorder_{user_id}',
+                'phone': self._phone('17', user_id),
+                'password_hash': password_hash,
+                'role': 'recorder',
+                'name': self._name(),
+                'status': 'active'
+            })
+            recorders.append({
+                'id': user_id,
+                'user_id': user_id,
+                'employee_id': f'SEED{user_id:08d}',
+                'work_area': json.dumps([self.rng.choice(DISTRICTS)], ensure_ascii=False),
+                'is_on_duty': self.rng.random() < 0.9
+            })
+        self._bulk_insert(User, users)
+        self._bulk_insert(Recorder, recorders)
+        return [row['id'] for row in recorders]
+
+    def _seed_families(self, count, recorder_ids, packages):
+        """生成家庭和成员，返回订阅了套餐的成员列表"""
+        rng = self.rng
+        family_key = self._reserve_ids(Family)
+        patient_key = self._reserve_ids(Patient)
+        families, patients, subscribers = [], [], []
+        level_weights = [PACKAGE_LEVEL_WEIGHTS[min(i, len(PACKAGE_LEVEL_WEIGHTS) - 1)] for i in range(len(packages))]
+
+        for _ in range(count):
+            family_id = self._new_id(family_key)
+            size = self._weighted(FAMILY_SIZE_WEIGHTS)
+            head = self._name()
+            families.append({
+                'id': family_id,
+                'householdHead': head,
+                'address': self._address(),
+                'phone': self._phone('15', family_id),
+                'emergency_contact': self._name(),
+                'emergency_phone': self._phone('16', family_id)
+            })
+            # 同一家庭由同一记录员负责
+            recorder_id = rng.choice(recorder_ids)
+            for index in range(size):
+                relationship, min_age, max_age = MEMBER_ROLES[min(index, len(MEMBER_ROLES) - 1)]
+                age = rng.randint(min_age, max_age)
+                conditions = rng.sample(CONDITIONS, k=min(len(CONDITIONS), int(rng.expovariate(1.5) * (age / 60)))) if age >= 50 else []
+                package = packages[rng.choices(range(len(packages)), level_weights)[0]]
+                patient_id = self._new_id(patient_key)
+                patients.append({
+                    'id': patient_id,
+                    'family_id': family_id,
+                    'name': head if index == 0 else self._name(),
+                    'age': age,
+                    'gender': rng.choice(('男', '女')),
+                    'relationship': relationship,
+                    'conditions': ', '.join(conditions),
+                    'medications': ', '.join(rng.sample(MEDICATIONS, k=min(len(conditions), 3))),
+                    'packageType': package[1],
+                    'paymentStatus': 'overdue' if rng.random() < 0.05 else 'normal',
+                    'is_active': True
+                })
+                # 老人几乎都订阅服务，年轻家庭成员较少订阅
+                if rng.random() < (0.9 if age >= 60 else 0.15):
+                    subscribers.append((patient_id, recorder_id, package, age))
+
+        self._bulk_insert(Family, families)
+        self._bulk_insert(Patient, patients)
+        return subscribers
+
+    def _seed_subscriptions(self, subscribers):
+        rng = self.rng
+        key = self._reserve_ids(PatientSubscription)
+        first_day = self.anchor_date - timedelta(days=self.history_days)
+        last_day = self.anchor_date + timedelta(days=self.future_days)
+        rows, schedule = [], []
+        for patient_id, recorder_id, package, age in subscribers:
+            duration = package[4] or 30
+            # 订阅起始日期早于模拟窗口，按套餐时长连续续订覆盖整个窗口
+            start = first_day - timedelta(days=rng.randint(0, duration - 1))
+            cancelled = rng.random() < 0.05
+            while start < last_day:
+                end = start + timedelta(days=duration)
+                subscription_id = self._new_id(key)
+                status = 'expired' if end <= self.anchor_date else 'active'
+                if cancelled and end > self.anchor_date:
+                    status = 'cancelled'
+                rows.append({
+                    'id': subscription_id,
+                    'patient_id': patient_id,
+                    'package_id': package[0],
+                    'recorder_id': recorder_id,
+                    'start_date': start,
+                    'end_date': end,
+                    'status': status,
+                    'payment_status': 'paid' if end <= self.anchor_date or rng.random() < 0.85 else 'unpaid'
+                })
+                if status != 'cancelled':
+                    schedule.append((patient_id, recorder_id, package, start, end))
+                start = end
+        self._bulk_insert(PatientSubscription, rows)
+        return schedule
+
+    def _visit_dates(self, start, end, frequency):
+        """在订阅周期内均匀排布上门日期，周末的大部分顺延到工作日"""
+        rng = self.rng
+        days = (end - start).days
+        step = days / max(frequency, 1)
+        for index in range(frequency):
+            day = start + timedelta(days=int(index * step + rng.uniform(0, max(step - 1, 0))))
+            if day.weekday() >= 5 and rng.random() < 0.8:
+                day += timedelta(days=7 - day.weekday())
+            if day < end:
+                yield day
+
+    def _seed_visits(self, schedule):
+        """生成预约、支付和健康记录（已完成的预约才有记录和支付）"""
+        rng = self.rng
+        appointment_key = self._reserve_ids(Appointment)
+        payment_key = self._reserve_ids(Payment)
+        record_key = self._reserve_ids(HealthRecord)
+        window_start = self.anchor_date - timedelta(days=self.history_days)
+        window_end = self.anchor_date + timedelta(days=self.future_days)
+        appointments, payments, records = [], [], []
+        baselines = {}
+
+        for patient_id, recorder_id, package, start, end in schedule:
+            package_id, _, price, frequency, _ = package
+            visit_fee = round(price / max(frequency, 1), 2)
+            if patient_id not in baselines:
+                # 每位患者有各自的体征基线，后续随访在基线附近波动
+                baselines[patient_id] = [rng.gauss(135, 15), rng.gauss(82, 8), rng.gauss(74, 8), rng.gauss(6.5, 1.5)]
+            baseline = baselines[patient_id]
+
+            for day in self._visit_dates(start, end, frequency):
+                if day < window_start or day >= window_end:
+                    continue
+                slot = rng.choices(VISIT_SLOTS, VISIT_SLOT_WEIGHTS)[0]
+                duration = rng.choice((30, 45, 60))
+                end_time = (datetime.combine(day, slot) + timedelta(minutes=duration)).time()
+                if day < self.anchor_date:
+                    status = 'completed' if rng.random() < 0.9 else rng.choice(('cancelled', 'rescheduled'))
+                else:
+                    status = 'confirmed' if rng.random() < 0.6 else 'scheduled'
+                appointment_id = self._new_id(appointment_key)
+                appointments.append({
+                    'id': appointment_id,
+                    'patient_id': patient_id,
+                    'recorder_id': recorder_id,
+                    'scheduled_date': day,
+                    'start_time': slot,
+                    'end_time': end_time,
+                    'appointment_type': 'regular' if rng.random() < 0.92 else rng.choice(('makeup', 'emergency')),
+                    'status': status
+                })
+                if status != 'completed':
+                    continue
+
+                paid_at = datetime.combine(day, end_time)
+                payments.append({
+                    'id': self._new_id(payment_key),
+                    'appointment_id': appointment_id,
+                    'patient_id': patient_id,
+                    'amount': visit_fee,
+                    'payment_method': rng.choice(PAYMENT_METHODS),
+                    'payment_status': 'paid' if rng.random() < 0.95 else 'pending',
+                    'transaction_id': f'SEED{appointment_id:012d}',
+                    'payment_date': paid_at
+                })
+
+                for i, sigma in enumerate((3, 2, 2, 0.3)):
+                    baseline[i] += rng.gauss(0, sigma) * 0.3
+                records.append({
+                    'id': self._new_id(record_key),
+                    'patient_id': patient_id,
+                    'recorder_id': recorder_id,
+                    'appointment_id': appointment_id,
+                    'visit_date': day,
+                    'visit_time': slot,
+                    'vital_signs': json.dumps({
+                        'blood_pressure': f'{round(baseline[0] + rng.gauss(0, 6))}/{round(baseline[1] + rng.gauss(0, 4))}',
+                        'heart_rate': round(baseline[2] + rng.gauss(0, 5)),
+                        'temperature': round(rng.gauss(36.5, 0.25), 1),
+                        'blood_sugar': round(max(baseline[3] + rng.gauss(0, 0.6), 3.0), 1)
+                    }, ensure_ascii=False),
+                    'notes': '常规随访，状态平稳' if rng.random() < 0.8 else '建议复查',
+                    'photos': '[]'
+                })
+
+        self._bulk_insert(Appointment, appointments)
+        self._bulk_insert(Payment, payments)
+        self._bulk_insert(HealthRecord, records)
+
+    def _seed_hospitals(self, count, subscribers):
+        rng = self.rng
+        hospital_key = self._reserve_ids(PartnerHospital)
+        department_key = self._reserve_ids(HospitalDepartment)
+        doctor_key = self._reserve_ids(HospitalDoctor)
+        appointment_key = self._reserve_ids(HospitalAppointment)
+        hospitals, departments, doctors, appointments = [], [], [], []
+        department_doctors = []
+
+        for index in range(count):
+            hospital_id = self._new_id(hospital_key)
+            names = rng.sample(DEPARTMENTS, k=rng.randint(3, len(DEPARTMENTS)))
+            hospitals.append({
+                'id': hospital_id,
+                'name': f'{rng.choice(DISTRICTS)}第{index + 1}人民医院',
+                'address': self._address(),
+                'phone': self._phone('0571', hospital_id),
+                'level': rng.choice(('三级甲等', '三级乙等', '二级甲等')),
+                'departments': json.dumps(names, ensure_ascii=False),
+                'cooperation_status': 'active'
+            })
+            for name in names:
+                department_id = self._new_id(department_key)
+                departments.append({
+                    'id': department_id,
+                    'hospital_id': hospital_id,
+                    'name': name,
+                    'available_times': json.dumps(['08:00-12:00', '14:00-17:00']),
+                    'is_active': True
+                })
+                doctor_ids = []
+                for _ in range(rng.randint(2, 6)):
+                    doctor_id = self._new_id(doctor_key)
+                    doctor_ids.append(doctor_id)
+                    doctors.append({
+                        'id': doctor_id,
+                        'hospital_id': hospital_id,
+                        'department_id': department_id,
+                        'name': self._name(),
+                        'title': rng.choice(DOCTOR_TITLES),
+                        'specialty': name,
+                        'consultation_fee': rng.choice((20, 30, 50, 80, 100)),
+                        'is_available': True
+                    })
+                department_doctors.append((hospital_id, department_id, doctor_ids))
+
+        # 约每月有5%的服务对象需要记录员代约医院号
+        months = (self.history_days + self.future_days) / 30
+        for patient_id, recorder_id, _, _ in subscribers:
+            for _ in range(int(months * 0.05) + (rng.random() < (months * 0.05) % 1)):
+                hospital_id, department_id, doctor_ids = rng.choice(department_doctors)
+                day = self.anchor_date + timedelta(days=rng.randint(-self.history_days, self.future_days - 1))
+                appointment_id = self._new_id(appointment_key)
+                appointments.append({
+                    'id': appointment_id,
+                    'patient_id': patient_id,
+                    'recorder_id': recorder_id,
+                    'hospital_id': hospital_id,
+                    'department_id': department_id,
+                    'doctor_id': rng.choice(doctor_ids),
+                    'appointment_date': day,
+                    'appointment_time': rng.choice(VISIT_SLOTS[:14]),
+                    'status': rng.choice(('completed', 'completed', 'cancelled')) if day < self.anchor_date else rng.choice(('pending', 'confirmed')),
+                    'appointment_number': f'H{appointment_id:010d}',
+                    'fee': rng.choice((20, 30, 50))
+                })
+
+        self._bulk_insert(PartnerHospital, hospitals)
+        self._bulk_insert(HospitalDepartment, departments)
+        self._bulk_insert(HospitalDoctor, doctors)
+        self._bulk_insert(HospitalAppointment, appointments)
+
+    def run(self, recorders=20, families=500, hospitals=5):
+        """按顺序生成全部数据，返回各表插入条数"""
+        start = time.perf_counter()
+        packages = self._ensure_packages()
+        recorder_ids = self._seed_recorders(recorders)
+        subscribers = self._seed_families(families, recorder_ids, packages)
+        schedule = self._seed_subscriptions(subscribers)
+        self._seed_visits(schedule)
+        if hospitals:
+            self._seed_hospitals(hospitals, subscribers)
+        self.echo(f'共插入 {sum(self.counts.values())} 条数据，耗时 {time.perf_counter() - start:.1f}s')
+        return self.counts
@@ -0,0 +1,172 @@
+import json
+import math
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from flask import current_app, request, has_request_context, has_app_context
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy.pool import StaticPool
+from app.utils.sql_events import on_after_statement
+from app.utils.query_guard import normalize_sql
+
+class SlowQueryLog:
+    """慢查询环形缓冲区，执行计划在后台线程中异步采集"""
+
+    def __init__(self, maxlen=1000):
+        self._records = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+        self._file_lock = threading.Lock()
+        self._plans = {}
+        self._executor = None
+        self._futures = []
+
+    def resize(self, maxlen):
+        with self._lock:
+            if self._records.maxlen != maxlen:
+                self._records = deque(self._records, maxlen=maxlen)
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+            self._plans.clear()
+
+    def add(self, record, engine=None, statement=None, parameters=None, log_file=None):
+        with self._lock:
+            self._records.append(record)
+            if record['plan'] is not None:
+                self._plans.setdefault(record['sql'], record['plan'])
+        if engine is None and not log_file:
+            return
+        # 执行计划和落盘放到后台线程，不阻塞当前请求
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='slow-query-explain')
+        future = self._executor.submit(self._capture_plan, record, engine, statement, parameters, log_file)
+        with self._lock:
+            self._futures = [f for f in self._futures if not f.done()]
+            self._futures.append(future)
+
+    def wait(self, timeout=None):
+        """等待所有执行计划采集完成（测试用）"""
+        with self._lock:
+            futures = list(self._futures)
+        for future in futures:
+            future.result(timeout=timeout)
+
+    def records(self):
+        with self._lock:
+            return list(self._records)
+
+    def _capture_plan(self, record, engine, statement, parameters, log_file):
+        shape = record['sql']
+        if engine is not None and record['plan'] is None:
+            plan = self._plans.get(shape)
+            if plan is None:
+                plan = _explain_with_engine(engine, statement, parameters)
+                if len(self._plans) >= 1000:
+                    self._plans.clear()
+                self._plans[shape] = plan
+            record['plan'] = plan
+
+        if log_file:
+            line = json.dumps(record, ensure_ascii=False, default=str)
+            with self._file_lock:
+                with open(log_file, 'a', encoding='utf-8') as f:
+                    f.write(line + '\n')
+
+    def top(self, limit=20):
+        """按语句结构汇总，返回p95耗时最高的前N个"""
+        groups = {}
+        for record in self.records():
+            groups.setdefault(record['sql'], []).append(record)
+
+        result = []
+        for shape, records in groups.items():
+            durations = sorted(r['elapsed_ms'] for r in records)
+            p95_index = max(int(math.ceil(len(durations) * 0.95)) - 1, 0)
+            latest = records[-1]
+            result.append({
+                'sql': shape,
+                'count': len(records),
+                'p95_ms': round(durations[p95_index], 3),
+                'max_ms': round(durations[-1], 3),
+                'avg_ms': round(sum(durations) / len(durations), 3),
+                'endpoints': sorted({r['endpoint'] for r in records if r['endpoint']}),
+                'last_seen': latest['timestamp'],
+                'plan': latest.get('plan')
+            })
+
+        result.sort(key=lambda item: item['p95_ms'], reverse=True)
+        return result[:limit]
+
+slow_query_log = SlowQueryLog()
+
+def _explain(dbapi_conn, dialect_name, statement, parameters):
+    """获取语句的执行计划（仅SELECT语句）"""
+    if not statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+        return None
+    prefix = 'EXPLAIN QUERY PLAN ' if dialect_name == 'sqlite' else 'EXPLAIN '
+    cursor = dbapi_conn.cursor()
+    try:
+        # 直接使用DBAPI游标，避免再次触发SQL监控事件
+        cursor.execute(prefix + statement, parameters)
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+    except Exception as e:
+        return [{'error': str(e)}]
+    finally:
+        cursor.close()
+
+def _explain_with_engine(engine, statement, parameters):
+    """从连接池取独立连接采集执行计划"""
+    dbapi_conn = engine.raw_connection()
+    try:
+        return _explain(dbapi_conn, engine.dialect.name, statement, parameters)
+    finally:
+        dbapi_conn.close()
+
+def _current_recorder_id():
+    try:
+        return get_jwt_identity()
+    except RuntimeError:
+        return None
+
+@on_after_statement
+def _record_slow_statement(conn, statement, parameters, context, elapsed):
+    """记录超过阈值的SQL语句"""
+    if not has_app_context():
+        return
+    threshold_ms = current_app.config.get('SLOW_QUERY_THRESHOLD_MS')
+    elapsed_ms = elapsed * 1000
+    if threshold_ms is None or elapsed_ms < threshold_ms:
+        return
+
+    in_request = has_request_context()
+    record = {
+        'sql': normalize_sql(statement),
+        'endpoint': request.endpoint if in_request else None,
+        'recorder_id': _current_recorder_id() if in_request else None,
+        'elapsed_ms': round(elapsed_ms, 3),
+        'timestamp': datetime.utcnow().isoformat(),
+        'plan': None
+    }
+
+    engine = None
+    if current_app.config.get('SLOW_QUERY_EXPLAIN', True) and not context.executemany:
+        if isinstance(conn.engine.pool, StaticPool):
+            # 内存SQLite只有一个共享连接，无法在后台线程使用，直接在当前连接上采集
+            record['plan'] = _explain(conn.connection, conn.engine.dialect.name, statement, parameters)
+        else:
+            engine = conn.engine
+
+    slow_query_log.add(
+        record,
+        engine=engine,
+        statement=statement,
+        parameters=parameters,
+        log_file=current_app.config.get('SLOW_QUERY_LOG_FILE')
+    )
+
+def init_slow_query_log(app):
+    """按配置调整慢查询缓冲区大小"""
+    slow_query_log.resize(app.config.get('SLOW_QUERY_BUFFER_SIZE', 1000))
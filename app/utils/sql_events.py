@@ -0,0 +1,35 @@
+import time
+from sqlalchemy import event
+
+# SQL语句执行前/后的回调列表（由各监控模块注册）
+_before_listeners = []
+_after_listeners = []
+
+def on_before_statement(func):
+    """注册SQL执行前回调: func(conn, statement, parameters, context)"""
+    _before_listeners.append(func)
+    return func
+
+def on_after_statement(func):
+    """注册SQL执行后回调: func(conn, statement, parameters, context, elapsed)"""
+    _after_listeners.append(func)
+    return func
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._statement_start = time.perf_counter()
+    for listener in _before_listeners:
+        listener(conn, statement, parameters, context)
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, '_statement_start', None)
+    elapsed = time.perf_counter() - start if start is not None else 0.0
+    for listener in _after_listeners:
+        listener(conn, statement, parameters, context, elapsed)
+
+def init_sql_events(app, db):
+    """为应用的数据库引擎挂载SQL执行事件"""
+    with app.app_context():
+        engine = db.engine
+        if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
@@ -0,0 +1,151 @@
+"""按内容寻址的上传文件存储
+
+文件内容按sha256保存一份在 <UPLOAD_FOLDER>/.objects/<前2位>/<3-4位>/<摘要>，
+返回给客户端的URL仍是 /static/uploads/<类型>/<uuid><扩展名>，该路径是对象文件的硬链接。
+相同内容只占一份磁盘空间，对象的硬链接数减1即引用计数，由文件系统原子维护。
+对象和链接都不能原地修改（缩略图等派生文件另存）。
+"""
+import os
+import uuid
+import time
+import errno
+import shutil
+import hashlib
+from flask import current_app
+
+BLOCK_SIZE = 64 * 1024
+
+def upload_folder():
+    return current_app.config['UPLOAD_FOLDER']
+
+def incoming_folder():
+    """写入中的临时文件目录，与上传目录在同一文件系统，完成时可直接rename"""
+    return current_app.config.get('UPLOAD_TEMP_FOLDER') or os.path.join(upload_folder(), '.incoming')
+
+def objects_folder():
+    return os.path.join(upload_folder(), '.objects')
+
+def object_path(digest):
+    return os.path.join(objects_folder(), digest[:2], digest[2:4], digest)
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _new_temp_path():
+    os.makedirs(incoming_folder(), exist_ok=True)
+    return os.path.join(incoming_folder(), uuid.uuid4().hex)
+
+def _link_public(digest, file_type, ext, temp_path=None, data=None):
+    """把内容放入对象库（已存在则复用）并建立对外URL对应的硬链接，返回URL"""
+    target = object_path(digest)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    folder = os.path.join(upload_folder(), file_type)
+    os.makedirs(folder, exist_ok=True)
+    name = f"{uuid.uuid4().hex}{ext}"
+    public_path = os.path.join(folder, name)
+
+    try:
+        # 相同内容已存在：只建立链接，不再写入
+        os.link(target, public_path)
+        current_app.logger.info(f"storage - 内容已存在，复用对象 {digest[:12]}")
+    except FileNotFoundError:
+        if temp_path is None:
+            temp_path = _new_temp_path()
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+        # 先写临时文件再rename，对象库中不会出现写了一半的文件
+        os.replace(temp_path, target)
+        temp_path = None
+        try:
+            os.link(target, public_path)
+        except OSError as e:
+            if e.errno not in (errno.EPERM, errno.EXDEV, errno.EMLINK, errno.ENOTSUP):
+                raise
+            shutil.copyfile(target, public_path)
+    except OSError as e:
+        # 文件系统不支持硬链接时退化为普通文件（不去重）
+        if e.errno not in (errno.EPERM, errno.EXDEV, errno.EMLINK, errno.ENOTSUP):
+            raise
+        current_app.logger.warning(f"storage - 无法创建硬链接，按普通文件保存: {str(e)}")
+        if temp_path is None:
+            with open(public_path, 'wb') as f:
+                f.write(data)
+        else:
+            os.replace(temp_path, public_path)
+            temp_path = None
+    finally:
+        if temp_path is not None and os.path.exists(temp_path):
+            os.remove(temp_path)
+    return f"/static/uploads/{file_type}/{name}"
+
+def store_stream(stream, file_type, ext):
+    """边读边计算摘要地保存上传流，返回URL
+
+    不超过 STORAGE_SPOOL_MAX_BYTES 的内容先留在内存，已存在时不产生任何写入；更大的内容写入临时文件。
+    """
+    spool_max = current_app.config.get('STORAGE_SPOOL_MAX_BYTES', 4 * 1024 * 1024)
+    digest = hashlib.sha256()
+    buffer = bytearray()
+    temp_path, temp_file = None, None
+    try:
+        for block in iter(lambda: stream.read(BLOCK_SIZE), b''):
+            digest.update(block)
+            if temp_file is None and len(buffer) + len(block) > spool_max:
+                temp_path = _new_temp_path()
+                temp_file = open(temp_path, 'wb')
+                temp_file.write(buffer)
+                buffer = None
+            if temp_file is None:
+                buffer.extend(block)
+            else:
+                temp_file.write(block)
+        if temp_file is not None:
+            temp_file.close()
+            temp_file = None
+        return _link_public(digest.hexdigest(), file_type, ext, temp_path=temp_path,
+                            data=bytes(buffer) if buffer is not None else None)
+    except Exception:
+        if temp_file is not None:
+            temp_file.close()
+        if temp_path is not None and os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def store_file(path, file_type, ext, digest=None):
+    """把已写完的临时文件（同一文件系统）移入存储，返回URL；digest已校验过时可直接传入"""
+    return _link_public(digest or file_sha256(path), file_type, ext, temp_path=path)
+
+def release(url):
+    """删除URL对应的链接；对象没有其他引用时由 collect_garbage 清理"""
+    relative = url[len('/static/uploads/'):]
+    path = os.path.join(upload_folder(), *relative.split('/'))
+    if os.path.exists(path):
+        os.remove(path)
+
+def reference_count(digest):
+    """对象被多少个URL引用（硬链接数减去对象自身）"""
+    try:
+        return os.stat(object_path(digest)).st_nlink - 1
+    except FileNotFoundError:
+        return 0
+
+def collect_garbage(grace_seconds=3600):
+    """删除没有被引用的对象，返回 (删除数, 释放字节数)
+
+    刚写入对象库、尚未建立链接的对象可能也没有引用，因此只删除修改时间早于grace_seconds的对象。
+    """
+    removed, freed = 0, 0
+    cutoff = time.time() - grace_seconds
+    for root, _, files in os.walk(objects_folder()):
+        for name in files:
+            path = os.path.join(root, name)
+            stat = os.stat(path)
+            if stat.st_nlink <= 1 and stat.st_mtime < cutoff:
+                os.remove(path)
+                removed += 1
+                freed += stat.st_size
+    return removed, freed
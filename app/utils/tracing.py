@@ -0,0 +1,278 @@
+import os
+import re
+import json
+import time
+import uuid
+import threading
+import functools
+import contextvars
+from contextlib import contextmanager
+from flask import g, request, current_app, has_app_context
+from app.utils.sql_events import on_before_statement, on_after_statement
+
+# 当前活动的span（请求线程和Celery任务各自独立）
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+_TRACEPARENT_RE = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$')
+
+class Span:
+    """单个调用阶段的耗时记录"""
+
+    __slots__ = ('trace_id', 'span_id', 'parent_id', 'name', 'kind', 'attributes',
+                 'start_ns', 'end_ns', 'error', 'exporter')
+
+    def __init__(self, name, trace_id, parent_id=None, kind='internal', attributes=None, exporter=None):
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.attributes = dict(attributes or {})
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.error = None
+        self.exporter = exporter
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def end(self):
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            if self.exporter is not None:
+                self.exporter.export(self)
+
+    @property
+    def traceparent(self):
+        return f'00-{self.trace_id}-{self.span_id}-01'
+
+    def to_otlp(self):
+        """转换为OTLP JSON格式的span"""
+        return {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'parentSpanId': self.parent_id or '',
+            'name': self.name,
+            'kind': self.kind,
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns),
+            'attributes': [
+                {'key': key, 'value': _otlp_value(value)} for key, value in self.attributes.items()
+            ],
+            'status': {'code': 'ERROR', 'message': self.error} if self.error else {'code': 'OK'}
+        }
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+class JsonlSpanExporter:
+    """把span按OTLP JSON格式逐行写入本地文件"""
+
+    def __init__(self, path, service_name='recorder-server'):
+        self.path = path
+        self.service_name = service_name
+        self._lock = threading.Lock()
+
+    def export(self, span):
+        line = json.dumps({
+            'resource': {'service.name': self.service_name, 'process.pid': os.getpid()},
+            'span': span.to_otlp()
+        }, ensure_ascii=False, default=str)
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+
+_exporters = {}
+
+def _get_exporter():
+    """获取当前应用的span导出器，未配置导出文件时返回None（不采集span）"""
+    if not has_app_context():
+        return None
+    path = current_app.config.get('TRACE_EXPORT_FILE')
+    if not path:
+        return None
+    exporter = _exporters.get(path)
+    if exporter is None:
+        exporter = _exporters.setdefault(path, JsonlSpanExporter(path, current_app.config.get('TRACE_SERVICE_NAME', 'recorder-server')))
+    return exporter
+
+def get_current_span():
+    return _current_span.get()
+
+def start_span(name, kind='internal', attributes=None, trace_id=None, parent_id=None):
+    """创建span；若未显式指定父span则挂在当前活动span下"""
+    exporter = _get_exporter()
+    if exporter is None:
+        return None
+    parent = _current_span.get()
+    if trace_id is None:
+        if parent is not None:
+            trace_id, parent_id = parent.trace_id, parent.span_id
+        else:
+            trace_id = uuid.uuid4().hex
+    return Span(name, trace_id, parent_id, kind, attributes, exporter)
+
+@contextmanager
+def span(name, kind='internal', **attributes):
+    """在当前追踪中记录一个阶段，没有活动追踪时不产生开销"""
+    if _current_span.get() is None:
+        yield None
+        return
+    current = start_span(name, kind, attributes)
+    if current is None:
+        yield None
+        return
+    token = _current_span.set(current)
+    try:
+        yield current
+    except Exception as e:
+        current.error = str(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end()
+
+def traced(name=None):
+    """函数级span装饰器"""
+    def decorator(f):
+        span_name = name or f.__qualname__
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            if _current_span.get() is None:
+                return f(*args, **kwargs)
+            with span(span_name):
+                return f(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def traced_service(cls):
+    """为服务类的全部静态方法加上span"""
+    for attr, value in list(vars(cls).items()):
+        if isinstance(value, staticmethod) and not attr.startswith('_'):
+            setattr(cls, attr, staticmethod(traced(f'{cls.__name__}.{attr}')(value.__func__)))
+    return cls
+
+def parse_traceparent(header):
+    """解析W3C traceparent头，返回(trace_id, parent_span_id)"""
+    match = _TRACEPARENT_RE.match((header or '').strip().lower())
+    if not match:
+        return None, None
+    return match.group(1), match.group(2)
+
+def activate(span_obj):
+    """把span设为当前活动span，返回用于恢复的token"""
+    return _current_span.set(span_obj)
+
+def deactivate(token):
+    _current_span.reset(token)
+
+# ========== SQL ==========
+
+@on_before_statement
+def _start_sql_span(conn, statement, parameters, context):
+    if _current_span.get() is None:
+        return
+    sql_span = start_span('db.query', kind='client', attributes={
+        'db.system': conn.engine.dialect.name,
+        'db.statement': statement[:500]
+    })
+    context._trace_span = sql_span
+
+@on_after_statement
+def _end_sql_span(conn, statement, parameters, context, elapsed):
+    sql_span = getattr(context, '_trace_span', None)
+    if sql_span is not None:
+        context._trace_span = None
+        sql_span.end()
+
+# ========== HTTP请求 ==========
+
+def _before_request():
+    request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+    g.request_id = request_id
+
+    trace_id, parent_id = parse_traceparent(request.headers.get('traceparent'))
+    root = start_span(
+        f'{request.method} {request.endpoint or "unmatched"}',
+        kind='server',
+        attributes={'http.method': request.method, 'http.target': request.path, 'request.id': request_id},
+        trace_id=trace_id,
+        parent_id=parent_id
+    )
+    if root is not None:
+        g._trace_span = root
+        g._trace_token = activate(root)
+
+def _after_request(response):
+    response.headers['X-Request-ID'] = g.get('request_id', '')
+    root = g.get('_trace_span')
+    if root is not None:
+        root.set_attribute('http.status_code', response.status_code)
+        response.headers['traceparent'] = root.traceparent
+    return response
+
+def _teardown_request(exc):
+    root = g.pop('_trace_span', None)
+    if root is None:
+        return
+    if exc is not None:
+        root.error = str(exc)
+    deactivate(g.pop('_trace_token'))
+    root.end()
+
+# ========== Celery ==========
+
+def inject_task_headers(headers):
+    """发布任务时把当前追踪上下文写入消息头"""
+    current = _current_span.get()
+    if current is not None:
+        headers['traceparent'] = current.traceparent
+    if has_app_context() and g.get('request_id'):
+        headers['request_id'] = g.request_id
+
+def _on_before_task_publish(sender=None, headers=None, **kwargs):
+    if headers is None:
+        return
+    with span('celery.publish', kind='producer', **{'celery.task': sender}):
+        inject_task_headers(headers)
+
+@contextmanager
+def task_span(task):
+    """Celery任务执行span，父span取自消息头中的traceparent"""
+    trace_id, parent_id = parse_traceparent(getattr(task.request, 'traceparent', None))
+    task_root = start_span(
+        f'celery.task {task.name}',
+        kind='consumer',
+        attributes={'celery.task_id': task.request.id or '', 'request.id': getattr(task.request, 'request_id', None) or ''},
+        trace_id=trace_id,
+        parent_id=parent_id
+    )
+    if task_root is None:
+        yield None
+        return
+    token = activate(task_root)
+    try:
+        yield task_root
+    except Exception as e:
+        task_root.error = str(e)
+        raise
+    finally:
+        deactivate(token)
+        task_root.end()
+
+def connect_celery_signals():
+    """发布任务时注入追踪头（在创建Celery实例时调用，Web进程不必导入Celery）"""
+    from celery.signals import before_task_publish
+    before_task_publish.connect(_on_before_task_publish, weak=False, dispatch_uid='recorder_tracing_publish')
+
+def init_tracing(app):
+    """注册请求ID与调用链追踪"""
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
@@ -24,8 +24,8 @@ def validate_health_record(request):
     
     return None
 
-def validate_family_data(data, is_update=False):
-    """验证家庭数据"""
+def validate_family_data(data, is_update=False, valid_packages=None):
+    """验证家庭数据（批量导入时传入valid_packages，避免每行查询套餐表）"""
     from flask import current_app
     
     if not data:
@@ -56,9 +56,10 @@ def validate_family_data(data, is_update=False):
         # 验证户主套餐类型
         if data['householdHeadPackageType']:
             from app.models.appointment import ServicePackage
-            valid_packages = [pkg.name for pkg in ServicePackage.query.filter_by(is_active=True).all()]
+            if valid_packages is None:
+                valid_packages = [pkg.name for pkg in ServicePackage.query.filter_by(is_active=True).all()]
             if valid_packages and data['householdHeadPackageType'] not in valid_packages:
-                return f'户主套餐类型必须是以下之一: {", ".join(valid_packages[:5])}'
+                return f'户主套餐类型必须是以下之一: {", ".join(list(valid_packages)[:5])}'
         
         # 验证家庭成员数据（现在可以为空，因为户主不在members中）
         members = data.get('members', [])
@@ -70,6 +71,21 @@ def validate_family_data(data, is_update=False):
             if member_error:
                 return f'第{i+1}个成员数据错误: {member_error}'
     
+    # 更新时成员按差异合并：带id的成员只校验提供的字段，新成员需完整字段
+    elif 'members' in data:
+        members = data['members']
+        if not isinstance(members, list):
+            return 'members字段必须是数组类型'
+        
+        for i, member in enumerate(members):
+            if not isinstance(member, dict):
+                return f'第{i+1}个成员数据错误: 成员数据必须是对象'
+            if member.get('id') and not str(member['id']).isdigit():
+                return f'第{i+1}个成员数据错误: 成员id必须是整数'
+            member_error = validate_patient_data(member, is_update=bool(member.get('id')), is_member=True)
+            if member_error:
+                return f'第{i+1}个成员数据错误: {member_error}'
+    
     return None
 
 def validate_patient_data(data, is_update=False, is_member=False):
@@ -135,6 +151,53 @@ def validate_appointment(data):
     
     return None
 
+def validate_appointment_series(data):
+    """验证周期预约数据"""
+    required_fields = ['subscription_id', 'scheduled_time']
+    
+    for field in required_fields:
+        if field not in data or not data[field]:
+            return f'缺少必填字段: {field}'
+    
+    from flask import current_app
+    
+    try:
+        start_time = datetime.strptime(data['scheduled_time'], '%H:%M').time()
+        if data.get('end_time') and datetime.strptime(data['end_time'], '%H:%M').time() <= start_time:
+            return '结束时间必须晚于开始时间'
+        if data.get('from_date'):
+            datetime.strptime(data['from_date'], '%Y-%m-%d')
+    except ValueError:
+        return '日期或时间格式错误'
+    
+    # 指定服务类型时时长取自服务类型，由服务层检查
+    if not data.get('end_time') and not data.get('service_type_id'):
+        duration = current_app.config.get('APPOINTMENT_DEFAULT_DURATION_MINUTES', 60)
+        if start_time.hour * 60 + start_time.minute + duration > 24 * 60:
+            return f'开始时间加上服务时长（{duration}分钟）不能超过当天24:00'
+    
+    return None
+
+def validate_series_update(data):
+    """验证周期预约的修改数据"""
+    if data.get('scope', 'this') not in ('this', 'following', 'all'):
+        return '修改范围必须是: this, following, all'
+    
+    if 'status' in data and data['status'] not in ('scheduled', 'confirmed', 'cancelled'):
+        return '状态必须是: scheduled, confirmed, cancelled'
+    
+    try:
+        if data.get('scheduled_date'):
+            datetime.strptime(data['scheduled_date'], '%Y-%m-%d')
+        if data.get('scheduled_time'):
+            datetime.strptime(data['scheduled_time'], '%H:%M')
+        if data.get('end_time'):
+            datetime.strptime(data['end_time'], '%H:%M')
+    except ValueError:
+        return '日期或时间格式错误'
+    
+    return None
+
 def validate_hospital_appointment(data):
     """验证医院预约数据"""
     required_fields = ['patient_id', 'hospital_id', 'department_id', 'appointment_date', 'appointment_time']
@@ -155,4 +218,29 @@ def validate_hospital_appointment(data):
     except ValueError:
         return '时间格式错误，应为HH:MM'
     
-    return None
\ No newline at end of file
+    return None
+
+def validate_batch_requests(data, max_requests):
+    """验证批量请求数据"""
+    requests = data.get('requests') if isinstance(data, dict) else None
+    if not isinstance(requests, list) or not requests:
+        return '缺少必填字段: requests'
+    
+    if len(requests) > max_requests:
+        return f'单次最多包含{max_requests}个子请求'
+    
+    for index, item in enumerate(requests):
+        if not isinstance(item, dict) or not item.get('path'):
+            return f'第{index + 1}个子请求缺少path'
+        if not isinstance(item['path'], str):
+            return f'第{index + 1}个子请求的path必须是字符串'
+        method = str(item.get('method', 'GET')).upper()
+        if method not in ('GET', 'POST', 'PUT', 'DELETE'):
+            return f'第{index + 1}个子请求的method必须是: GET, POST, PUT, DELETE'
+        if method != 'GET' and item.get('body') is not None and not isinstance(item['body'], dict):
+            return f'第{index + 1}个子请求的body必须是JSON对象'
+        path = item['path']
+        if not path.startswith('/api/v1/') or path.split('?')[0].rstrip('/') == '/api/v1/batch':
+            return f'第{index + 1}个子请求的path必须是/api/v1下的接口，且不能嵌套批量请求'
+    
+    return None
@@ -0,0 +1,88 @@
+from flask import Blueprint, Response, request, jsonify, current_app
+from flask_jwt_extended import jwt_required
+from app.utils.decorators import admin_required
+from app.utils.slow_query import slow_query_log
+from app.utils.profiler import get_profile_store
+from app.utils.memory_profiler import endpoint_allocations
+
+admin_bp = Blueprint('admin', __name__, url_prefix='/api/v1/admin')
+
+@admin_bp.route('/slow-queries', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_slow_queries():
+    """获取最慢的SQL语句结构（含次数、p95耗时和执行计划）"""
+    try:
+        limit = request.args.get('limit', 20, type=int)
+        
+        return jsonify({
+            'code': 200,
+            'message': '获取成功',
+            'data': {
+                'threshold_ms': current_app.config.get('SLOW_QUERY_THRESHOLD_MS'),
+                'total_records': len(slow_query_log.records()),
+                'queries': slow_query_log.top(limit)
+            }
+        })
+    except Exception as e:
+        current_app.logger.error(f"获取慢查询列表失败: {str(e)}", exc_info=True)
+        return jsonify({
+            'code': 500,
+            'message': '服务器内部错误'
+        }), 500
+
+
+@admin_bp.route('/profiles', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_profiles():
+    """获取已保存的请求性能分析列表"""
+    try:
+        return jsonify({
+            'code': 200,
+            'message': '获取成功',
+            'data': get_profile_store().list()
+        })
+    except Exception as e:
+        current_app.logger.error(f"获取性能分析列表失败: {str(e)}", exc_info=True)
+        return jsonify({
+            'code': 500,
+            'message': '服务器内部错误'
+        }), 500
+
+@admin_bp.route('/profiles/<profile_id>', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_profile(profile_id):
+    """下载性能分析结果（折叠栈格式，可直接用于生成火焰图）"""
+    collapsed = get_profile_store().load(profile_id)
+    if collapsed is None:
+        return jsonify({
+            'code': 404,
+            'message': '性能分析结果不存在'
+        }), 404
+    
+    return Response(collapsed, mimetype='text/plain')
+
+@admin_bp.route('/memory', methods=['GET'])
+@jwt_required()
+@admin_required
+def get_memory_report():
+    """获取各端点的内存峰值和主要分配位置"""
+    try:
+        top_n = request.args.get('top', current_app.config.get('MEMORY_PROFILING_TOP_N', 10), type=int)
+        
+        return jsonify({
+            'code': 200,
+            'message': '获取成功',
+            'data': {
+                'enabled': current_app.config.get('MEMORY_PROFILING_ENABLED', False),
+                'endpoints': endpoint_allocations.report(top_n)
+            }
+        })
+    except Exception as e:
+        current_app.logger.error(f"获取内存分析报告失败: {str(e)}", exc_info=True)
+        return jsonify({
+            'code': 500,
+            'message': '服务器内部错误'
+        }), 500
@@ -1,8 +1,10 @@
 from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.services.appointment_service import AppointmentService
-from app.utils.decorators import recorder_required
-from app.utils.validators import validate_appointment
+from app.services.appointment_series_service import AppointmentSeriesService, AppointmentConflict
+from app.utils.decorators import recorder_required, idempotent
+from app.utils.query_guard import statement_budget
+from app.utils.validators import validate_appointment, validate_appointment_series, validate_series_update
 from datetime import datetime, date
 import json
 
@@ -108,6 +110,7 @@ def get_appointments():
 @appointment_bp.route('/appointments', methods=['POST'])
 @jwt_required()
 @recorder_required
+@idempotent
 def create_appointment():
     """创建预约"""
     try:
@@ -133,6 +136,12 @@ def create_appointment():
             'message': '预约创建成功',
             'data': appointment.to_dict(include_patient=True, include_payment=True)
         })
+    except AppointmentConflict as e:
+        return jsonify({
+            'code': 409,
+            'message': str(e),
+            'data': {'conflicts': e.conflicts}
+        }), 409
     except Exception as e:
         current_app.logger.error(f"appointment.create_appointment - 创建预约失败: {str(e)}", exc_info=True)
         return jsonify({
@@ -165,6 +174,12 @@ def update_appointment(appointment_id):
             'message': '预约更新成功',
             'data': appointment.to_dict(include_patient=True, include_payment=True)
         })
+    except AppointmentConflict as e:
+        return jsonify({
+            'code': 409,
+            'message': str(e),
+            'data': {'conflicts': e.conflicts}
+        }), 409
     except Exception as e:
         current_app.logger.error(f"appointment.update_appointment - 更新预约失败: {str(e)}", exc_info=True)
         return jsonify({
@@ -257,7 +272,131 @@ def delete_appointment(appointment_id):
             'message': f'服务器内部错误: {str(e)}'
         }), 500
 
+@appointment_bp.route('/appointment-series', methods=['POST'])
+@jwt_required()
+@recorder_required
+def create_appointment_series():
+    """按订阅生成周期预约"""
+    try:
+        recorder_id = int(get_jwt_identity())
+        data = request.get_json()
+        
+        current_app.logger.info(f"appointment.create_appointment_series - 请求数据: {data}")
+        
+        validation_error = validate_appointment_series(data)
+        if validation_error:
+            return jsonify({
+                'code': 422,
+                'message': validation_error
+            }), 422
+        
+        series, skipped = AppointmentSeriesService.create_series(data, recorder_id)
+        if series is None:
+            return jsonify({
+                'code': 404,
+                'message': '订阅不存在或无权限访问'
+            }), 404
+        
+        result = AppointmentSeriesService.series_to_dict(series)
+        result['skipped_dates'] = [day.isoformat() for day in skipped]
+        
+        return jsonify({
+            'code': 200,
+            'message': f"周期预约创建成功，共{len(result['appointments'])}次" +
+                       (f"，{len(skipped)}次因日程已满未能安排" if skipped else ''),
+            'data': result
+        })
+    except ValueError as e:
+        return jsonify({
+            'code': 422,
+            'message': str(e)
+        }), 422
+    except Exception as e:
+        current_app.logger.error(f"appointment.create_appointment_series - 创建周期预约失败: {str(e)}", exc_info=True)
+        return jsonify({
+            'code': 500,
+            'message': f'服务器内部错误: {str(e)}'
+        }), 500
+
+@appointment_bp.route('/appointment-series/<int:series_id>', methods=['GET'])
+@jwt_required()
+@recorder_required
+def get_appointment_series(series_id):
+    """获取周期预约及其全部预约"""
+    try:
+        recorder_id = int(get_jwt_identity())
+        series = AppointmentSeriesService.get_series(series_id, recorder_id)
+        
+        if not series:
+            return jsonify({
+                'code': 404,
+                'message': '周期预约不存在或无权限访问'
+            }), 404
+        
+        return jsonify({
+            'code': 200,
+            'message': '获取成功',
+            'data': AppointmentSeriesService.series_to_dict(series)
+        })
+    except Exception as e:
+        current_app.logger.error(f"appointment.get_appointment_series - 获取周期预约失败: {str(e)}", exc_info=True)
+        return jsonify({
+            'code': 500,
+            'message': f'服务器内部错误: {str(e)}'
+        }), 500
+
+@appointment_bp.route('/appointment-series/<int:series_id>/appointments/<int:appointment_id>', methods=['PUT'])
+@jwt_required()
+@recorder_required
+def update_series_appointment(series_id, appointment_id):
+    """修改周期预约中的预约（scope: this / following / all）"""
+    try:
+        recorder_id = int(get_jwt_identity())
+        data = request.get_json()
+        
+        current_app.logger.info(f"appointment.update_series_appointment - 周期预约: {series_id}, 预约: {appointment_id}, 数据: {data}")
+        
+        validation_error = validate_series_update(data)
+        if validation_error:
+            return jsonify({
+                'code': 422,
+                'message': validation_error
+            }), 422
+        
+        result = AppointmentSeriesService.update_series_appointment(series_id, appointment_id, data, recorder_id)
+        
+        if result is None:
+            return jsonify({
+                'code': 404,
+                'message': '预约不存在或无权限访问'
+            }), 404
+        
+        if 'conflicts' in result:
+            return jsonify({
+                'code': 409,
+                'message': '修改后的时间与已有预约冲突',
+                'data': result
+            }), 409
+        
+        return jsonify({
+            'code': 200,
+            'message': '预约更新成功',
+            'data': result
+        })
+    except ValueError as e:
+        return jsonify({
+            'code': 422,
+            'message': str(e)
+        }), 422
+    except Exception as e:
+        current_app.logger.error(f"appointment.update_series_appointment - 修改周期预约失败: {str(e)}", exc_info=True)
+        return jsonify({
+            'code': 500,
+            'message': f'服务器内部错误: {str(e)}'
+        }), 500
+
 @appointment_bp.route('/service-types', methods=['GET'])
+@statement_budget(2)
 @jwt_required()
 @recorder_required
 def get_service_types():
@@ -0,0 +1,126 @@
+from flask import Blueprint, request, jsonify, current_app, g
+from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity
+from werkzeug.test import EnvironBuilder
+from concurrent.futures import ThreadPoolExecutor
+from app.models.user import User
+from app.utils.tracing import get_current_span
+from app.utils.validators import validate_batch_requests
+from app import db
+
+batch_bp = Blueprint('batch', __name__, url_prefix='/api/v1')
+
+# 从批量请求转发给子请求的请求头（子请求使用同一个JWT，复用批量请求的验证结果，不再验证签名）
+FORWARDED_HEADERS = ('Authorization', 'Accept-Language', 'User-Agent')
+
+def _build_environ(item):
+    """根据子请求描述构造WSGI environ"""
+    method = str(item.get('method', 'GET')).upper()
+    headers = {name: request.headers[name] for name in FORWARDED_HEADERS if name in request.headers}
+    span = get_current_span()
+    if span is not None:
+        # 子请求的span挂在批量请求下
+        headers['traceparent'] = span.traceparent
+    builder = EnvironBuilder(
+        path=item['path'],
+        method=method,
+        headers=headers,
+        json=item.get('body') if method != 'GET' and item.get('body') is not None else None,
+        environ_base={'REMOTE_ADDR': request.remote_addr}
+    )
+    try:
+        return builder.get_environ()
+    finally:
+        builder.close()
+
+def _full_dispatch(app, environ):
+    with app.request_context(environ):
+        try:
+            return app.full_dispatch_request()
+        except Exception as e:
+            app.logger.error(f"batch - 子请求处理失败: {environ.get('PATH_INFO')}: {str(e)}", exc_info=True)
+            return app.make_response(({'code': 500, 'message': '服务器内部错误'}, 500))
+
+def _dispatch_inline(app, environ):
+    """在批量请求的应用上下文中处理子请求：共用数据库会话和已查询的用户，结束后恢复g"""
+    saved = g.__dict__.copy()
+    try:
+        return _full_dispatch(app, environ)
+    finally:
+        g.__dict__.clear()
+        g.__dict__.update(saved)
+
+def _dispatch_isolated(app, environ, verified_jwt):
+    """在工作线程中处理只读子请求，使用独立的应用上下文和数据库会话"""
+    with app.app_context():
+        g._batch_jwt = verified_jwt
+        return _full_dispatch(app, environ)
+
+def _to_result(item, response):
+    body = response.get_json(silent=True)
+    if body is None:
+        body = response.get_data(as_text=True)
+    return {'id': item.get('id'), 'status': response.status_code, 'body': body}
+
+@batch_bp.route('/batch', methods=['POST'])
+@jwt_required()
+def batch():
+    """批量请求：一次请求依次处理多个子请求，parallel为true时连续的GET子请求并行处理"""
+    try:
+        data = request.get_json(silent=True) or {}
+        validation_error = validate_batch_requests(data, current_app.config.get('BATCH_MAX_REQUESTS', 20))
+        if validation_error:
+            return jsonify({
+                'code': 422,
+                'message': validation_error
+            }), 422
+
+        user = db.session.query(User).filter(User.id == int(get_jwt_identity())).first()
+        if not user:
+            return jsonify({
+                'code': 403,
+                'message': '用户不存在'
+            }), 403
+
+        app = current_app._get_current_object()
+        items = data['requests']
+        environs = [_build_environ(item) for item in items]
+        workers = current_app.config.get('BATCH_MAX_WORKERS', 4) if data.get('parallel') else 1
+        current_app.logger.info(f"batch - 用户 {user.id} 提交 {len(items)} 个子请求，并行线程数: {workers}")
+
+        g._batch_user = user
+        # 批量请求的token已由jwt_required验证，子请求直接使用验证结果
+        verified_jwt = (request.headers['Authorization'].split(None, 1)[-1], get_jwt())
+        g._batch_jwt = verified_jwt
+        try:
+            responses = [None] * len(items)
+            index = 0
+            while index < len(items):
+                end = index + 1
+                if workers > 1:
+                    # 连续的GET子请求互不依赖，可以并行；写请求按顺序在批量请求的会话中执行
+                    while end < len(environs) and environs[index]['REQUEST_METHOD'] == 'GET' \
+                            and environs[end]['REQUEST_METHOD'] == 'GET':
+                        end += 1
+                if end - index > 1:
+                    with ThreadPoolExecutor(max_workers=min(workers, end - index)) as executor:
+                        group = executor.map(lambda environ: _dispatch_isolated(app, environ, verified_jwt), environs[index:end])
+                        for offset, response in enumerate(group):
+                            responses[index + offset] = _to_result(items[index + offset], response)
+                else:
+                    responses[index] = _to_result(items[index], _dispatch_inline(app, environs[index]))
+                index = end
+        finally:
+            g.pop('_batch_user', None)
+            g.pop('_batch_jwt', None)
+
+        return jsonify({
+            'code': 200,
+            'message': '批量请求完成',
+            'data': {'responses': responses}
+        })
+    except Exception as e:
+        current_app.logger.error(f"batch - 批量请求失败: {str(e)}", exc_info=True)
+        return jsonify({
+            'code': 500,
+            'message': f'服务器内部错误: {str(e)}'
+        }), 500
@@ -1,38 +1,125 @@
+import time
+import threading
+from datetime import datetime
 from flask import Blueprint, jsonify, current_app
-from extensions import db
-import redis
+from app import db, celery
+from app.utils.helpers import get_redis_client
 
 health_bp = Blueprint('health', __name__)
 
-@health_bp.route('/health', methods=['GET'])
-def health_check():
-    """健康检查接口"""
-    try:
-        # 检查数据库连接
-        db.session.execute(db.text('SELECT 1'))
-        db_status = 'healthy'
-    except Exception as e:
-        current_app.logger.error(f"数据库连接检查失败: {str(e)}")
-        db_status = 'unhealthy'
-    
+class HealthProbeCache:
+    """探测结果短时缓存；并发探测只触发一次后端检查，其余请求共享结果"""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._result = None
+        self._expires_at = 0.0
+
+    def get(self, compute):
+        if self._result is not None and time.monotonic() < self._expires_at:
+            return self._result, True
+        with self._lock:
+            # 等锁期间可能已有其他请求完成了检查
+            if self._result is not None and time.monotonic() < self._expires_at:
+                return self._result, True
+            self._result = compute()
+            self._expires_at = time.monotonic() + self.ttl
+            return self._result, False
+
+def _get_probe_cache():
+    cache = current_app.extensions.get('health_probe_cache')
+    if cache is None:
+        cache = current_app.extensions.setdefault(
+            'health_probe_cache',
+            HealthProbeCache(current_app.config.get('HEALTH_CACHE_SECONDS', 5))
+        )
+    return cache
+
+def _timed_check(name, check):
+    """执行单项检查并记录耗时"""
+    start = time.perf_counter()
     try:
-        # 检查Redis连接
-        redis_client = redis.Redis.from_url(current_app.config['REDIS_URL'])
-        redis_client.ping()
-        redis_status = 'healthy'
+        detail = check() or {}
+        status = 'healthy'
     except Exception as e:
-        current_app.logger.error(f"Redis连接检查失败: {str(e)}")
-        redis_status = 'unhealthy'
-    
-    status = 'healthy' if db_status == 'healthy' and redis_status == 'healthy' else 'unhealthy'
-    status_code = 200 if status == 'healthy' else 503
-    
-    return jsonify({
+        current_app.logger.error(f"健康检查失败: {name}: {str(e)}")
+        detail = {'error': str(e)}
+        status = 'unhealthy'
+    result = {'status': status, 'latency_ms': round((time.perf_counter() - start) * 1000, 3)}
+    result.update(detail)
+    return result
+
+def _check_database():
+    with db.engine.connect() as conn:
+        conn.execute(db.text('SELECT 1'))
+
+def _check_redis():
+    get_redis_client().ping()
+
+def _check_celery_broker():
+    with celery.connection_for_write(current_app.config['CELERY_BROKER_URL']) as conn:
+        conn.ensure_connection(
+            max_retries=1,
+            interval_start=0,
+            timeout=current_app.config.get('HEALTH_CHECK_TIMEOUT', 2)
+        )
+
+def _pool_status():
+    """连接池占用情况（StaticPool等不支持统计的连接池只返回类型）"""
+    pool = db.engine.pool
+    status = {'pool_class': type(pool).__name__}
+    if hasattr(pool, 'checkedout'):
+        size = pool.size()
+        checked_out = pool.checkedout()
+        overflow = pool.overflow()
+        max_overflow = getattr(pool, '_max_overflow', 0)
+        capacity = size + max(max_overflow, 0)
+        status.update({
+            'size': size,
+            'checked_in': pool.checkedin(),
+            'checked_out': checked_out,
+            'overflow': overflow,
+            'max_overflow': max_overflow,
+            'saturation': round(checked_out / capacity, 3) if capacity > 0 else None
+        })
+    return status
+
+def _run_readiness_checks():
+    database = _timed_check('database', _check_database)
+    database['pool'] = _pool_status()
+    redis_result = _timed_check('redis', _check_redis)
+    broker = _timed_check('celery_broker', _check_celery_broker)
+
+    if database['status'] != 'healthy' or redis_result['status'] != 'healthy':
+        status = 'unhealthy'
+    elif broker['status'] != 'healthy':
+        status = 'degraded'
+    else:
+        status = 'healthy'
+
+    return {
         'status': status,
-        'database': db_status,
-        'redis': redis_status,
+        'database': database,
+        'redis': redis_result,
+        'celery_broker': broker,
+        'checked_at': datetime.utcnow().isoformat()
+    }
+
+@health_bp.route('/health/live', methods=['GET'])
+def liveness_check():
+    """存活检查接口（不访问任何后端）"""
+    return jsonify({
+        'status': 'alive',
         'timestamp': datetime.utcnow().isoformat()
-    }), status_code
+    })
+
+@health_bp.route('/health', methods=['GET'])
+@health_bp.route('/health/ready', methods=['GET'])
+def health_check():
+    """就绪检查接口（数据库、Redis、Celery broker，结果短时缓存）"""
+    result, cached = _get_probe_cache().get(_run_readiness_checks)
+
+    status_code = 503 if result['status'] == 'unhealthy' else 200
 
-# 导入datetime
-from datetime import datetime
\ No newline at end of file
+    return jsonify(dict(result, cached=cached, timestamp=datetime.utcnow().isoformat())), status_code
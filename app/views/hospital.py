@@ -1,12 +1,14 @@
 from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.services.hospital_service import HospitalService
-from app.utils.decorators import recorder_required
+from app.utils.decorators import recorder_required, idempotent
+from app.utils.query_guard import statement_budget
 from app.utils.validators import validate_hospital_appointment
 
 hospital_bp = Blueprint('hospital', __name__, url_prefix='/api/v1')
 
 @hospital_bp.route('/hospitals', methods=['GET'])
+@statement_budget(2)
 @jwt_required()
 @recorder_required
 def get_hospitals():
@@ -30,6 +32,7 @@ def get_hospitals():
         }), 500
 
 @hospital_bp.route('/hospitals/<int:hospital_id>/departments', methods=['GET'])
+@statement_budget(2)
 @jwt_required()
 @recorder_required
 def get_hospital_departments(hospital_id):
@@ -50,6 +53,7 @@ def get_hospital_departments(hospital_id):
         }), 500
 
 @hospital_bp.route('/hospitals/<int:hospital_id>/departments/<int:department_id>/doctors', methods=['GET'])
+@statement_budget(2)
 @jwt_required()
 @recorder_required
 def get_department_doctors(hospital_id, department_id):
@@ -72,6 +76,7 @@ def get_department_doctors(hospital_id, department_id):
 @hospital_bp.route('/hospital-appointments', methods=['POST'])
 @jwt_required()
 @recorder_required
+@idempotent
 def create_hospital_appointment():
     """创建医院预约"""
     try:
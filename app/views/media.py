@@ -0,0 +1,102 @@
+from flask import Blueprint, jsonify, current_app, request, send_file
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from werkzeug.security import safe_join
+from app.services.media_service import MediaService, verify_download
+from app.utils.decorators import admin_or_recorder_required
+from app.models.user import User
+from app import db
+import os
+import mimetypes
+
+# 与上传时返回的URL相同，客户端无需修改
+media_bp = Blueprint('media', __name__, url_prefix='/static/uploads')
+
+MEDIA_TYPES = ('image', 'audio')
+
+def _not_found():
+    return jsonify({
+        'code': 404,
+        'message': '文件不存在'
+    }), 404
+
+def _send(path, relative):
+    """按MEDIA_SENDFILE把文件交给前端代理发送，否则由Flask发送（支持Range和条件请求）"""
+    mode = current_app.config.get('MEDIA_SENDFILE')
+    mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    if mode == 'x-accel':
+        # nginx按内部location读取文件，Range、Content-Length和sendfile均由nginx处理
+        response = current_app.response_class(mimetype=mimetype)
+        response.headers['X-Accel-Redirect'] = current_app.config.get('MEDIA_ACCEL_PREFIX', '/_protected_uploads/') + relative
+    elif mode == 'x-sendfile':
+        response = current_app.response_class(mimetype=mimetype)
+        response.headers['X-Sendfile'] = os.path.abspath(path)
+    else:
+        response = send_file(path, mimetype=mimetype, conditional=True, etag=True, max_age=None)
+    response.headers['Accept-Ranges'] = 'bytes'
+    # 文件需要登录才能访问，只允许客户端自己缓存
+    response.headers['Cache-Control'] = f"private, max-age={current_app.config.get('MEDIA_CACHE_MAX_AGE', 31536000)}, immutable"
+    # 签名URL不能通过Referer泄露给页面中引用的其他站点
+    response.headers['Referrer-Policy'] = 'no-referrer'
+    return response
+
+def _media_path(file_type, name):
+    path = safe_join(current_app.config['UPLOAD_FOLDER'], file_type, name)
+    if file_type not in MEDIA_TYPES or name.startswith('.') or path is None:
+        return None
+    return path
+
+@media_bp.route('/<file_type>/<name>', methods=['GET'])
+def get_media(file_type, name):
+    """下载健康记录的上传文件及其派生文件
+
+    请求头带token时记录员只能访问自己的记录，管理员可访问全部；<img>、<audio>等无法设置请求头的场景
+    使用文件处理状态接口返回的签名参数 ?expires=...&signature=...，签名只对单个文件有效且很快过期。
+    """
+    if 'signature' in request.args:
+        return _get_signed_media(file_type, name)
+    return _get_authorized_media(file_type, name)
+
+def _get_signed_media(file_type, name):
+    try:
+        if not verify_download(file_type, name, request.args.get('expires'), request.args.get('signature')):
+            current_app.logger.warning(f"media.get_media - 签名无效或已过期: {file_type}/{name}")
+            return jsonify({
+                'code': 403,
+                'message': '下载链接无效或已过期'
+            }), 403
+        path = _media_path(file_type, name)
+        if path is None or not os.path.isfile(path):
+            return _not_found()
+        return _send(path, f'{file_type}/{name}')
+    except Exception as e:
+        current_app.logger.error(f"media.get_media - 下载文件失败: {str(e)}", exc_info=True)
+        return jsonify({
+            'code': 500,
+            'message': '服务器内部错误'
+        }), 500
+
+@jwt_required()
+@admin_or_recorder_required
+def _get_authorized_media(file_type, name):
+    try:
+        relative = f'{file_type}/{name}'
+        path = _media_path(file_type, name)
+        if path is None:
+            return _not_found()
+
+        owner_id = MediaService.find_owner(file_type, name)
+        if owner_id is None or not os.path.isfile(path):
+            return _not_found()
+        user_id = int(get_jwt_identity())
+        # 装饰器已加载当前用户，这里从会话的identity map中取，不再查询
+        if owner_id != user_id and db.session.get(User, user_id).role != 'admin':
+            current_app.logger.warning(f"media.get_media - 用户 {user_id} 无权访问 {relative}")
+            return _not_found()
+
+        return _send(path, relative)
+    except Exception as e:
+        current_app.logger.error(f"media.get_media - 下载文件失败: {str(e)}", exc_info=True)
+        return jsonify({
+            'code': 500,
+            'message': '服务器内部错误'
+        }), 500
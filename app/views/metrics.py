@@ -0,0 +1,10 @@
+from flask import Blueprint, Response
+from app.utils.metrics import generate_metrics
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus指标接口"""
+    data, content_type = generate_metrics()
+    return Response(data, content_type=content_type)
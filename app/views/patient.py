@@ -2,9 +2,13 @@ from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.services.patient_service import PatientService
 from app.services.family_service import FamilyService
-from app.utils.decorators import recorder_required, admin_or_recorder_required
+from app.services.family_import_service import FamilyImportService, detect_import_format, iter_import_rows
+from app.services.media_service import MediaService
+from app.services.upload_service import UploadService
+from app.utils.decorators import recorder_required, admin_or_recorder_required, idempotent
 from app.utils.validators import validate_health_record, validate_family_data, validate_patient_data
 from app.utils.helpers import handle_file_upload
+from app import db
 import json
 
 patient_bp = Blueprint('patient', __name__, url_prefix='/api/v1')
@@ -14,6 +18,7 @@ patient_bp = Blueprint('patient', __name__, url_prefix='/api/v1')
 @patient_bp.route('/families', methods=['POST'])
 @jwt_required()
 @admin_or_recorder_required
+@idempotent
 def create_family():
     """创建家庭档案"""
     try:
@@ -164,6 +169,97 @@ def get_family_detail(family_id):
             'message': '服务器内部错误'
         }), 500
 
+@patient_bp.route('/families/import', methods=['POST'])
+@jwt_required()
+@recorder_required
+def import_families():
+    """批量导入家庭（CSV / JSON Lines，小文件同步处理，大文件转为后台任务）"""
+    try:
+        recorder_id = int(get_jwt_identity())
+        upload = request.files.get('file')
+        if not upload:
+            return jsonify({
+                'code': 422,
+                'message': '请上传导入文件'
+            }), 422
+        
+        file_format = detect_import_format(upload.filename, request.form.get('format') or request.args.get('format'))
+        if not file_format:
+            return jsonify({
+                'code': 422,
+                'message': '仅支持CSV或JSON Lines格式（.csv / .jsonl）'
+            }), 422
+        
+        run_async = request.args.get('async', '').lower() in ('1', 'true') or \
+            (request.content_length or 0) > current_app.config.get('FAMILY_IMPORT_SYNC_MAX_BYTES', 256 * 1024)
+        
+        if not run_async:
+            summary = FamilyImportService.import_rows(iter_import_rows(upload.stream, file_format), recorder_id)
+            current_app.logger.info(f"家庭批量导入完成: 成功{summary['succeeded']}行, 失败{summary['failed']}行")
+            return jsonify({
+                'code': 200,
+                'message': '导入完成',
+                'data': summary
+            })
+        
+        job = FamilyImportService.create_job(upload, file_format, recorder_id)
+        try:
+            from app.tasks.family_import import import_families as import_task
+            import_task.delay(job.id)
+        except Exception as e:
+            current_app.logger.error(f"提交导入任务失败: {str(e)}", exc_info=True)
+            job.status = 'failed'
+            job.message = f'提交后台任务失败: {str(e)}'
+            db.session.commit()
+            return jsonify({
+                'code': 503,
+                'message': '后台任务服务不可用，请稍后重试',
+                'data': job.to_dict()
+            }), 503
+        
+        db.session.refresh(job)
+        return jsonify({
+            'code': 202,
+            'message': '导入任务已提交',
+            'data': dict(job.to_dict(), status_url=f'/api/v1/families/import/{job.id}')
+        }), 202
+    except ValueError as e:
+        return jsonify({
+            'code': 422,
+            'message': str(e)
+        }), 422
+    except Exception as e:
+        current_app.logger.error(f"家庭批量导入失败: {str(e)}", exc_info=True)
+        return jsonify({
+            'code': 500,
+            'message': f'服务器内部错误: {str(e)}'
+        }), 500
+
+@patient_bp.route('/families/import/<job_id>', methods=['GET'])
+@jwt_required()
+@recorder_required
+def get_import_job(job_id):
+    """查询批量导入任务进度"""
+    try:
+        job = FamilyImportService.get_job(job_id, int(get_jwt_identity()))
+        if not job:
+            return jsonify({
+                'code': 404,
+                'message': '导入任务不存在'
+            }), 404
+        
+        return jsonify({
+            'code': 200,
+            'message': '获取成功',
+            'data': job.to_dict()
+        })
+    except Exception as e:
+        current_app.logger.error(f"查询导入任务失败: {str(e)}")
+        return jsonify({
+            'code': 500,
+            'message': '服务器内部错误'
+        }), 500
+
 @patient_bp.route('/families/<int:family_id>', methods=['PUT'])
 @jwt_required()
 @admin_or_recorder_required
@@ -453,6 +549,7 @@ def delete_family_member(family_id, member_id):
 @patient_bp.route('/health-records', methods=['POST'])
 @jwt_required()
 @recorder_required
+@idempotent
 def create_health_record():
     """创建健康记录"""
     try:
@@ -480,25 +577,52 @@ def create_health_record():
                 'message': validation_error
             }), 400
         
-        # 处理文件上传
+        # 分片续传已完成的文件（audio_upload_id / photo_upload_ids / signature_upload_id）
+        photo_upload_ids = [upload_id.strip() for value in request.form.getlist('photo_upload_ids')
+                            for upload_id in value.split(',')]
+        try:
+            audio_uploads = UploadService.resolve_completed([request.form.get('audio_upload_id')], recorder_id, 'audio')
+            photo_uploads = UploadService.resolve_completed(photo_upload_ids, recorder_id, 'image')
+            signature_uploads = UploadService.resolve_completed([request.form.get('signature_upload_id')], recorder_id, 'image')
+        except ValueError as e:
+            return jsonify({
+                'code': 422,
+                'message': str(e)
+            }), 422
+        
+        # 保存上传文件的原始内容，缩略图和元数据由后台任务生成
         data = request.form.to_dict()
         data['recorder_id'] = recorder_id
+        data['uploads'] = audio_uploads + photo_uploads + signature_uploads
+        media_entries = []
         
         # 处理音频文件
         if 'audio_file' in request.files:
             audio_file = request.files['audio_file']
             data['audio_file'] = handle_file_upload(audio_file, 'audio')
+        elif audio_uploads:
+            data['audio_file'] = audio_uploads[0].url
+        if data.get('audio_file'):
+            media_entries.append(('audio', data['audio_file']))
         
         # 处理照片文件
+        photo_urls = []
         if 'photos' in request.files:
             photos = request.files.getlist('photos')
             photo_urls = [handle_file_upload(photo, 'image') for photo in photos]
+        photo_urls += [upload.url for upload in photo_uploads]
+        if 'photos' in request.files or photo_uploads:
             data['photos'] = json.dumps(photo_urls)
+            media_entries.extend(('photo', url) for url in photo_urls)
         
         # 处理患者签名
         if 'patient_signature' in request.files:
             signature_file = request.files['patient_signature']
             data['patient_signature'] = handle_file_upload(signature_file, 'image')
+        elif signature_uploads:
+            data['patient_signature'] = signature_uploads[0].url
+        if data.get('patient_signature'):
+            media_entries.append(('signature', data['patient_signature']))
         
         # 处理生命体征数据
         if 'vital_signs' in data:
@@ -508,13 +632,18 @@ def create_health_record():
             except json.JSONDecodeError:
                 data['vital_signs'] = '{}'
         
+        data['media'] = MediaService.build_media(media_entries)
         record = PatientService.create_health_record(data)
+        MediaService.dispatch([item.id for item in data['media']])
         
         return jsonify({
             'code': 200,
             'message': '健康记录创建成功',
             'data': {
-                'record_id': record.id
+                'record_id': record.id,
+                # 文件在后台处理，客户端轮询status_url获取缩略图和处理结果
+                'media_status': 'processing' if data['media'] else 'none',
+                'status_url': f'/api/v1/health-records/{record.id}/media'
             }
         })
     except Exception as e:
@@ -524,6 +653,44 @@ def create_health_record():
             'message': '服务器内部错误'
         }), 500
 
+@patient_bp.route('/health-records/<int:record_id>/media', methods=['GET'])
+@jwt_required()
+@recorder_required
+def get_health_record_media(record_id):
+    """查询健康记录上传文件的处理状态（processing / ready / failed），客户端轮询直到不再是processing
+
+    可选参数width、height为图片的显示尺寸，返回的best_url为满足该尺寸的最小派生图。
+    """
+    try:
+        try:
+            width, height = (int(request.args[name]) if request.args.get(name) else None
+                             for name in ('width', 'height'))
+            if (width is not None and width <= 0) or (height is not None and height <= 0):
+                raise ValueError
+        except ValueError:
+            return jsonify({
+                'code': 422,
+                'message': 'width和height必须为正整数'
+            }), 422
+        result = MediaService.get_record_media(record_id, int(get_jwt_identity()), width, height)
+        if result is None:
+            return jsonify({
+                'code': 404,
+                'message': '健康记录不存在'
+            }), 404
+        
+        return jsonify({
+            'code': 200,
+            'message': '获取成功',
+            'data': result
+        })
+    except Exception as e:
+        current_app.logger.error(f"查询健康记录文件状态失败: {str(e)}", exc_info=True)
+        return jsonify({
+            'code': 500,
+            'message': '服务器内部错误'
+        }), 500
+
 # ========== 测试函数：随机选择家庭 ==========
 
 @patient_bp.route('/families/random', methods=['GET'])
@@ -538,7 +705,7 @@ def get_random_family():
         recorder_id = int(get_jwt_identity())
         
         # 获取记录员的所有家庭
-        families = FamilyService.get_families(recorder_id)
+        families = FamilyService.get_families(recorder_id)['families']
         
         if not families:
             return jsonify({
@@ -548,7 +715,7 @@ def get_random_family():
         
         # 随机选择一个家庭
         random_family = random.choice(families)
-        current_app.logger.info(f"🎲 随机选中家庭ID: {random_family['id']}, 户主: {random_family['household_head']}")
+        current_app.logger.info(f"🎲 随机选中家庭ID: {random_family['id']}, 户主: {random_family['householdHead']}")
         
         # 获取家庭详细信息，包括成员
         family_detail = FamilyService.get_family_by_id(random_family['id'], recorder_id)
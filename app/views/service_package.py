@@ -2,10 +2,12 @@ from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models.appointment import ServicePackage
 from app.utils.decorators import recorder_required
+from app.utils.query_guard import statement_budget
 
 service_package_bp = Blueprint('service_package', __name__, url_prefix='/api/v1')
 
 @service_package_bp.route('/service-packages', methods=['GET'])
+@statement_budget(2)
 @jwt_required()
 @recorder_required
 def get_service_packages():
@@ -47,6 +49,7 @@ def get_service_packages():
         }), 500
 
 @service_package_bp.route('/service-packages/<int:package_id>', methods=['GET'])
+@statement_budget(2)
 @jwt_required()
 @recorder_required
 def get_service_package_detail(package_id):
@@ -76,6 +79,7 @@ def get_service_package_detail(package_id):
         }), 500
 
 @service_package_bp.route('/service-packages/system-defaults', methods=['GET'])
+@statement_budget(2)
 @jwt_required()
 @recorder_required
 def get_system_default_packages():
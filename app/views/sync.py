@@ -0,0 +1,51 @@
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from app.services.sync_service import SyncService, SyncCursorExpired
+from app.utils.decorators import recorder_required
+from app.utils.helpers import compress_response
+from app.utils.query_guard import statement_budget
+
+sync_bp = Blueprint('sync', __name__, url_prefix='/api/v1')
+
+@sync_bp.route('/sync', methods=['GET'])
+@statement_budget(11)
+@jwt_required()
+@recorder_required
+def get_changes():
+    """增量同步：返回cursor之后的家庭、患者、预约、支付、服务套餐和医院目录变更，不传cursor时全量同步"""
+    try:
+        recorder_id = int(get_jwt_identity())
+        cursor = request.args.get('cursor') or None
+        limit = min(request.args.get('limit', current_app.config.get('SYNC_PAGE_SIZE', 500), type=int),
+                    current_app.config.get('SYNC_MAX_PAGE_SIZE', 1000))
+        if limit < 1:
+            return jsonify({
+                'code': 422,
+                'message': 'limit必须大于0'
+            }), 422
+
+        try:
+            result = SyncService.get_changes(recorder_id, cursor, limit)
+        except SyncCursorExpired as e:
+            return jsonify({
+                'code': 410,
+                'message': str(e)
+            }), 410
+        except ValueError as e:
+            return jsonify({
+                'code': 422,
+                'message': str(e)
+            }), 422
+
+        response = jsonify({
+            'code': 200,
+            'message': '获取成功',
+            'data': result
+        })
+        return compress_response(response, current_app.config.get('SYNC_COMPRESS_MIN_BYTES', 1024))
+    except Exception as e:
+        current_app.logger.error(f"sync.get_changes - 增量同步失败: {str(e)}", exc_info=True)
+        return jsonify({
+            'code': 500,
+            'message': f'服务器内部错误: {str(e)}'
+        }), 500
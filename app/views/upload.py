@@ -0,0 +1,165 @@
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from app.services.upload_service import UploadService, UploadOffsetMismatch
+from app.utils.decorators import recorder_required
+import re
+
+upload_bp = Blueprint('upload', __name__, url_prefix='/api/v1')
+
+CONTENT_RANGE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+def _not_found():
+    return jsonify({
+        'code': 404,
+        'message': '上传不存在'
+    }), 404
+
+def _expired():
+    return jsonify({
+        'code': 410,
+        'message': '上传已过期，请重新创建'
+    }), 410
+
+def _with_offset(response, offset):
+    response.headers['Upload-Offset'] = str(offset or 0)
+    return response
+
+@upload_bp.route('/uploads', methods=['POST'])
+@jwt_required()
+@recorder_required
+def create_upload():
+    """创建分片续传会话：{filename, file_type: audio|image, size, sha256(可选)}"""
+    try:
+        try:
+            session = UploadService.create_session(request.get_json(silent=True) or {}, int(get_jwt_identity()))
+        except ValueError as e:
+            return jsonify({
+                'code': 422,
+                'message': str(e)
+            }), 422
+
+        data = session.to_dict()
+        data['chunk_size'] = current_app.config.get('UPLOAD_CHUNK_SIZE', 2 * 1024 * 1024)
+        data['upload_url'] = f'/api/v1/uploads/{session.id}'
+        return _with_offset(jsonify({
+            'code': 201,
+            'message': '上传已创建',
+            'data': data
+        }), 0), 201
+    except Exception as e:
+        current_app.logger.error(f"upload.create_upload - 创建上传失败: {str(e)}", exc_info=True)
+        return jsonify({
+            'code': 500,
+            'message': f'服务器内部错误: {str(e)}'
+        }), 500
+
+@upload_bp.route('/uploads/<upload_id>', methods=['GET'])
+@jwt_required()
+@recorder_required
+def get_upload(upload_id):
+    """查询上传进度，断线后从返回的offset继续上传"""
+    try:
+        session = UploadService.get_session(upload_id, int(get_jwt_identity()))
+        if not session:
+            return _not_found()
+        if UploadService.is_expired(session):
+            return _expired()
+
+        return _with_offset(jsonify({
+            'code': 200,
+            'message': '获取成功',
+            'data': session.to_dict()
+        }), session.received_size)
+    except Exception as e:
+        current_app.logger.error(f"upload.get_upload - 查询上传失败: {str(e)}", exc_info=True)
+        return jsonify({
+            'code': 500,
+            'message': f'服务器内部错误: {str(e)}'
+        }), 500
+
+@upload_bp.route('/uploads/<upload_id>', methods=['PUT'])
+@jwt_required()
+@recorder_required
+def put_upload_chunk(upload_id):
+    """上传一个分片：请求头 Content-Range: bytes <起始>-<结束>/<总大小> 和 X-Chunk-SHA256，请求体为分片原始字节"""
+    try:
+        session = UploadService.get_session(upload_id, int(get_jwt_identity()))
+        if not session:
+            return _not_found()
+        if UploadService.is_expired(session):
+            return _expired()
+
+        match = CONTENT_RANGE.match(request.headers.get('Content-Range', ''))
+        checksum = request.headers.get('X-Chunk-SHA256')
+        if not match or not checksum:
+            return jsonify({
+                'code': 422,
+                'message': '缺少Content-Range或X-Chunk-SHA256请求头'
+            }), 422
+        start, end, total = (int(value) for value in match.groups())
+        if total != session.total_size or end < start:
+            return jsonify({
+                'code': 422,
+                'message': 'Content-Range与上传的文件大小不一致'
+            }), 422
+
+        received = session.received_size
+        try:
+            offset = UploadService.write_chunk(session, start, end - start + 1, request.stream, checksum)
+        except UploadOffsetMismatch as e:
+            return _with_offset(jsonify({
+                'code': 409,
+                'message': str(e),
+                'data': {'offset': e.offset}
+            }), e.offset), 409
+        except ValueError as e:
+            return _with_offset(jsonify({
+                'code': 422,
+                'message': str(e),
+                'data': {'offset': received}
+            }), received), 422
+
+        return _with_offset(jsonify({
+            'code': 200,
+            'message': '分片已接收',
+            'data': {'offset': offset, 'size': total}
+        }), offset)
+    except Exception as e:
+        current_app.logger.error(f"upload.put_upload_chunk - 写入分片失败: {str(e)}", exc_info=True)
+        return jsonify({
+            'code': 500,
+            'message': f'服务器内部错误: {str(e)}'
+        }), 500
+
+@upload_bp.route('/uploads/<upload_id>/complete', methods=['POST'])
+@jwt_required()
+@recorder_required
+def complete_upload(upload_id):
+    """完成上传：校验整个文件并保存，返回的id可在创建健康记录时引用"""
+    try:
+        session = UploadService.get_session(upload_id, int(get_jwt_identity()))
+        if not session:
+            return _not_found()
+        if UploadService.is_expired(session):
+            return _expired()
+
+        try:
+            session = UploadService.finalize(session)
+        except ValueError as e:
+            return _with_offset(jsonify({
+                'code': 422,
+                'message': str(e),
+                'data': session.to_dict()
+            }), session.received_size), 422
+
+        return jsonify({
+            'code': 200,
+            'message': '上传完成',
+            'data': session.to_dict()
+        })
+    except Exception as e:
+        current_app.logger.error(f"upload.complete_upload - 完成上传失败: {str(e)}", exc_info=True)
+        return jsonify({
+            'code': 500,
+            'message': f'服务器内部错误: {str(e)}'
+        }), 500
@@ -0,0 +1,343 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+服务层微基准测试
+在不同数据规模（1k / 100k / 1m 行）的SQLite模拟数据上测量核心服务函数的
+平均耗时、P95耗时、SQL语句数和内存分配，并与基线文件比较。
+
+用法:
+    python benchmarks/service_bench.py                         # 默认规模 1k,100k
+    python benchmarks/service_bench.py --scales 1k,100k,1m
+    python benchmarks/service_bench.py --update-baseline       # 用本次结果覆盖基线
+    python benchmarks/service_bench.py --threshold 30          # 平均耗时超出基线30%视为退化（默认50%）
+
+SQL语句数的任何增加都判定为退化。有意增加查询的改动（如新增校验查询）须在同一提交中
+重新录制 baselines.json，例如:
+    python benchmarks/service_bench.py --scales 1k,100k,1m --only create_appointment --update-baseline
+"""
+
+import os
+import sys
+import json
+import math
+import shutil
+import queue
+import argparse
+import tempfile
+import traceback
+import tracemalloc
+import multiprocessing
+from datetime import date, timedelta
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json')
+
+# 规模名称 -> 目标总行数（约80行/家庭，每40个家庭一名记录员）
+SCALES = {
+    '1k': 1000,
+    '100k': 100000,
+    '1m': 1000000
+}
+ROWS_PER_FAMILY = 80
+FAMILIES_PER_RECORDER = 40
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = max(int(math.ceil(pct / 100.0 * len(ordered))) - 1, 0)
+    return ordered[index]
+
+def seed_database(path, rows, seed):
+    """生成指定规模的数据库文件（已存在则复用）"""
+    from app import create_app, db
+    from app.utils.seed import SeedGenerator
+
+    app = create_app('benchmark')
+    with app.app_context():
+        db.create_all()
+        families = max(rows // ROWS_PER_FAMILY, 10)
+        SeedGenerator(seed=seed, echo=lambda message: None).run(
+            recorders=max(families // FAMILIES_PER_RECORDER, 1),
+            families=families,
+            hospitals=max(min(families // 100, 50), 3)
+        )
+        db.engine.dispose()
+
+class BenchmarkContext:
+    """基准测试使用的固定样本（数据最多的记录员及其服务对象）"""
+
+    def __init__(self):
+        from sqlalchemy import func
+        from app import db
+        from app.models.appointment import Appointment, ServicePackage
+        from app.models.patient import Patient
+
+        today = date.today()
+        self.recorder_id = db.session.query(Appointment.recorder_id)\
+            .filter(Appointment.scheduled_date == today)\
+            .group_by(Appointment.recorder_id)\
+            .order_by(func.count().desc(), Appointment.recorder_id)\
+            .limit(1).scalar() or db.session.query(func.min(Appointment.recorder_id)).scalar()
+        patients = db.session.query(Patient.id, Patient.family_id)\
+            .join(Appointment, Appointment.patient_id == Patient.id)\
+            .filter(Appointment.recorder_id == self.recorder_id)\
+            .distinct().order_by(Patient.id).all()
+        self.patient_ids = [p.id for p in patients]
+        self.family_ids = sorted({p.family_id for p in patients})
+        self.package_name = db.session.query(ServicePackage.name).order_by(ServicePackage.id).limit(1).scalar()
+        # update_family提交的成员列表（每次修改第一名成员的健康状况）
+        self.family_members = {}
+        members = db.session.query(Patient)\
+            .filter(Patient.family_id.in_(self.family_ids), Patient.is_active == True)\
+            .order_by(Patient.id).all()
+        for member in members:
+            self.family_members.setdefault(member.family_id, []).append({
+                'id': member.id,
+                'name': member.name,
+                'age': member.age,
+                'gender': member.gender,
+                'relationship': member.relationship,
+                'conditions': member.conditions or ''
+            })
+
+    def patient(self, i):
+        return self.patient_ids[i % len(self.patient_ids)]
+
+    def family(self, i):
+        return self.family_ids[i % len(self.family_ids)]
+
+    def members_payload(self, family_id, i):
+        members = [dict(member) for member in self.family_members.get(family_id, [])]
+        if members:
+            members[0]['conditions'] = f'基准测试{i}'
+        return members
+
+def build_benchmarks(ctx):
+    """返回 (名称, 函数) 列表，函数接收迭代序号"""
+    from app.services.appointment_service import AppointmentService
+    from app.services.family_service import FamilyService
+    from app.services.hospital_service import HospitalService
+    from app.services.patient_service import PatientService
+
+    today = date.today().isoformat()
+
+    return [
+        ('AppointmentService.get_today_appointments',
+         lambda i: AppointmentService.get_today_appointments(ctx.recorder_id)),
+        ('AppointmentService.get_appointments',
+         lambda i: AppointmentService.get_appointments(ctx.recorder_id, page=1, limit=20)),
+        # 每次迭代预约不同的日期，时间晚于模拟数据的所有上门时段，避免与已有预约或上一次迭代冲突
+        ('AppointmentService.create_appointment',
+         lambda i: AppointmentService.create_appointment({
+             'patient_id': ctx.patient(i),
+             'scheduled_date': (date.today() + timedelta(days=i)).isoformat(),
+             'scheduled_time': '19:00',
+             'end_time': '19:30',
+             'notes': '基准测试'
+         }, ctx.recorder_id)),
+        ('FamilyService.get_families',
+         lambda i: FamilyService.get_families(ctx.recorder_id, page=1, limit=20)),
+        ('FamilyService.create_family',
+         lambda i: FamilyService.create_family({
+             'householdHead': f'基准{i}',
+             'address': '基准测试地址',
+             'phone': f'139{i:08d}',
+             'householdHeadAge': 70,
+             'householdHeadGender': '男',
+             'householdHeadPackageType': ctx.package_name,
+             'members': [{'name': f'成员{i}', 'age': 68, 'gender': '女', 'relationship': '配偶'}]
+         }, ctx.recorder_id)),
+        ('FamilyService.update_family',
+         lambda i: FamilyService.update_family(ctx.family(i), {
+             'address': f'基准测试地址{i}号',
+             'emergency_contact': f'联系人{i}',
+             'members': ctx.members_payload(ctx.family(i), i)
+         }, ctx.recorder_id)),
+        ('HospitalService.get_hospitals',
+         lambda i: HospitalService.get_hospitals()),
+        ('PatientService.create_health_record',
+         lambda i: PatientService.create_health_record({
+             'patient_id': ctx.patient(i),
+             'recorder_id': ctx.recorder_id,
+             'visit_date': today,
+             'visit_time': '18:00',
+             'vital_signs': json.dumps({'blood_pressure': '130/80', 'heart_rate': 72}),
+             'notes': '基准测试',
+             'photos': '[]'
+         }))
+    ]
+
+def measure(func, repeat, warmup):
+    """测量单个函数：计时、SQL语句数、内存分配"""
+    import time
+    from app import db
+    from app.utils.query_guard import capture_statements
+
+    # 每次调用后清空会话，模拟每个请求使用独立会话
+    for i in range(warmup):
+        func(i)
+        db.session.remove()
+
+    timings = []
+    for i in range(warmup, warmup + repeat):
+        start = time.perf_counter()
+        func(i)
+        timings.append((time.perf_counter() - start) * 1000)
+        db.session.remove()
+
+    with capture_statements() as stats:
+        func(warmup + repeat)
+    db.session.remove()
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    func(warmup + repeat + 1)
+    peak = tracemalloc.get_traced_memory()[1]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    db.session.remove()
+    allocated_blocks = sum(stat.count_diff for stat in after.compare_to(before, 'filename') if stat.count_diff > 0)
+
+    return {
+        'mean_ms': round(sum(timings) / len(timings), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'queries': stats.total,
+        'alloc_peak_kb': round(peak / 1024, 1),
+        'alloc_blocks': allocated_blocks
+    }
+
+def run_scale(scale, data_dir, seed, repeat, warmup, only, result_queue):
+    """在独立进程中运行单个规模的全部基准（每个规模使用不同的数据库）
+
+    结果以 ('ok', results) 放入队列；出错时放入 ('error', 异常堆栈) 交给父进程报告。
+    """
+    try:
+        result_queue.put(('ok', _run_scale(scale, data_dir, seed, repeat, warmup, only)))
+    except BaseException:
+        result_queue.put(('error', traceback.format_exc()))
+        raise
+
+def _run_scale(scale, data_dir, seed, repeat, warmup, only):
+    rows = SCALES[scale]
+    seeded = os.path.join(data_dir, f'seed_{scale}_{seed}_{date.today().isoformat()}.db')
+    working = os.path.join(data_dir, f'bench_{scale}.db')
+
+    if not os.path.exists(seeded):
+        os.environ['BENCHMARK_DATABASE_URL'] = 'sqlite:///' + seeded
+        seed_database(seeded, rows, seed)
+    # 写操作会修改数据，每次在种子数据的副本上运行
+    shutil.copyfile(seeded, working)
+    os.environ['BENCHMARK_DATABASE_URL'] = 'sqlite:///' + working
+
+    # 数据库地址在配置类加载时确定，需重新导入
+    sys.modules.pop('app.config', None)
+    from app import create_app
+
+    app = create_app('benchmark')
+    results = {}
+    with app.app_context():
+        ctx = BenchmarkContext()
+        for name, func in build_benchmarks(ctx):
+            if only and only not in name:
+                continue
+            results[name] = measure(func, repeat, warmup)
+            print(f'  [{scale}] {name}: {results[name]}', flush=True)
+    return results
+
+def collect(process, result_queue, poll_seconds=5):
+    """等待子进程返回结果；子进程出错或异常退出（如被OOM终止）时抛出RuntimeError"""
+    while True:
+        try:
+            status, payload = result_queue.get(timeout=poll_seconds)
+            break
+        except queue.Empty:
+            if not process.is_alive():
+                # 退出前刚放入队列的结果可能还在管道中
+                try:
+                    status, payload = result_queue.get(timeout=poll_seconds)
+                    break
+                except queue.Empty:
+                    process.join()
+                    raise RuntimeError(f'基准子进程异常退出，退出码 {process.exitcode}，未返回结果')
+    process.join()
+    if status == 'error':
+        raise RuntimeError(f'基准子进程出错:\n{payload}')
+    if process.exitcode != 0:
+        raise RuntimeError(f'基准子进程退出码 {process.exitcode}')
+    return payload
+
+def compare(results, baseline, threshold):
+    """与基线比较，返回退化项列表"""
+    regressions = []
+    for scale, benches in results.items():
+        for name, current in benches.items():
+            base = baseline.get(scale, {}).get(name)
+            if not base:
+                continue
+            limit = base['mean_ms'] * (1 + threshold / 100.0)
+            if current['mean_ms'] > limit:
+                regressions.append(f"[{scale}] {name}: 平均耗时 {current['mean_ms']}ms > 基线 {base['mean_ms']}ms (+{threshold}%)")
+            # SQL语句数是确定的，任何增加都视为退化
+            if current['queries'] > base['queries']:
+                regressions.append(f"[{scale}] {name}: SQL语句数 基线 {base['queries']} -> 本次 {current['queries']}"
+                                   f"（有意增加时请在同一提交中使用 --update-baseline 重新录制）")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='服务层微基准测试')
+    parser.add_argument('--scales', default='1k,100k', help='逗号分隔的数据规模: ' + ','.join(SCALES))
+    parser.add_argument('--repeat', type=int, default=20, help='每个函数的计时次数')
+    parser.add_argument('--warmup', type=int, default=2, help='预热次数')
+    parser.add_argument('--seed', type=int, default=42, help='模拟数据随机种子')
+    parser.add_argument('--only', default=None, help='只运行名称包含该字符串的基准')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='基线文件路径')
+    parser.add_argument('--update-baseline', action='store_true', help='用本次结果更新基线')
+    parser.add_argument('--threshold', type=float,
+                        default=float(os.environ.get('BENCHMARK_THRESHOLD', 50)),
+                        help='平均耗时允许超出基线的百分比')
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'recorder_benchmarks'),
+                        help='模拟数据库文件目录')
+    args = parser.parse_args()
+
+    scales = [s.strip() for s in args.scales.split(',') if s.strip()]
+    unknown = [s for s in scales if s not in SCALES]
+    if unknown:
+        parser.error(f'未知的数据规模: {", ".join(unknown)}')
+    os.makedirs(args.data_dir, exist_ok=True)
+
+    spawn = multiprocessing.get_context('spawn')
+    results = {}
+    for scale in scales:
+        print(f'运行 {scale} 规模基准...', flush=True)
+        result_queue = spawn.Queue()
+        process = spawn.Process(target=run_scale, args=(scale, args.data_dir, args.seed, args.repeat,
+                                                         args.warmup, args.only, result_queue))
+        process.start()
+        results[scale] = collect(process, result_queue)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    if args.update_baseline:
+        for scale, benches in results.items():
+            baseline.setdefault(scale, {}).update(benches)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, ensure_ascii=False, indent=2, sort_keys=True)
+        print(f'基线已更新: {args.baseline}')
+        return 0
+
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print('发现性能退化:')
+        for line in regressions:
+            print('  ' + line)
+        return 1
+    print('未发现性能退化')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+启动性能基准测试
+测量应用导入和create_app的耗时、常驻内存以及加载的重量级模块；
+可选地分别以普通模式和 --preload 模式启动gunicorn，比较worker启动耗时和每个worker的内存占用。
+
+用法:
+    python benchmarks/startup_bench.py                      # 冷启动导入 run:app，重复5次
+    python benchmarks/startup_bench.py --repeat 10 --env production
+    python benchmarks/startup_bench.py --gunicorn --workers 4
+    python benchmarks/startup_bench.py --gunicorn --json startup_report.json
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import shutil
+import argparse
+import tempfile
+import statistics
+import subprocess
+import urllib.request
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GUNICORN_CONF = os.path.join(ROOT_DIR, 'gunicorn.conf.py')
+
+# 普通请求用不到、应延迟加载的模块
+HEAVY_MODULES = ('celery', 'kombu', 'billiard', 'PIL', 'redis')
+
+# 在全新解释器中执行：导入run模块（即create_app）并输出耗时和内存
+IMPORT_PROBE = '''
+import sys, time, json
+start = time.perf_counter()
+import run
+elapsed = (time.perf_counter() - start) * 1000
+rss_kb = 0
+with open('/proc/self/status') as f:
+    for line in f:
+        if line.startswith('VmRSS:'):
+            rss_kb = int(line.split()[1])
+print(json.dumps({
+    'import_ms': elapsed,
+    'rss_kb': rss_kb,
+    'modules': len(sys.modules),
+    'heavy_loaded': [m for m in %r if m in sys.modules]
+}))
+''' % (HEAVY_MODULES,)
+
+# 包装仓库的gunicorn配置，在worker fork和初始化完成时记录时间戳
+GUNICORN_PROBE_CONF = '''
+import os, time
+exec(compile(open(%(conf)r).read(), %(conf)r, 'exec'))
+_MARK_DIR = %(marks)r
+_repo_post_fork = post_fork
+
+def post_fork(server, worker):
+    worker._fork_time = time.time()
+    _repo_post_fork(server, worker)
+
+def post_worker_init(worker):
+    with open(os.path.join(_MARK_DIR, str(worker.pid)), 'w') as f:
+        f.write('%%r %%r' %% (worker._fork_time, time.time()))
+'''
+
+def _env(flask_env):
+    env = dict(os.environ, FLASK_ENV=flask_env, PYTHONDONTWRITEBYTECODE='1')
+    env.setdefault('PYTHONPATH', ROOT_DIR)
+    return env
+
+def measure_import(repeat, flask_env):
+    """多次冷启动子进程导入run:app"""
+    samples = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, '-c', IMPORT_PROBE],
+            cwd=ROOT_DIR, env=_env(flask_env), capture_output=True, text=True, check=True
+        ).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    timings = [s['import_ms'] for s in samples]
+    return {
+        'import_ms_median': round(statistics.median(timings), 1),
+        'import_ms_min': round(min(timings), 1),
+        'import_ms_max': round(max(timings), 1),
+        'rss_kb': samples[-1]['rss_kb'],
+        'modules': samples[-1]['modules'],
+        'heavy_loaded': samples[-1]['heavy_loaded']
+    }
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def _smaps_rollup(pid):
+    """读取进程的 Rss / Pss / 私有内存（USS），单位KB"""
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(':') and parts[1].isdigit():
+                values[parts[0][:-1]] = int(parts[1])
+    return {
+        'rss_kb': values.get('Rss', 0),
+        'pss_kb': values.get('Pss', 0),
+        'uss_kb': values.get('Private_Clean', 0) + values.get('Private_Dirty', 0)
+    }
+
+def measure_gunicorn(workers, preload, flask_env, timeout=60):
+    """启动gunicorn，等待全部worker初始化完成后采集启动耗时和内存"""
+    work_dir = tempfile.mkdtemp(prefix='startup_bench_')
+    marks = os.path.join(work_dir, 'marks')
+    os.makedirs(marks)
+    conf = os.path.join(work_dir, 'gunicorn_probe.conf.py')
+    with open(conf, 'w', encoding='utf-8') as f:
+        f.write(GUNICORN_PROBE_CONF % {'conf': GUNICORN_CONF, 'marks': marks})
+
+    port = _free_port()
+    env = _env(flask_env)
+    env.update({
+        'GUNICORN_BIND': f'127.0.0.1:{port}',
+        'GUNICORN_WORKERS': str(workers),
+        'GUNICORN_PRELOAD': 'true' if preload else 'false',
+        'PROMETHEUS_MULTIPROC_DIR': os.path.join(work_dir, 'prometheus')
+    })
+    start = time.time()
+    master = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--config', conf, 'run:app'],
+        cwd=ROOT_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while len(os.listdir(marks)) < workers:
+            if master.poll() is not None:
+                raise RuntimeError(f'gunicorn退出，返回码 {master.returncode}')
+            if time.time() - start > timeout:
+                raise RuntimeError('等待worker启动超时')
+            time.sleep(0.05)
+        all_ready = time.time()
+
+        # 让每个worker处理若干请求，内存达到稳定状态后再采集
+        for _ in range(workers * 5):
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/health/live', timeout=5).read()
+
+        boots, memory = [], []
+        for pid in os.listdir(marks):
+            with open(os.path.join(marks, pid)) as f:
+                fork_time, ready_time = (float(v) for v in f.read().split())
+            boots.append((ready_time - fork_time) * 1000)
+            memory.append(_smaps_rollup(int(pid)))
+        master_memory = _smaps_rollup(master.pid)
+    finally:
+        master.terminate()
+        master.wait(timeout=30)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        'preload': preload,
+        'workers': workers,
+        'all_workers_ready_ms': round((all_ready - start) * 1000, 1),
+        'worker_boot_ms_mean': round(statistics.mean(boots), 1),
+        'worker_rss_kb_mean': round(statistics.mean(m['rss_kb'] for m in memory)),
+        'worker_pss_kb_mean': round(statistics.mean(m['pss_kb'] for m in memory)),
+        'worker_uss_kb_mean': round(statistics.mean(m['uss_kb'] for m in memory)),
+        'master_rss_kb': master_memory['rss_kb']
+    }
+
+def print_report(report):
+    imp = report['import']
+    print(f"导入 run:app: 中位数 {imp['import_ms_median']}ms (最小 {imp['import_ms_min']}ms, "
+          f"最大 {imp['import_ms_max']}ms), RSS {imp['rss_kb'] / 1024:.1f}MB, 模块数 {imp['modules']}")
+    print(f"已加载的重量级模块: {', '.join(imp['heavy_loaded']) or '无'}")
+    for result in report.get('gunicorn', []):
+        mode = 'preload' if result['preload'] else '普通'
+        print(f"gunicorn {mode:>7} x{result['workers']}: 全部就绪 {result['all_workers_ready_ms']}ms, "
+              f"worker启动 {result['worker_boot_ms_mean']}ms, "
+              f"worker RSS {result['worker_rss_kb_mean'] / 1024:.1f}MB / "
+              f"PSS {result['worker_pss_kb_mean'] / 1024:.1f}MB / "
+              f"USS {result['worker_uss_kb_mean'] / 1024:.1f}MB")
+
+def main():
+    parser = argparse.ArgumentParser(description='启动性能基准测试')
+    parser.add_argument('--repeat', type=int, default=5, help='冷启动导入次数')
+    parser.add_argument('--env', default='production', help='FLASK_ENV配置名')
+    parser.add_argument('--gunicorn', action='store_true', help='同时比较gunicorn普通模式与preload模式')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn worker数量')
+    parser.add_argument('--json', default=None, help='把结果写入JSON文件')
+    args = parser.parse_args()
+
+    report = {'import': measure_import(args.repeat, args.env)}
+    if args.gunicorn:
+        report['gunicorn'] = [measure_gunicorn(args.workers, preload, args.env) for preload in (False, True)]
+
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,381 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+记录员工作日负载测试
+模拟多名记录员并发执行一天的工作流程：
+    1. 登录
+    2. 获取今日预约
+    3. 查看家庭详情
+    4. 上传带照片的健康记录
+    5. 完成预约
+
+用法:
+    python benchmarks/workday_load.py --recorders 20                    # 进程内WSGI，多线程
+    python benchmarks/workday_load.py --recorders 20 --mode process     # 进程内WSGI，多进程
+    python benchmarks/workday_load.py --url http://127.0.0.1:5000 --recorders 20
+        # 压测已启动的服务（如 gunicorn --config gunicorn.conf.py run:app），需先执行 flask seed
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import queue
+import uuid
+import argparse
+import tempfile
+import threading
+import traceback
+import multiprocessing
+import urllib.request
+import urllib.error
+from collections import defaultdict
+from datetime import date
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+
+STEPS = ('login', 'today_appointments', 'family_detail', 'create_health_record', 'complete_appointment')
+API_PREFIX = '/api/v1'
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(int(round(pct / 100.0 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+def make_photo(size_kb):
+    """生成指定大小左右的JPEG照片"""
+    from PIL import Image
+    side = max(int((size_kb * 1024 / 0.15) ** 0.5), 64)
+    image = Image.effect_noise((side, side), 64).convert('RGB')
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=85)
+    return buffer.getvalue()
+
+# ========== 客户端 ==========
+
+class WsgiClient:
+    """通过Flask测试客户端在进程内调用应用"""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, token=None, json_body=None, form=None, files=None):
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        if files:
+            data = dict(form or {})
+            for field, items in files.items():
+                data[field] = [(io.BytesIO(content), filename) for filename, content in items]
+            response = self.client.open(path, method=method, headers=headers, data=data,
+                                        content_type='multipart/form-data')
+        else:
+            response = self.client.open(path, method=method, headers=headers, json=json_body)
+        return response.status_code, response.get_json(silent=True)
+
+class HttpClient:
+    """通过HTTP调用独立运行的服务（标准库实现，不依赖requests）"""
+
+    def __init__(self, base_url, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def request(self, method, path, token=None, json_body=None, form=None, files=None):
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        body = None
+        if files:
+            boundary = uuid.uuid4().hex
+            body = self._encode_multipart(boundary, form or {}, files)
+            headers['Content-Type'] = f'multipart/form-data; boundary={boundary}'
+        elif json_body is not None:
+            body = json.dumps(json_body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        req = urllib.request.Request(self.base_url + path, data=body, headers=headers, method=method)
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as response:
+                return response.status, self._parse(response.read())
+        except urllib.error.HTTPError as e:
+            return e.code, self._parse(e.read())
+        except (urllib.error.URLError, OSError):
+            return 0, None
+
+    @staticmethod
+    def _parse(raw):
+        try:
+            return json.loads(raw)
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _encode_multipart(boundary, form, files):
+        lines = []
+        for name, value in form.items():
+            lines.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode('utf-8'))
+        for name, items in files.items():
+            for filename, content in items:
+                lines.append(
+                    f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+                    f'Content-Type: application/octet-stream\r\n\r\n'.encode('utf-8') + content + b'\r\n'
+                )
+        lines.append(f'--{boundary}--\r\n'.encode('utf-8'))
+        return b''.join(lines)
+
+# ========== 工作日流程 ==========
+
+class StepRecorder:
+    """记录各步骤的耗时与成败"""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+
+    def call(self, step, client, *args, **kwargs):
+        start = time.perf_counter()
+        status, body = client.request(*args, **kwargs)
+        elapsed = (time.perf_counter() - start) * 1000
+        ok = 200 <= status < 300 and (body or {}).get('code', 200) == 200
+        self.samples[step].append((elapsed, ok))
+        return body if ok else None
+
+def run_workday(client, username, password, options, recorder):
+    """单个记录员的一天"""
+    body = recorder.call('login', client, 'POST', f'{API_PREFIX}/auth/login',
+                         json_body={'username': username, 'password': password})
+    if not body:
+        return
+    token = body['data']['access_token']
+
+    body = recorder.call('today_appointments', client, 'GET', f'{API_PREFIX}/appointments/today', token=token)
+    if not body:
+        return
+    appointments = body['data'][:options['visits']] if options['visits'] else body['data']
+
+    for appointment in appointments:
+        patient = appointment.get('patient') or {}
+        if patient.get('family_id'):
+            recorder.call('family_detail', client, 'GET', f"{API_PREFIX}/families/{patient['family_id']}", token=token)
+
+        recorder.call('create_health_record', client, 'POST', f'{API_PREFIX}/health-records', token=token, form={
+            'patient_id': appointment['patient_id'],
+            'appointment_id': appointment['id'],
+            'visit_date': date.today().isoformat(),
+            'visit_time': (appointment.get('start_time') or '09:00')[:5],
+            'vital_signs': json.dumps({'blood_pressure': '132/84', 'heart_rate': 76, 'temperature': 36.6}),
+            'notes': '负载测试随访'
+        }, files={'photos': [(f'photo{i}.jpg', options['photo']) for i in range(options['photos'])]})
+
+        recorder.call('complete_appointment', client, 'POST',
+                      f"{API_PREFIX}/appointments/{appointment['id']}/complete", token=token)
+
+        if options['think_ms']:
+            time.sleep(options['think_ms'] / 1000.0)
+
+def _run_users(client_factory, users, options):
+    """在当前进程内用线程并发执行多名记录员的工作日"""
+    recorder = StepRecorder()
+    threads = []
+    for username in users:
+        client = client_factory()
+        thread = threading.Thread(target=run_workday, args=(client, username, options['password'], options, recorder))
+        threads.append(thread)
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return dict(recorder.samples)
+
+def _create_wsgi_app():
+    from app import create_app
+    app = create_app('benchmark')
+    # 日志输出本身会成为瓶颈，负载测试时只保留警告以上
+    app.logger.setLevel('WARNING')
+    return app
+
+def _process_worker(users, options, result_queue):
+    """结果以 ('ok', samples) 放入队列；出错时放入 ('error', 异常堆栈) 交给父进程报告"""
+    try:
+        app = _create_wsgi_app()
+        result_queue.put(('ok', _run_users(lambda: WsgiClient(app), users, options)))
+    except BaseException:
+        result_queue.put(('error', traceback.format_exc()))
+        raise
+
+def collect_samples(processes, result_queue, poll_seconds=5):
+    """汇总各子进程的样本；任一子进程出错或异常退出（如被OOM终止）时结束其余子进程并抛出RuntimeError"""
+    samples = defaultdict(list)
+    received = 0
+    try:
+        while received < len(processes):
+            try:
+                status, payload = result_queue.get(timeout=poll_seconds)
+            except queue.Empty:
+                crashed = [p for p in processes if not p.is_alive() and p.exitcode != 0]
+                if crashed:
+                    raise RuntimeError(f'压测子进程异常退出，退出码 {crashed[0].exitcode}，未返回结果')
+                if not any(p.is_alive() for p in processes):
+                    # 退出前刚放入队列的结果可能还在管道中，再等一轮仍没有则视为失败
+                    try:
+                        status, payload = result_queue.get(timeout=poll_seconds)
+                    except queue.Empty:
+                        raise RuntimeError('压测子进程已全部退出，但有子进程未返回结果')
+                else:
+                    continue
+            if status == 'error':
+                raise RuntimeError(f'压测子进程出错:\n{payload}')
+            for step, values in payload.items():
+                samples[step].extend(values)
+            received += 1
+    except BaseException:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        raise
+    finally:
+        for process in processes:
+            process.join()
+    return samples
+
+# ========== 数据准备 ==========
+
+def busiest_recorders(count):
+    """今日预约最多的生成记录员账号（flask seed 生成，密码一致）"""
+    from app import db
+    from app.models.user import User
+    from app.models.appointment import Appointment
+
+    return [row.username for row in db.session.query(User.username)
+            .join(Appointment, Appointment.recorder_id == User.id)
+            .filter(User.username.like('seed_recorder_%'), Appointment.scheduled_date == date.today())
+            .group_by(User.username)
+            .order_by(db.func.count().desc(), User.username)
+            .limit(count)]
+
+def prepare_database(args):
+    """重建压测数据库并生成模拟数据"""
+    from app import create_app, db
+    from app.utils.seed import SeedGenerator
+
+    app = create_app('benchmark')
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        SeedGenerator(seed=args.seed, echo=lambda message: None).run(
+            recorders=max(args.recorders, args.families // 40),
+            families=args.families,
+            hospitals=3
+        )
+        usernames = busiest_recorders(args.recorders)
+        db.engine.dispose()
+    return usernames
+
+def seeded_usernames(count):
+    """压测外部服务时从其数据库中选取记录员账号（按FLASK_ENV加载配置）"""
+    from app import create_app
+
+    app = create_app(os.environ.get('FLASK_ENV', 'development'))
+    with app.app_context():
+        return busiest_recorders(count)
+
+# ========== 报告 ==========
+
+def summarize(samples, duration):
+    report = {'duration_s': round(duration, 3), 'steps': {}}
+    total = errors = 0
+    for step in STEPS:
+        values = samples.get(step, [])
+        if not values:
+            continue
+        latencies = [v for v, _ in values]
+        failed = sum(1 for _, ok in values if not ok)
+        total += len(values)
+        errors += failed
+        report['steps'][step] = {
+            'requests': len(values),
+            'error_rate': round(failed / len(values), 4),
+            'p50_ms': round(percentile(latencies, 50), 2),
+            'p95_ms': round(percentile(latencies, 95), 2),
+            'p99_ms': round(percentile(latencies, 99), 2)
+        }
+    report['requests'] = total
+    report['error_rate'] = round(errors / total, 4) if total else 0
+    report['throughput_rps'] = round(total / duration, 2) if duration else 0
+    return report
+
+def print_report(report):
+    print(f"\n总请求数: {report['requests']}  耗时: {report['duration_s']}s  "
+          f"吞吐量: {report['throughput_rps']} req/s  错误率: {report['error_rate']:.2%}")
+    print(f"{'step':<24}{'requests':>10}{'errors':>10}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}")
+    for step, stats in report['steps'].items():
+        print(f"{step:<24}{stats['requests']:>10}{stats['error_rate']:>10.2%}"
+              f"{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['p99_ms']:>10}")
+
+def main():
+    parser = argparse.ArgumentParser(description='记录员工作日负载测试')
+    parser.add_argument('--recorders', type=int, default=10, help='并发记录员数')
+    parser.add_argument('--mode', choices=('thread', 'process'), default='thread', help='进程内压测的并发方式')
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 2, help='process模式的进程数')
+    parser.add_argument('--url', default=None, help='压测已启动的服务地址（如本地gunicorn）')
+    parser.add_argument('--families', type=int, default=2000, help='进程内压测生成的家庭数')
+    parser.add_argument('--seed', type=int, default=42, help='模拟数据随机种子')
+    parser.add_argument('--work-dir', default=os.path.join(tempfile.gettempdir(), 'recorder_load'),
+                        help='进程内压测的数据库和上传目录（每次运行会重建数据库）')
+    parser.add_argument('--password', default='123456', help='记录员密码（flask seed默认密码）')
+    parser.add_argument('--visits', type=int, default=0, help='每名记录员最多处理的预约数（0表示全部）')
+    parser.add_argument('--photos', type=int, default=2, help='每条健康记录上传的照片数')
+    parser.add_argument('--photo-kb', type=int, default=200, help='每张照片的大小（KB）')
+    parser.add_argument('--think-ms', type=int, default=0, help='每次上门之间的等待时间（毫秒）')
+    parser.add_argument('--json', dest='json_path', default=None, help='将结果写入JSON文件')
+    args = parser.parse_args()
+
+    if not args.url:
+        # 进程内压测使用独立的数据库和上传目录，子进程通过环境变量继承
+        os.makedirs(args.work_dir, exist_ok=True)
+        os.environ['BENCHMARK_DATABASE_URL'] = 'sqlite:///' + os.path.join(args.work_dir, 'load.db')
+        os.environ['UPLOAD_FOLDER'] = os.path.join(args.work_dir, 'uploads')
+
+    options = {
+        'password': args.password,
+        'visits': args.visits,
+        'photos': args.photos,
+        'photo': make_photo(args.photo_kb),
+        'think_ms': args.think_ms
+    }
+
+    if args.url:
+        users = seeded_usernames(args.recorders)
+    else:
+        print('生成压测数据...', flush=True)
+        users = prepare_database(args)
+    if not users:
+        print('没有可用的记录员账号（今日无预约或未执行 flask seed）')
+        return 1
+    print(f'并发记录员: {len(users)}  模式: {"http " + args.url if args.url else args.mode}', flush=True)
+
+    start = time.perf_counter()
+    if args.url:
+        samples = _run_users(lambda: HttpClient(args.url), users, options)
+    elif args.mode == 'process':
+        spawn = multiprocessing.get_context('spawn')
+        result_queue = spawn.Queue()
+        groups = [users[i::args.processes] for i in range(min(args.processes, len(users)))]
+        processes = [spawn.Process(target=_process_worker, args=(group, options, result_queue)) for group in groups]
+        for process in processes:
+            process.start()
+        samples = collect_samples(processes, result_queue)
+    else:
+        app = _create_wsgi_app()
+        samples = _run_users(lambda: WsgiClient(app), users, options)
+    duration = time.perf_counter() - start
+
+    report = summarize(samples, duration)
+    report['mode'] = 'http' if args.url else args.mode
+    report['recorders'] = len(users)
+    print_report(report)
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 1 if report['error_rate'] > 0 else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,8 @@
+"""
+Celery worker入口
+
+    celery -A celery_worker.celery worker --loglevel=info
+"""
+from run import app  # noqa: F401  创建应用并绑定Celery配置
+from app import celery  # noqa: F401
+from app.tasks import family_import, media  # noqa: F401  注册任务
@@ -0,0 +1,44 @@
+import gc
+import os
+import shutil
+import tempfile
+
+# 基础配置
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('GUNICORN_WORKERS', 4))
+
+# 主进程预加载应用后再fork，worker以写时复制方式共享已导入的模块，启动更快、内存更省
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() not in ('0', 'false', 'no')
+
+# Prometheus多进程模式：各worker把指标写入共享目录，由/metrics统一汇总
+prometheus_dir = os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR',
+    os.path.join(tempfile.gettempdir(), 'recorder_prometheus')
+)
+# 预加载时应用在on_starting之前导入，指标目录需提前存在
+os.makedirs(prometheus_dir, exist_ok=True)
+
+def on_starting(server):
+    """主进程启动时清空上次运行残留的指标文件"""
+    shutil.rmtree(prometheus_dir, ignore_errors=True)
+    os.makedirs(prometheus_dir, exist_ok=True)
+
+def when_ready(server):
+    """预加载完成、开始fork worker之前冻结现有对象
+
+    被冻结的对象不再参与GC扫描，worker中的垃圾回收不会改写这些对象的引用计数页，
+    写时复制共享的内存得以保留。
+    """
+    if preload_app:
+        gc.freeze()
+
+def post_fork(server, worker):
+    """预加载模式下丢弃从主进程继承的数据库连接和Redis客户端"""
+    if preload_app:
+        from app import reset_after_fork
+        reset_after_fork(server.app.wsgi())
+
+def child_exit(server, worker):
+    """worker退出时清理其存活类指标"""
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
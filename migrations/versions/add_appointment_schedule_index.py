@@ -0,0 +1,22 @@
+"""Add recorder schedule index for appointment conflict checks
+
+Revision ID: add_appointment_schedule_index
+Revises: add_media_storage_key
+Create Date: 2026-10-19 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_appointment_schedule_index'
+down_revision = 'add_media_storage_key'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_index('ix_appointments_recorder_schedule', 'appointments',
+                    ['recorder_id', 'scheduled_date', 'start_time', 'end_time'])
+
+def downgrade():
+    op.drop_index('ix_appointments_recorder_schedule', table_name='appointments')
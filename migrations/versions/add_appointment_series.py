@@ -0,0 +1,48 @@
+"""Add appointment series generated from subscriptions
+
+Revision ID: add_appointment_series
+Revises: add_import_jobs
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_appointment_series'
+down_revision = 'add_import_jobs'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # 周期预约表
+    op.create_table(
+        'appointment_series',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('subscription_id', sa.Integer(), sa.ForeignKey('patient_subscriptions.id'), nullable=False),
+        sa.Column('patient_id', sa.Integer(), sa.ForeignKey('patients.id'), nullable=False),
+        sa.Column('recorder_id', sa.Integer(), sa.ForeignKey('recorders.id'), nullable=False),
+        sa.Column('service_type_id', sa.Integer(), sa.ForeignKey('service_types.id'), nullable=True),
+        sa.Column('start_date', sa.Date(), nullable=False),
+        sa.Column('end_date', sa.Date(), nullable=False),
+        sa.Column('visits_per_month', sa.Integer(), nullable=False),
+        sa.Column('start_time', sa.Time(), nullable=False),
+        sa.Column('duration_minutes', sa.Integer(), nullable=False),
+        sa.Column('notes', sa.Text(), nullable=True),
+        sa.Column('status', sa.Enum('active', 'cancelled'), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True)
+    )
+    op.create_index('ix_appointment_series_subscription_id', 'appointment_series', ['subscription_id'])
+    
+    # 预约关联所属的周期预约
+    op.add_column('appointments', sa.Column('series_id', sa.Integer(), nullable=True))
+    op.create_foreign_key('fk_appointments_series_id', 'appointments', 'appointment_series', ['series_id'], ['id'])
+    op.create_index('ix_appointments_series_id', 'appointments', ['series_id'])
+
+def downgrade():
+    op.drop_index('ix_appointments_series_id', table_name='appointments')
+    op.drop_constraint('fk_appointments_series_id', 'appointments', type_='foreignkey')
+    op.drop_column('appointments', 'series_id')
+    op.drop_index('ix_appointment_series_subscription_id', table_name='appointment_series')
+    op.drop_table('appointment_series')
@@ -0,0 +1,27 @@
+"""Add audio transcoding results and original retention
+
+Revision ID: add_audio_transcoding
+Revises: add_media_variants
+Create Date: 2026-10-19 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_audio_transcoding'
+down_revision = 'add_media_variants'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column('health_records', sa.Column('audio_duration_seconds', sa.Float(), nullable=True))
+    op.add_column('health_records', sa.Column('audio_size_bytes', sa.Integer(), nullable=True))
+    op.add_column('media_files', sa.Column('original_expires_at', sa.DateTime(), nullable=True))
+    op.create_index('ix_media_files_original_expires_at', 'media_files', ['original_expires_at'])
+
+def downgrade():
+    op.drop_index('ix_media_files_original_expires_at', table_name='media_files')
+    op.drop_column('media_files', 'original_expires_at')
+    op.drop_column('health_records', 'audio_size_bytes')
+    op.drop_column('health_records', 'audio_duration_seconds')
@@ -0,0 +1,39 @@
+"""Add import jobs for background family imports
+
+Revision ID: add_import_jobs
+Revises: update_family_patient_models
+Create Date: 2026-10-19 09:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_import_jobs'
+down_revision = 'update_family_patient_models'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # 批量导入任务表
+    op.create_table(
+        'import_jobs',
+        sa.Column('id', sa.String(32), primary_key=True),
+        sa.Column('recorder_id', sa.Integer(), sa.ForeignKey('recorders.id'), nullable=False),
+        sa.Column('filename', sa.String(255), nullable=True),
+        sa.Column('file_format', sa.Enum('csv', 'jsonl'), nullable=False),
+        sa.Column('file_path', sa.String(500), nullable=True),
+        sa.Column('status', sa.Enum('pending', 'running', 'completed', 'failed'), nullable=True),
+        sa.Column('total_rows', sa.Integer(), nullable=True),
+        sa.Column('processed_rows', sa.Integer(), nullable=True),
+        sa.Column('succeeded_rows', sa.Integer(), nullable=True),
+        sa.Column('failed_rows', sa.Integer(), nullable=True),
+        sa.Column('errors', sa.Text(), nullable=True),
+        sa.Column('message', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True)
+    )
+
+def downgrade():
+    op.drop_table('import_jobs')
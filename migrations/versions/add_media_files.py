@@ -0,0 +1,36 @@
+"""Add media files processed in the background for health records
+
+Revision ID: add_media_files
+Revises: add_idempotency_keys
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_media_files'
+down_revision = 'add_idempotency_keys'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        'media_files',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('health_record_id', sa.Integer(), sa.ForeignKey('health_records.id'), nullable=False),
+        sa.Column('kind', sa.Enum('audio', 'photo', 'signature'), nullable=False),
+        sa.Column('url', sa.String(length=255), nullable=False),
+        sa.Column('thumbnail_url', sa.String(length=255), nullable=True),
+        sa.Column('status', sa.Enum('processing', 'ready', 'failed'), nullable=True),
+        sa.Column('size_bytes', sa.Integer(), nullable=True),
+        sa.Column('media_metadata', sa.Text(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('processed_at', sa.DateTime(), nullable=True)
+    )
+    op.create_index('ix_media_files_health_record_id', 'media_files', ['health_record_id'])
+
+def downgrade():
+    op.drop_index('ix_media_files_health_record_id', table_name='media_files')
+    op.drop_table('media_files')
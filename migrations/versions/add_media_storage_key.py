@@ -0,0 +1,55 @@
+"""Add storage key to media files for download access checks
+
+Revision ID: add_media_storage_key
+Revises: add_audio_transcoding
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import json
+
+# revision identifiers, used by Alembic.
+revision = 'add_media_storage_key'
+down_revision = 'add_audio_transcoding'
+branch_labels = None
+depends_on = None
+
+media_files = sa.table(
+    'media_files',
+    sa.column('id', sa.Integer), sa.column('health_record_id', sa.Integer), sa.column('kind', sa.String),
+    sa.column('url', sa.String), sa.column('storage_key', sa.String), sa.column('status', sa.String)
+)
+health_records = sa.table(
+    'health_records',
+    sa.column('id', sa.Integer), sa.column('audio_file', sa.String), sa.column('photos', sa.Text),
+    sa.column('patient_signature', sa.String)
+)
+
+def _storage_key(url):
+    return url.rsplit('/', 1)[-1].split('.', 1)[0].split('_', 1)[0]
+
+def upgrade():
+    op.add_column('media_files', sa.Column('storage_key', sa.String(length=64), nullable=True))
+    op.create_index('ix_media_files_storage_key', 'media_files', ['storage_key'])
+
+    bind = op.get_bind()
+    for media_id, url in bind.execute(sa.select(media_files.c.id, media_files.c.url)).fetchall():
+        bind.execute(media_files.update().where(media_files.c.id == media_id).values(storage_key=_storage_key(url)))
+
+    # 后台处理上线前的健康记录没有媒体记录，补建后其文件才能通过下载接口访问
+    with_media = sa.select(media_files.c.health_record_id)
+    rows = []
+    for record_id, audio_file, photos, signature in bind.execute(
+            sa.select(health_records.c.id, health_records.c.audio_file, health_records.c.photos,
+                      health_records.c.patient_signature).where(health_records.c.id.not_in(with_media))).fetchall():
+        entries = [('audio', audio_file)] + [('photo', url) for url in (json.loads(photos) if photos else [])] + \
+            [('signature', signature)]
+        rows.extend({'health_record_id': record_id, 'kind': kind, 'url': url, 'storage_key': _storage_key(url),
+                     'status': 'ready'} for kind, url in entries if url)
+    if rows:
+        op.bulk_insert(media_files, rows)
+
+def downgrade():
+    op.drop_index('ix_media_files_storage_key', table_name='media_files')
+    op.drop_column('media_files', 'storage_key')
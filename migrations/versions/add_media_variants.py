@@ -0,0 +1,21 @@
+"""Add image variants to media files
+
+Revision ID: add_media_variants
+Revises: add_upload_sessions
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_media_variants'
+down_revision = 'add_upload_sessions'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column('media_files', sa.Column('variants', sa.Text(), nullable=True))
+
+def downgrade():
+    op.drop_column('media_files', 'variants')
@@ -0,0 +1,57 @@
+"""Add updated_at indexes and tombstones for delta sync
+
+Revision ID: add_sync_tombstones
+Revises: add_appointment_series
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_sync_tombstones'
+down_revision = 'add_appointment_series'
+branch_labels = None
+depends_on = None
+
+# 原先没有updated_at的表：有created_at的用created_at回填，否则用当前时间
+NEW_UPDATED_AT = {
+    'service_packages': 'created_at',
+    'partner_hospitals': 'created_at',
+    'hospital_departments': None,
+    'hospital_doctors': None
+}
+
+# 已有updated_at、只需加索引的表
+INDEXED_UPDATED_AT = ('families', 'patients', 'appointments', 'payments')
+
+def upgrade():
+    for table, source in NEW_UPDATED_AT.items():
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), nullable=True))
+        op.execute(f"UPDATE {table} SET updated_at = {source or 'CURRENT_TIMESTAMP'}")
+        if source:
+            op.execute(f"UPDATE {table} SET updated_at = CURRENT_TIMESTAMP WHERE updated_at IS NULL")
+
+    for table in list(NEW_UPDATED_AT) + list(INDEXED_UPDATED_AT):
+        op.create_index(f'ix_{table}_updated_at', table, ['updated_at'])
+
+    # 删除记录的墓碑
+    op.create_table(
+        'sync_tombstones',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('entity', sa.String(length=50), nullable=False),
+        sa.Column('entity_id', sa.Integer(), nullable=False),
+        sa.Column('recorder_id', sa.Integer(), nullable=True),
+        sa.Column('deleted_at', sa.DateTime(), nullable=False)
+    )
+    op.create_index('ix_sync_tombstones_recorder_id', 'sync_tombstones', ['recorder_id'])
+    op.create_index('ix_sync_tombstones_deleted_at', 'sync_tombstones', ['deleted_at'])
+
+def downgrade():
+    op.drop_index('ix_sync_tombstones_deleted_at', table_name='sync_tombstones')
+    op.drop_index('ix_sync_tombstones_recorder_id', table_name='sync_tombstones')
+    op.drop_table('sync_tombstones')
+    for table in list(NEW_UPDATED_AT) + list(INDEXED_UPDATED_AT):
+        op.drop_index(f'ix_{table}_updated_at', table_name=table)
+    for table in NEW_UPDATED_AT:
+        op.drop_column(table, 'updated_at')
@@ -0,0 +1,41 @@
+"""Add resumable upload sessions
+
+Revision ID: add_upload_sessions
+Revises: add_media_files
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_upload_sessions'
+down_revision = 'add_media_files'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        'upload_sessions',
+        sa.Column('id', sa.String(length=32), primary_key=True),
+        sa.Column('recorder_id', sa.Integer(), sa.ForeignKey('recorders.id'), nullable=False),
+        sa.Column('file_type', sa.Enum('audio', 'image'), nullable=False),
+        sa.Column('filename', sa.String(length=255), nullable=False),
+        sa.Column('total_size', sa.BigInteger(), nullable=False),
+        sa.Column('received_size', sa.BigInteger(), nullable=True),
+        sa.Column('sha256', sa.String(length=64), nullable=True),
+        sa.Column('status', sa.Enum('uploading', 'completed', 'attached'), nullable=True),
+        sa.Column('temp_path', sa.String(length=500), nullable=True),
+        sa.Column('url', sa.String(length=255), nullable=True),
+        sa.Column('health_record_id', sa.Integer(), sa.ForeignKey('health_records.id'), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('expires_at', sa.DateTime(), nullable=False)
+    )
+    op.create_index('ix_upload_sessions_recorder_id', 'upload_sessions', ['recorder_id'])
+    op.create_index('ix_upload_sessions_expires_at', 'upload_sessions', ['expires_at'])
+
+def downgrade():
+    op.drop_index('ix_upload_sessions_expires_at', table_name='upload_sessions')
+    op.drop_index('ix_upload_sessions_recorder_id', table_name='upload_sessions')
+    op.drop_table('upload_sessions')
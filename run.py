@@ -1,10 +1,7 @@
 import os
+import click
+from datetime import date
 from app import create_app, db
-from app.models.user import User, Recorder, Doctor
-from app.models.patient import Family, Patient
-from app.models.appointment import ServicePackage, PatientSubscription, Appointment
-from app.models.health_record import HealthRecord, MedicalOrder
-from app.models.hospital import PartnerHospital, HospitalDepartment, HospitalDoctor, HospitalAppointment
 
 # 获取配置环境
 config_name = os.environ.get('FLASK_ENV', 'development')
@@ -27,6 +24,7 @@ def drop_db():
 def create_admin():
     """创建管理员用户"""
     from werkzeug.security import generate_password_hash
+    from app.models.user import User
     
     username = input('请输入管理员用户名: ')
     password = input('请输入管理员密码: ')
@@ -46,8 +44,118 @@ def create_admin():
     
     print(f'管理员用户 {username} 创建成功')
 
+@app.cli.command()
+@click.option('--recorders', default=20, show_default=True, help='记录员数量')
+@click.option('--families', default=500, show_default=True, help='家庭数量（成员、订阅、预约等按比例生成）')
+@click.option('--hospitals', default=5, show_default=True, help='合作医院数量')
+@click.option('--history-days', default=90, show_default=True, help='生成多少天的历史预约和健康记录')
+@click.option('--future-days', default=14, show_default=True, help='生成多少天的未来预约')
+@click.option('--anchor-date', default=None, help='以哪一天为"今天"（YYYY-MM-DD），固定后配合--seed可完全复现')
+@click.option('--seed', 'random_seed', default=42, show_default=True, help='随机种子')
+@click.option('--chunk-size', default=5000, show_default=True, help='每批插入行数')
+def seed(recorders, families, hospitals, history_days, future_days, anchor_date, random_seed, chunk_size):
+    """生成模拟数据（用于性能测试）"""
+    from app.utils.seed import SeedGenerator
+
+    db.create_all()
+    generator = SeedGenerator(
+        seed=random_seed,
+        anchor_date=date.fromisoformat(anchor_date) if anchor_date else None,
+        history_days=history_days,
+        future_days=future_days,
+        chunk_size=chunk_size,
+        echo=click.echo
+    )
+    generator.run(recorders=recorders, families=families, hospitals=hospitals)
+
+@app.cli.command('import_families')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--recorder-id', type=int, required=True, help='导入的家庭归属的记录员ID')
+@click.option('--format', 'file_format', type=click.Choice(['csv', 'jsonl']), default=None, help='文件格式，默认按扩展名判断')
+@click.option('--chunk-size', default=None, type=int, help='每批插入的家庭数，默认取FAMILY_IMPORT_CHUNK_SIZE')
+def import_families(path, recorder_id, file_format, chunk_size):
+    """从CSV或JSON Lines文件批量导入家庭"""
+    from app.services.family_import_service import FamilyImportService, detect_import_format, iter_import_rows
+
+    file_format = detect_import_format(path, file_format)
+    if not file_format:
+        raise click.UsageError('无法识别文件格式，请使用 --format csv|jsonl')
+
+    def report(summary):
+        click.echo(f"已处理 {summary['processed']} 行，成功 {summary['succeeded']}，失败 {summary['failed']}")
+
+    with open(path, 'rb') as f:
+        summary = FamilyImportService.import_rows(
+            iter_import_rows(f, file_format), recorder_id, chunk_size=chunk_size, progress=report
+        )
+    for error in summary['errors']:
+        click.echo(f"第{error['row']}行: {error['message']}", err=True)
+
+@app.cli.command('prune_tombstones')
+@click.option('--days', default=None, type=int, help='保留天数，默认取SYNC_TOMBSTONE_RETENTION_DAYS')
+def prune_tombstones(days):
+    """删除超过保留期的增量同步墓碑"""
+    from app.services.sync_service import SyncService
+
+    deleted = SyncService.prune_tombstones(days)
+    click.echo(f"已删除 {deleted} 条墓碑")
+
+@app.cli.command('prune_idempotency_keys')
+def prune_idempotency_keys():
+    """删除已过期的幂等键"""
+    from datetime import datetime
+    from app.models.idempotency import IdempotencyKey
+
+    deleted = IdempotencyKey.query.filter(IdempotencyKey.expires_at < datetime.utcnow())\
+        .delete(synchronize_session=False)
+    db.session.commit()
+    click.echo(f"已删除 {deleted} 个过期幂等键")
+
+@app.cli.command('prune_uploads')
+def prune_uploads():
+    """删除过期未完成的分片上传及其临时文件"""
+    from app.services.upload_service import UploadService
+
+    deleted = UploadService.prune_expired()
+    click.echo(f"已删除 {deleted} 个过期上传")
+
+@app.cli.command('prune_audio_originals')
+def prune_audio_originals():
+    """删除保留期已过、已有转码文件的原始录音"""
+    from app.services.media_service import MediaService
+
+    deleted = MediaService.prune_audio_originals()
+    click.echo(f"已删除 {deleted} 个原始录音")
+
+@app.cli.command('dispatch_pending_media')
+@click.option('--minutes', default=None, type=int, help='只处理创建超过该分钟数的文件，默认取MEDIA_REDISPATCH_AFTER_MINUTES')
+@click.option('--inline', is_flag=True, help='broker不可用时在当前进程处理')
+def dispatch_pending_media(minutes, inline):
+    """重新提交仍在处理中（提交任务失败或worker中断）的健康记录文件"""
+    from app.services.media_service import MediaService
+
+    dispatched, processed = MediaService.dispatch_pending(minutes, inline)
+    click.echo(f"已提交 {dispatched} 个文件，当前进程处理 {processed} 个文件")
+
+@app.cli.command('gc_media_objects')
+@click.option('--grace-seconds', default=None, type=int, help='只清理写入超过该秒数的对象，默认取STORAGE_GC_GRACE_SECONDS')
+def gc_media_objects(grace_seconds):
+    """清理内容寻址存储中已没有任何URL引用的对象"""
+    from app.utils.storage import collect_garbage
+
+    if grace_seconds is None:
+        grace_seconds = app.config.get('STORAGE_GC_GRACE_SECONDS', 3600)
+    removed, freed = collect_garbage(grace_seconds)
+    click.echo(f"已清理 {removed} 个对象，释放 {freed} 字节")
+
 @app.shell_context_processor
 def make_shell_context():
+    # 只在flask shell中导入全部模型，不拖慢Web worker启动
+    from app.models.user import User, Recorder, Doctor
+    from app.models.patient import Family, Patient
+    from app.models.appointment import ServicePackage, PatientSubscription, Appointment
+    from app.models.health_record import HealthRecord, MedicalOrder
+    from app.models.hospital import PartnerHospital, HospitalDepartment, HospitalDoctor, HospitalAppointment
     return {
         'db': db,
         'User': User,
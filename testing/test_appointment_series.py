@@ -0,0 +1,198 @@
+import json
+import unittest
+from datetime import date, time, timedelta
+from flask_jwt_extended import create_access_token
+from app import create_app, db
+from app.models.user import User, Recorder
+from app.models.patient import Family, Patient
+from app.models.appointment import Appointment, AppointmentSeries, PatientSubscription, ServicePackage
+from app.services.appointment_series_service import plan_visit_dates
+from app.utils.query_guard import capture_statements
+
+class AppointmentSeriesTestCase(unittest.TestCase):
+    """周期预约测试用例"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.app = create_app('testing')
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        user = User(username='series_recorder', phone='13800138060', role='recorder', name='周期记录员')
+        user.set_password('123456')
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(Recorder(id=user.id, user_id=user.id, employee_id='R0060'))
+        package = ServicePackage(name='贴心关怀型', price=300, duration_days=60, service_frequency=4, package_level=3)
+        family = Family(householdHead='周建华', address='测试地址', phone='13800138061')
+        db.session.add_all([package, family])
+        db.session.flush()
+        patient = Patient(family_id=family.id, name='周建华', age=75, gender='男', relationship='户主',
+                          packageType='贴心关怀型', paymentStatus='normal')
+        db.session.add(patient)
+        db.session.flush()
+        self.today = date.today()
+        subscription = PatientSubscription(patient_id=patient.id, package_id=package.id, recorder_id=user.id,
+                                           start_date=self.today, end_date=self.today + timedelta(days=60),
+                                           status='active')
+        db.session.add(subscription)
+        # 第一次计划上门的时间已被其他预约占用
+        db.session.add(Appointment(patient_id=patient.id, recorder_id=user.id, scheduled_date=self.today,
+                                   start_time=time(9, 0), end_time=time(10, 0)))
+        db.session.commit()
+
+        self.recorder_id = user.id
+        self.patient_id = patient.id
+        self.subscription_id = subscription.id
+        self.headers = {'Authorization': f'Bearer {create_access_token(identity=str(user.id))}'}
+
+    def tearDown(self):
+        """测试后清理"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def _create_series(self):
+        response = self.client.post('/api/v1/appointment-series', headers=self.headers,
+                                    json={'subscription_id': self.subscription_id, 'scheduled_time': '09:00'})
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.data)['data']
+
+    def test_plan_visit_dates(self):
+        """测试按每月服务次数均匀分布上门日期，不超出订阅期"""
+        dates = plan_visit_dates(date(2026, 1, 31), date(2026, 3, 31), 2)
+        self.assertEqual(dates, [date(2026, 1, 31), date(2026, 2, 14), date(2026, 2, 28), date(2026, 3, 15)])
+        self.assertEqual(len(plan_visit_dates(date(2026, 1, 1), date(2026, 1, 31), 4)), 4)
+
+    def test_create_series_avoids_existing_calendar(self):
+        """测试生成周期预约时避开已有预约，并一次批量插入"""
+        with capture_statements() as stats:
+            series = self._create_series()
+        inserts = [shape for shape in stats.shapes if shape.startswith('INSERT INTO appointments')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(stats.shapes[inserts[0]], 1)
+
+        appointments = series['appointments']
+        self.assertEqual(len(appointments), 8)
+        self.assertEqual(series['skipped_dates'], [])
+        self.assertEqual(appointments[0]['scheduled_date'], self.today.isoformat())
+        self.assertEqual(appointments[0]['start_time'], '10:00:00')
+        self.assertTrue(all(a['start_time'] == '09:00:00' for a in appointments[1:]))
+
+        response = self.client.post('/api/v1/appointment-series', headers=self.headers,
+                                    json={'subscription_id': self.subscription_id, 'scheduled_time': '09:00'})
+        self.assertEqual(response.status_code, 422)
+
+    def test_update_scopes(self):
+        """测试this只改单次，following从中间拆分周期预约，all修改全部未完成的预约"""
+        series = self._create_series()
+        ids = [a['id'] for a in series['appointments']]
+
+        response = self.client.put(f"/api/v1/appointment-series/{series['id']}/appointments/{ids[1]}",
+                                   headers=self.headers, json={'scope': 'this', 'notes': '只改这次'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Appointment.query.filter_by(notes='只改这次').count(), 1)
+
+        response = self.client.put(f"/api/v1/appointment-series/{series['id']}/appointments/{ids[4]}",
+                                   headers=self.headers, json={'scope': 'following', 'scheduled_time': '14:00'})
+        self.assertEqual(response.status_code, 200)
+        new_series_id = json.loads(response.data)['data']['series']['id']
+        self.assertNotEqual(new_series_id, series['id'])
+        db.session.expire_all()
+        self.assertEqual(Appointment.query.filter_by(series_id=series['id']).count(), 4)
+        moved = Appointment.query.filter_by(series_id=new_series_id).all()
+        self.assertEqual(len(moved), 4)
+        self.assertTrue(all(a.start_time == time(14, 0) and a.end_time == time(15, 0) for a in moved))
+
+        response = self.client.put(f"/api/v1/appointment-series/{new_series_id}/appointments/{ids[5]}",
+                                   headers=self.headers, json={'scope': 'all', 'status': 'cancelled'})
+        self.assertEqual(response.status_code, 200)
+        db.session.expire_all()
+        self.assertEqual(db.session.get(AppointmentSeries, new_series_id).status, 'cancelled')
+        self.assertEqual(Appointment.query.filter_by(series_id=new_series_id, status='cancelled').count(), 4)
+
+    def test_update_conflict(self):
+        """测试修改后与已有预约冲突时返回409且不做任何修改"""
+        series = self._create_series()
+        response = self.client.put(f"/api/v1/appointment-series/{series['id']}/appointments/{series['appointments'][0]['id']}",
+                                   headers=self.headers, json={'scope': 'all', 'scheduled_time': '09:30'})
+        self.assertEqual(response.status_code, 409)
+        conflicts = json.loads(response.data)['data']['conflicts']
+        self.assertEqual([c['scheduled_date'] for c in conflicts], [self.today.isoformat()])
+        existing = Appointment.query.filter_by(series_id=None).one()
+        self.assertEqual(conflicts[0]['conflicts_with'], [existing.id])
+        db.session.expire_all()
+        self.assertEqual(Appointment.query.filter_by(series_id=series['id'], start_time=time(9, 30)).count(), 0)
+
+    def test_time_past_midnight_rejected(self):
+        """测试开始时间加时长超过当天24:00时返回422中文提示，不写入任何预约"""
+        response = self.client.post('/api/v1/appointment-series', headers=self.headers,
+                                    json={'subscription_id': self.subscription_id, 'scheduled_time': '23:30'})
+        self.assertEqual(response.status_code, 422)
+        self.assertIn('24:00', json.loads(response.data)['message'])
+        self.assertEqual(AppointmentSeries.query.count(), 0)
+
+        series = self._create_series()
+        response = self.client.put(f"/api/v1/appointment-series/{series['id']}/appointments/{series['appointments'][1]['id']}",
+                                   headers=self.headers, json={'scope': 'all', 'scheduled_time': '23:30'})
+        self.assertEqual(response.status_code, 422)
+        self.assertIn('24:00', json.loads(response.data)['message'])
+        db.session.expire_all()
+        self.assertEqual(Appointment.query.filter_by(start_time=time(23, 30)).count(), 0)
+
+    def test_reactivate_cancelled_conflict(self):
+        """测试恢复已取消的预约时，若原时间已被其他预约占用则返回409"""
+        series = self._create_series()
+        target = series['appointments'][1]
+        url = f"/api/v1/appointment-series/{series['id']}/appointments/{target['id']}"
+        response = self.client.put(url, headers=self.headers, json={'scope': 'this', 'status': 'cancelled'})
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.post('/api/v1/appointments', headers=self.headers,
+                                    json={'patient_id': self.patient_id, 'scheduled_date': target['scheduled_date'],
+                                          'scheduled_time': '09:30', 'end_time': '10:00'})
+        self.assertEqual(response.status_code, 200)
+        taken_id = json.loads(response.data)['data']['id']
+
+        response = self.client.put(url, headers=self.headers, json={'scope': 'this', 'status': 'scheduled'})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(json.loads(response.data)['data']['conflicts'][0]['conflicts_with'], [taken_id])
+        db.session.expire_all()
+        self.assertEqual(db.session.get(Appointment, target['id']).status, 'cancelled')
+
+    def test_single_appointment_conflicts(self):
+        """测试创建和修改单个预约时按索引范围条件检查冲突，返回冲突的预约"""
+        tomorrow = self.today + timedelta(days=1)
+        existing = Appointment(patient_id=self.patient_id, recorder_id=self.recorder_id, scheduled_date=tomorrow,
+                               start_time=time(9, 0))  # 没有结束时间，按默认时长60分钟占用
+        db.session.add(existing)
+        db.session.commit()
+        body = {'patient_id': self.patient_id, 'scheduled_date': tomorrow.isoformat()}
+
+        with capture_statements() as stats:
+            response = self.client.post('/api/v1/appointments', headers=self.headers,
+                                        json=dict(body, scheduled_time='09:30', end_time='10:00'))
+        self.assertEqual(response.status_code, 409)
+        conflicts = json.loads(response.data)['data']['conflicts']
+        self.assertEqual([(c['appointment_id'], c['start_time'], c['end_time']) for c in conflicts],
+                         [(existing.id, '09:00', None)])
+        self.assertTrue(any('appointments.start_time <' in shape for shape in stats.shapes))
+
+        response = self.client.post('/api/v1/appointments', headers=self.headers,
+                                    json=dict(body, scheduled_time='10:00', end_time='10:30'))
+        self.assertEqual(response.status_code, 200)
+        created_id = json.loads(response.data)['data']['id']
+
+        response = self.client.put(f'/api/v1/appointments/{created_id}', headers=self.headers,
+                                   json={'scheduled_time': '08:30', 'end_time': '09:15'})
+        self.assertEqual(response.status_code, 409)
+        db.session.expire_all()
+        self.assertEqual(db.session.get(Appointment, created_id).start_time, time(10, 0))
+        response = self.client.put(f'/api/v1/appointments/{created_id}', headers=self.headers,
+                                   json={'scheduled_time': '10:15', 'end_time': '11:00'})
+        self.assertEqual(response.status_code, 200)
+
+if __name__ == '__main__':
+    unittest.main()
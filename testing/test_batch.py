@@ -0,0 +1,113 @@
+import json
+import unittest
+from unittest import mock
+from flask_jwt_extended import jwt_manager
+from datetime import date, time, timedelta
+from flask_jwt_extended import create_access_token
+from app import create_app, db
+from app.models.user import User, Recorder
+from app.models.appointment import Appointment, ServicePackage
+from app.services.family_service import FamilyService
+from app.utils.query_guard import capture_statements
+
+class BatchTestCase(unittest.TestCase):
+    """批量请求测试用例"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.app = create_app('testing')
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        user = User(username='batch_recorder', phone='13800138050', role='recorder', name='批量记录员')
+        user.set_password('123456')
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(Recorder(id=user.id, user_id=user.id, employee_id='R0050'))
+        db.session.add(ServicePackage(name='基础保障型', price=100, duration_days=30, service_frequency=4, package_level=1))
+        db.session.commit()
+
+        family = FamilyService.create_family({
+            'householdHead': '吴建国', 'address': '测试地址', 'phone': '13800138051',
+            'householdHeadAge': 72, 'householdHeadGender': '男', 'householdHeadPackageType': '基础保障型'
+        }, user.id)
+        appointment = Appointment(patient_id=family.members[0].id, recorder_id=user.id,
+                                  scheduled_date=date.today(), start_time=time(9, 0))
+        db.session.add(appointment)
+        db.session.commit()
+
+        self.family_id = family.id
+        self.patient_id = family.members[0].id
+        self.appointment_id = appointment.id
+        self.headers = {'Authorization': f'Bearer {create_access_token(identity=str(user.id))}'}
+
+    def tearDown(self):
+        """测试后清理"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def _batch(self, requests, **options):
+        response = self.client.post('/api/v1/batch', headers=self.headers, json=dict(options, requests=requests))
+        return response.status_code, json.loads(response.data)
+
+    def _visit_requests(self):
+        return [
+            {'id': 'appointment', 'path': f'/api/v1/appointments/{self.appointment_id}'},
+            {'id': 'family', 'path': f'/api/v1/families/{self.family_id}'},
+            {'id': 'packages', 'path': '/api/v1/service-packages'},
+            {'id': 'hospitals', 'path': '/api/v1/hospitals?page=1'}
+        ]
+
+    def test_batch_reads_share_user_lookup(self):
+        """测试依次处理多个读请求，按顺序返回，用户只查询一次"""
+        with capture_statements() as stats:
+            status, data = self._batch(self._visit_requests())
+
+        self.assertEqual(status, 200)
+        responses = data['data']['responses']
+        self.assertEqual([r['id'] for r in responses], ['appointment', 'family', 'packages', 'hospitals'])
+        self.assertEqual([r['status'] for r in responses], [200, 200, 200, 200])
+        self.assertEqual(responses[0]['body']['data']['id'], self.appointment_id)
+        self.assertEqual(responses[1]['body']['data']['id'], self.family_id)
+        user_queries = sum(count for shape, count in stats.shapes.items() if 'FROM users' in shape)
+        self.assertEqual(user_queries, 1)
+
+    def test_batch_writes_in_order(self):
+        """测试写请求按顺序执行，后面的子请求能读到前面的修改，单个子请求失败不影响其他子请求"""
+        tomorrow = (date.today() + timedelta(days=1)).isoformat()
+        status, data = self._batch([
+            {'method': 'POST', 'path': '/api/v1/appointments',
+             'body': {'patient_id': self.patient_id, 'scheduled_date': tomorrow, 'scheduled_time': '10:00'}},
+            {'path': f'/api/v1/appointments?date_from={tomorrow}&date_to={tomorrow}'},
+            {'path': '/api/v1/appointments/999999'}
+        ], parallel=True)
+
+        self.assertEqual(status, 200)
+        responses = data['data']['responses']
+        self.assertEqual([r['status'] for r in responses], [200, 200, 404])
+        self.assertEqual(responses[1]['body']['data']['total'], 1)
+
+        status, data = self._batch([{'method': 'POST', 'path': '/api/v1/batch', 'body': {'requests': []}}])
+        self.assertEqual(status, 422)
+        for invalid in ({'path': 123}, {'method': 'POST', 'path': '/api/v1/appointments', 'body': [1, 2]}):
+            status, data = self._batch([invalid])
+            self.assertEqual(status, 422)
+
+    def test_batch_parallel_reads(self):
+        """测试parallel为true时连续的读请求并行处理，结果与顺序处理一致；每个批量请求只验证一次JWT"""
+        with mock.patch.object(jwt_manager, '_decode_jwt', wraps=jwt_manager._decode_jwt) as decode:
+            _, sequential = self._batch(self._visit_requests())
+            self.assertEqual(decode.call_count, 1)
+            status, parallel = self._batch(self._visit_requests(), parallel=True)
+            self.assertEqual(decode.call_count, 2)
+
+        self.assertEqual(status, 200)
+        self.assertEqual([r['status'] for r in parallel['data']['responses']], [200, 200, 200, 200])
+        self.assertEqual([r['body']['data'] for r in parallel['data']['responses']],
+                         [r['body']['data'] for r in sequential['data']['responses']])
+
+if __name__ == '__main__':
+    unittest.main()
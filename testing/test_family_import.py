@@ -0,0 +1,118 @@
+import io
+import json
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from flask_jwt_extended import create_access_token
+from app import create_app, db
+from app.models.user import User, Recorder
+from app.models.patient import Family, Patient
+from app.models.appointment import ServicePackage, PatientSubscription
+from app.services.family_import_service import FamilyImportService, iter_import_rows
+
+CSV_HEADER = 'householdHead,address,phone,householdHeadAge,householdHeadGender,householdHeadPackageType,members\n'
+
+class FamilyImportTestCase(unittest.TestCase):
+    """家庭批量导入测试用例"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.app = create_app('testing')
+        self.upload_folder = tempfile.mkdtemp()
+        self.app.config['UPLOAD_FOLDER'] = self.upload_folder
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        user = User(username='import_recorder', phone='13800138080', role='recorder', name='导入记录员')
+        user.set_password('123456')
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(Recorder(id=user.id, user_id=user.id, employee_id='R0080'))
+        db.session.add(ServicePackage(name='基础保障型', price=100, duration_days=30, service_frequency=4, package_level=1))
+        db.session.commit()
+        self.recorder_id = user.id
+        self.headers = {'Authorization': f'Bearer {create_access_token(identity=str(user.id))}'}
+
+    def tearDown(self):
+        """测试后清理"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+        shutil.rmtree(self.upload_folder, ignore_errors=True)
+
+    @staticmethod
+    def _record(i, **overrides):
+        record = {
+            'householdHead': f'导入户主{i}', 'address': '导入地址', 'phone': f'1380013{i:04d}',
+            'householdHeadAge': 70, 'householdHeadGender': '男', 'householdHeadPackageType': '基础保障型',
+            'members': [{'name': f'导入成员{i}', 'age': 68, 'gender': '女', 'relationship': '配偶'}]
+        }
+        record.update(overrides)
+        return record
+
+    def test_csv_import_reports_row_errors(self):
+        """测试同步导入CSV时，无效行返回行号和原因，其余行正常写入"""
+        content = CSV_HEADER + \
+            '张导入,地址一,13800138081,72,男,基础保障型,"[{""name"": ""李导入"", ""age"": 70, ""gender"": ""女"", ""relationship"": ""配偶""}]"\n' + \
+            '王导入,地址二,13800138082,,男,基础保障型,\n' + \
+            '赵导入,地址三,13800138083,65,女,不存在的套餐,\n' + \
+            '钱导入,地址四,13800138084,80,女,基础保障型,\n'
+        response = self.client.post('/api/v1/families/import', headers=self.headers,
+                                    data={'file': (io.BytesIO(content.encode('utf-8-sig')), 'families.csv')},
+                                    content_type='multipart/form-data')
+
+        self.assertEqual(response.status_code, 200)
+        summary = json.loads(response.data)['data']
+        self.assertEqual((summary['processed'], summary['succeeded'], summary['failed']), (4, 2, 2))
+        self.assertEqual([error['row'] for error in summary['errors']], [3, 4])
+        self.assertEqual(Family.query.count(), 2)
+        self.assertEqual(Patient.query.count(), 3)
+        self.assertEqual(PatientSubscription.query.filter_by(recorder_id=self.recorder_id).count(), 2)
+
+    def test_chunk_failure_falls_back_to_single_rows(self):
+        """测试整批写入失败时逐行重试，只有出错的行被跳过"""
+        lines = [json.dumps(self._record(i), ensure_ascii=False) for i in range(5)]
+        original = FamilyImportService._add_families
+
+        def add_families(records, recorder_id, packages):
+            if any(record['householdHead'] == '导入户主3' for record in records):
+                raise ValueError('模拟写入失败')
+            return original(records, recorder_id, packages)
+
+        with mock.patch.object(FamilyImportService, '_add_families', side_effect=add_families):
+            summary = FamilyImportService.import_rows(
+                iter_import_rows(io.BytesIO('\n'.join(lines).encode('utf-8')), 'jsonl'),
+                self.recorder_id, chunk_size=2
+            )
+
+        self.assertEqual((summary['succeeded'], summary['failed']), (4, 1))
+        self.assertEqual(summary['errors'], [{'row': 4, 'message': '写入失败: 模拟写入失败'}])
+        self.assertEqual(Family.query.count(), 4)
+
+    def test_async_import_progress(self):
+        """测试异步导入创建后台任务，并可轮询任务进度"""
+        lines = [json.dumps(self._record(i), ensure_ascii=False) for i in range(3)] + ['不是JSON']
+        response = self.client.post('/api/v1/families/import?async=1', headers=self.headers,
+                                    data={'file': (io.BytesIO('\n'.join(lines).encode('utf-8')), 'families.jsonl')},
+                                    content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 202)
+        job_id = json.loads(response.data)['data']['id']
+
+        # 测试配置下Celery任务同步执行，提交后任务已完成
+        response = self.client.get(f'/api/v1/families/import/{job_id}', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        job = json.loads(response.data)['data']
+        self.assertEqual(job['status'], 'completed')
+        self.assertEqual((job['total_rows'], job['succeeded_rows'], job['failed_rows']), (4, 3, 1))
+        self.assertEqual(job['progress'], 100.0)
+        self.assertEqual(job['errors'][0]['row'], 4)
+        self.assertEqual(Family.query.count(), 3)
+
+        response = self.client.get('/api/v1/families/import/missing', headers=self.headers)
+        self.assertEqual(response.status_code, 404)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import unittest
+from datetime import date, time
+from app import create_app, db
+from app.models.user import User, Recorder
+from app.models.patient import Family, Patient
+from app.models.appointment import Appointment, ServicePackage
+from app.services.family_service import FamilyService
+from app.utils.query_guard import capture_statements
+
+class FamilyServiceTestCase(unittest.TestCase):
+    """家庭服务测试用例"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        user = User(username='family_recorder', phone='13800138070', role='recorder', name='家庭记录员')
+        user.set_password('123456')
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(Recorder(id=user.id, user_id=user.id, employee_id='R0070'))
+        db.session.add(ServicePackage(name='基础保障型', price=100, duration_days=30, service_frequency=4, package_level=1))
+        db.session.commit()
+        self.recorder_id = user.id
+
+        family = FamilyService.create_family({
+            'householdHead': '张建国', 'address': '测试地址', 'phone': '13800138071',
+            'householdHeadAge': 72, 'householdHeadGender': '男', 'householdHeadPackageType': '基础保障型',
+            'members': [
+                {'name': '李秀英', 'age': 70, 'gender': '女', 'relationship': '配偶', 'conditions': ['高血压']},
+                {'name': '张伟', 'age': 45, 'gender': '男', 'relationship': '子女'}
+            ]
+        }, self.recorder_id)
+        self.family_id = family.id
+        members = {p.name: p for p in family.members}
+        self.head_id = members['张建国'].id
+        self.spouse_id = members['李秀英'].id
+        self.son_id = members['张伟'].id
+        db.session.add(Appointment(patient_id=self.spouse_id, recorder_id=self.recorder_id,
+                                   scheduled_date=date.today(), start_time=time(9, 0)))
+        db.session.commit()
+        db.session.remove()
+
+    def tearDown(self):
+        """测试后清理"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def _members(self):
+        db.session.expire_all()
+        return {p.id: p for p in Patient.query.filter_by(family_id=self.family_id).all()}
+
+    def test_update_members_reconciles_differences(self):
+        """测试成员更新只插入、更新、软删除有差异的成员，已有患者id保持不变"""
+        FamilyService.update_family(self.family_id, {'members': [
+            {'id': self.spouse_id, 'name': '李秀英', 'age': 71, 'gender': '女', 'relationship': '配偶'},
+            {'name': '张小明', 'age': 12, 'gender': '男', 'relationship': '孙子女', 'conditions': []}
+        ]}, self.recorder_id)
+
+        members = self._members()
+        self.assertEqual(len(members), 4)
+        self.assertEqual(members[self.spouse_id].age, 71)
+        self.assertEqual(members[self.spouse_id].conditions, '高血压')
+        self.assertTrue(members[self.head_id].is_active)
+        self.assertFalse(members[self.son_id].is_active)
+        grandson = next(p for p in members.values() if p.name == '张小明')
+        self.assertTrue(grandson.is_active)
+        self.assertEqual(Appointment.query.filter_by(patient_id=self.spouse_id).count(), 1)
+
+        family = db.session.get(Family, self.family_id).to_dict(include_members=True)
+        self.assertEqual(family['totalMembers'], 3)
+        self.assertNotIn(self.son_id, [m['id'] for m in family['members']])
+
+    def test_update_members_matches_by_name_and_relationship(self):
+        """测试无id的成员按姓名和关系匹配，已软删除的成员重新启用"""
+        FamilyService.update_family(self.family_id, {'members': [
+            {'name': '李秀英', 'age': 70, 'gender': '女', 'relationship': '配偶'}
+        ]}, self.recorder_id)
+        self.assertFalse(self._members()[self.son_id].is_active)
+
+        FamilyService.update_family(self.family_id, {'members': [
+            {'name': '李秀英', 'age': 70, 'gender': '女', 'relationship': '配偶'},
+            {'name': '张伟', 'age': 46, 'gender': '男', 'relationship': '子女'}
+        ]}, self.recorder_id)
+        members = self._members()
+        self.assertEqual(len(members), 3)
+        self.assertTrue(members[self.son_id].is_active)
+        self.assertEqual(members[self.son_id].age, 46)
+
+    def test_update_members_writes_proportional_to_changes(self):
+        """测试只修改一名成员时只写一条成员记录"""
+        members = [
+            {'id': self.spouse_id, 'name': '李秀英', 'age': 70, 'gender': '女', 'relationship': '配偶',
+             'conditions': ['高血压', '糖尿病']},
+            {'id': self.son_id, 'name': '张伟', 'age': 45, 'gender': '男', 'relationship': '子女'}
+        ]
+        with capture_statements() as stats:
+            FamilyService.update_family(self.family_id, {'members': members}, self.recorder_id)
+        writes = {shape: count for shape, count in stats.shapes.items()
+                  if shape.split()[0] in ('INSERT', 'UPDATE', 'DELETE')}
+        self.assertEqual(sum(count for shape, count in writes.items() if 'patients' in shape.split()[1]), 1)
+        self.assertEqual(sum(writes.values()), 2)
+        self.assertEqual(self._members()[self.spouse_id].conditions, '高血压, 糖尿病')
+
+if __name__ == '__main__':
+    unittest.main()
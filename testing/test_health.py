@@ -0,0 +1,72 @@
+import json
+import unittest
+from unittest import mock
+from app import create_app, db
+from app.views import health
+
+class HealthTestCase(unittest.TestCase):
+    """健康检查接口测试用例"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.client = self.app.test_client()
+        db.create_all()
+
+    def tearDown(self):
+        """测试后清理"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_liveness(self):
+        """测试存活检查不依赖后端"""
+        with mock.patch.object(health, '_run_readiness_checks') as checks:
+            response = self.client.get('/health/live')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data)['status'], 'alive')
+        checks.assert_not_called()
+
+    def test_readiness_reports_latency_and_pool(self):
+        """测试就绪检查上报数据库延迟和连接池状态"""
+        with mock.patch.object(health, '_check_redis'), mock.patch.object(health, '_check_celery_broker'):
+            response = self.client.get('/health/ready')
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertEqual(data['status'], 'healthy')
+        self.assertEqual(data['database']['status'], 'healthy')
+        self.assertIn('latency_ms', data['database'])
+        self.assertIn('pool_class', data['database']['pool'])
+        self.assertIn('latency_ms', data['redis'])
+
+    def test_readiness_results_are_cached(self):
+        """测试短时间内重复探测复用缓存结果"""
+        with mock.patch.object(health, '_check_redis') as redis_check, \
+                mock.patch.object(health, '_check_celery_broker'):
+            first = json.loads(self.client.get('/health').data)
+            second = json.loads(self.client.get('/health').data)
+        self.assertFalse(first['cached'])
+        self.assertTrue(second['cached'])
+        self.assertEqual(redis_check.call_count, 1)
+
+    def test_redis_failure_is_unhealthy(self):
+        """测试Redis不可用时返回503"""
+        with mock.patch.object(health, '_check_redis', side_effect=ConnectionError('refused')), \
+                mock.patch.object(health, '_check_celery_broker'):
+            response = self.client.get('/health/ready')
+        self.assertEqual(response.status_code, 503)
+        data = json.loads(response.data)
+        self.assertEqual(data['redis']['status'], 'unhealthy')
+
+    def test_broker_failure_is_degraded(self):
+        """测试Celery broker不可用时标记为降级"""
+        with mock.patch.object(health, '_check_redis'), \
+                mock.patch.object(health, '_check_celery_broker', side_effect=ConnectionError('refused')):
+            response = self.client.get('/health/ready')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data)['status'], 'degraded')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+import io
+import json
+import unittest
+from datetime import date, datetime, timedelta
+from unittest import mock
+from flask_jwt_extended import create_access_token
+from app import create_app, db
+from app.models.user import User, Recorder
+from app.models.appointment import Appointment, ServicePackage
+from app.models.health_record import HealthRecord
+from app.models.idempotency import IdempotencyKey
+from app.services.family_service import FamilyService
+
+class IdempotencyTestCase(unittest.TestCase):
+    """幂等键测试用例"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.app = create_app('testing')
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        user = User(username='idem_recorder', phone='13800138080', role='recorder', name='幂等记录员')
+        user.set_password('123456')
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(Recorder(id=user.id, user_id=user.id, employee_id='R0080'))
+        db.session.add(ServicePackage(name='基础保障型', price=100, duration_days=30, service_frequency=4, package_level=1))
+        db.session.commit()
+
+        family = FamilyService.create_family({
+            'householdHead': '钱大明', 'address': '测试地址', 'phone': '13800138081',
+            'householdHeadAge': 70, 'householdHeadGender': '男', 'householdHeadPackageType': '基础保障型'
+        }, user.id)
+        self.patient_id = family.members[0].id
+        self.user_id = user.id
+        self.token = create_access_token(identity=str(user.id))
+
+    def tearDown(self):
+        """测试后清理"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def _headers(self, key):
+        return {'Authorization': f'Bearer {self.token}', 'Idempotency-Key': key}
+
+    def _appointment(self, key, scheduled_time='10:00'):
+        return self.client.post('/api/v1/appointments', headers=self._headers(key), json={
+            'patient_id': self.patient_id, 'scheduled_date': (date.today() + timedelta(days=1)).isoformat(),
+            'scheduled_time': scheduled_time})
+
+    def test_retry_replays_first_response(self):
+        """测试相同幂等键重试返回第一次的响应，不重复创建；同一个键用于不同请求返回422"""
+        first = self._appointment('retry-1')
+        retry = self._appointment('retry-1')
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(retry.headers.get('Idempotent-Replayed'), 'true')
+        self.assertEqual(json.loads(retry.data), json.loads(first.data))
+        self.assertEqual(Appointment.query.count(), 1)
+
+        self.assertEqual(self._appointment('retry-1', scheduled_time='11:00').status_code, 422)
+        self.assertEqual(self._appointment('retry-2', scheduled_time='11:00').status_code, 200)
+        self.assertEqual(Appointment.query.count(), 2)
+
+    def test_retry_skips_file_upload(self):
+        """测试健康记录重试不再保存上传的文件"""
+        def post():
+            return self.client.post('/api/v1/health-records', headers=self._headers('record-1'), data={
+                'patient_id': str(self.patient_id), 'visit_date': date.today().isoformat(), 'visit_time': '10:00',
+                'photos': [(io.BytesIO(b'photo'), 'a.jpg')]}, content_type='multipart/form-data')
+
+        with mock.patch('app.views.patient.handle_file_upload', return_value='/static/uploads/a.jpg') as upload:
+            first = post()
+            retry = post()
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(json.loads(retry.data), json.loads(first.data))
+        self.assertEqual(upload.call_count, 1)
+        self.assertEqual(HealthRecord.query.count(), 1)
+
+    def test_stale_processing_key_taken_over(self):
+        """测试处理中的键超过处理超时（worker被终止）后，重试可以接管，未超时时返回409"""
+        now = datetime.utcnow()
+        record = IdempotencyKey(user_id=self.user_id, key='retry-dead',
+                                endpoint='appointment.create_appointment', fingerprint='-', status='processing',
+                                created_at=now - timedelta(seconds=30), expires_at=now + timedelta(days=1))
+        db.session.add(record)
+        db.session.commit()
+        self.assertEqual(self._appointment('retry-dead').status_code, 409)
+
+        record.created_at = now - timedelta(seconds=self.app.config['IDEMPOTENCY_PROCESSING_TIMEOUT'] + 1)
+        db.session.commit()
+        response = self._appointment('retry-dead')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Appointment.query.count(), 1)
+        db.session.expire_all()
+        self.assertEqual(db.session.get(IdempotencyKey, record.id).status, 'completed')
+        self.assertEqual(self._appointment('retry-dead').headers.get('Idempotent-Replayed'), 'true')
+
+    def test_server_error_releases_key(self):
+        """测试第一次请求返回5xx时不记录响应，同一个键可以重试；过期的键重新生效"""
+        with mock.patch('app.views.appointment.AppointmentService.create_appointment', side_effect=RuntimeError('db down')):
+            self.assertEqual(self._appointment('retry-3').status_code, 500)
+        self.assertEqual(IdempotencyKey.query.count(), 0)
+
+        self.assertEqual(self._appointment('retry-3').status_code, 200)
+        IdempotencyKey.query.update({'expires_at': datetime.utcnow() - timedelta(seconds=1)})
+        db.session.commit()
+        response = self._appointment('retry-3', scheduled_time='11:00')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.headers.get('Idempotent-Replayed'))
+        self.assertEqual(Appointment.query.count(), 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,224 @@
+import io
+import os
+import json
+import wave
+import shutil
+import subprocess
+import time
+import tempfile
+import unittest
+from datetime import date
+from unittest import mock
+from PIL import Image
+from flask_jwt_extended import create_access_token
+from app import create_app, db, get_celery, _bind_celery
+from app.services import media_service
+from app.models.user import User, Recorder
+from app.models.appointment import ServicePackage
+from datetime import datetime, timedelta
+from app.models.health_record import HealthRecord, MediaFile
+from app.services.media_service import MediaService
+from app.utils.media import process_image, run_in_pool, reset_pool
+from app.services.family_service import FamilyService
+
+def _image_bytes(size=(800, 600), orientation=None):
+    buffer = io.BytesIO()
+    image = Image.new('RGB', size, (200, 80, 40))
+    exif = Image.Exif()
+    if orientation:
+        exif[0x0112] = orientation
+    image.save(buffer, 'JPEG', exif=exif)
+    return buffer.getvalue()
+
+def _wav_bytes(seconds=2, rate=8000):
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as audio:
+        audio.setnchannels(1)
+        audio.setsampwidth(2)
+        audio.setframerate(rate)
+        audio.writeframes(b'\x00\x00' * rate * seconds)
+    return buffer.getvalue()
+
+class MediaProcessingTestCase(unittest.TestCase):
+    """健康记录上传文件后台处理测试用例"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.app = create_app('testing')
+        self.upload_folder = tempfile.mkdtemp()
+        self.app.config['UPLOAD_FOLDER'] = self.upload_folder
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        user = User(username='media_recorder', phone='13800138085', role='recorder', name='媒体记录员')
+        user.set_password('123456')
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(Recorder(id=user.id, user_id=user.id, employee_id='R0085'))
+        db.session.add(ServicePackage(name='基础保障型', price=100, duration_days=30, service_frequency=4, package_level=1))
+        db.session.commit()
+
+        family = FamilyService.create_family({
+            'householdHead': '孙德福', 'address': '测试地址', 'phone': '13800138086',
+            'householdHeadAge': 78, 'householdHeadGender': '男', 'householdHeadPackageType': '基础保障型'
+        }, user.id)
+        self.patient_id = family.members[0].id
+        self.headers = {'Authorization': f'Bearer {create_access_token(identity=str(user.id))}'}
+        media_service._broker_retry_at = 0.0
+
+    def tearDown(self):
+        """测试后清理"""
+        media_service._broker_retry_at = 0.0
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+        shutil.rmtree(self.upload_folder, ignore_errors=True)
+
+    def _create_record(self, photos, audio=None):
+        data = {'patient_id': str(self.patient_id), 'visit_date': date.today().isoformat(), 'visit_time': '10:00',
+                'photos': [(io.BytesIO(content), name) for name, content in photos]}
+        if audio:
+            data['audio_file'] = (io.BytesIO(audio), 'visit.wav')
+        response = self.client.post('/api/v1/health-records', headers=self.headers, data=data,
+                                    content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.data)['data']
+
+    def _media(self, status_url):
+        response = self.client.get(status_url, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.data)['data']
+
+    def test_media_processed_in_background(self):
+        """测试记录先以processing提交，后台任务生成缩略图和元数据"""
+        with mock.patch('app.services.media_service.MediaService.process') as process:
+            created = self._create_record([('a.jpg', _image_bytes()), ('b.jpg', _image_bytes((300, 900)))], _wav_bytes())
+        self.assertEqual(created['media_status'], 'processing')
+        self.assertEqual(process.call_count, 3)
+        pending = self._media(created['status_url'])
+        self.assertEqual(pending['status'], 'processing')
+        self.assertEqual([m['kind'] for m in pending['media']], ['audio', 'photo', 'photo'])
+
+        # 由（同步执行的）Celery任务处理
+        from app.tasks.media import process_media_file
+        for item in pending['media']:
+            process_media_file.delay(item['id'])
+
+        media = self._media(created['status_url'])
+        self.assertEqual(media['status'], 'ready')
+        audio, photo, tall = media['media']
+        self.assertEqual(audio['metadata']['duration_seconds'], 2.0)
+        self.assertEqual((photo['metadata']['width'], photo['metadata']['height']), (800, 600))
+        thumb_path = os.path.join(self.upload_folder, *photo['thumbnail_url'][len('/static/uploads/'):].split('/'))
+        with Image.open(thumb_path) as thumb:
+            self.assertEqual(thumb.size, (300, 225))
+        self.assertEqual(tall['metadata']['height'], 900)
+        self.assertGreater(photo['size_bytes'], 0)
+
+    def test_dispatch_failure_left_for_redispatch(self):
+        """测试无法提交后台任务时不重试、不在请求中处理，文件保持processing，由定时命令重新提交；损坏的图片标记为failed"""
+        with mock.patch('app.tasks.media.process_media_file.apply_async',
+                        side_effect=ConnectionError('broker down')) as apply_async, \
+                mock.patch('app.services.media_service.MediaService.process') as process:
+            created = self._create_record([('ok.jpg', _image_bytes()), ('broken.jpg', b'not-an-image')])
+            self.assertEqual(MediaService.dispatch_pending(older_than_minutes=0), (0, 0))
+        apply_async.assert_called_once()
+        self.assertIs(apply_async.call_args.kwargs['retry'], False)
+        process.assert_not_called()
+        self.assertEqual(self._media(created['status_url'])['status'], 'processing')
+
+        # 创建时间未超过阈值的文件可能仍在worker中处理，不重新提交
+        self.assertEqual(MediaService.dispatch_pending(), (0, 0))
+        # broker恢复后重新提交（测试中同步执行）
+        media_service._broker_retry_at = 0.0
+        self.assertEqual(MediaService.dispatch_pending(older_than_minutes=0), (2, 0))
+        db.session.expire_all()
+        media = self._media(created['status_url'])
+        self.assertEqual(media['status'], 'failed')
+        self.assertEqual([m['status'] for m in media['media']], ['ready', 'failed'])
+        self.assertEqual(MediaFile.query.filter_by(status='processing').count(), 0)
+
+    def test_unreachable_broker_fails_fast(self):
+        """测试broker不可用时提交任务很快失败，之后的请求在退避期内不再连接broker"""
+        self.app.config.update(CELERY_TASK_ALWAYS_EAGER=False, CELERY_BROKER_URL='redis://127.0.0.1:1/0',
+                               CELERY_RESULT_BACKEND='redis://127.0.0.1:1/0')
+        _bind_celery(get_celery(), self.app)
+        started = time.monotonic()
+        created = self._create_record([('a.jpg', _image_bytes()), ('b.jpg', _image_bytes())])
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertGreater(media_service._broker_retry_at, time.time())
+
+        with mock.patch('app.tasks.media.process_media_file.apply_async') as apply_async:
+            self._create_record([('c.jpg', _image_bytes())])
+        apply_async.assert_not_called()
+        self.assertEqual(self._media(created['status_url'])['status'], 'processing')
+        self.assertEqual(MediaService.dispatch_pending(older_than_minutes=0, inline=True), (0, 3))
+        db.session.expire_all()
+        self.assertEqual(self._media(created['status_url'])['status'], 'ready')
+
+    def test_variants_follow_exif_orientation_and_best_size(self):
+        """测试竖拍照片按EXIF方向生成各尺寸WebP派生图，并按显示尺寸选择最小的合适派生图"""
+        created = self._create_record([('portrait.jpg', _image_bytes((4000, 3000), orientation=6))])
+
+        photo = self._media(created['status_url'])['media'][0]
+        self.assertEqual((photo['metadata']['width'], photo['metadata']['height']), (3000, 4000))
+        sizes = {name: (v['width'], v['height']) for name, v in photo['variants'].items()}
+        self.assertEqual(sizes, {'thumb': (225, 300), 'medium': (600, 800), 'display': (1200, 1600)})
+        self.assertEqual(photo['thumbnail_url'], photo['variants']['thumb']['url'])
+        with Image.open(os.path.join(self.upload_folder, *photo['variants']['medium']['url'][len('/static/uploads/'):].split('/'))) as medium:
+            self.assertEqual((medium.format, medium.size), ('WEBP', (600, 800)))
+
+        best = self._media(created['status_url'] + '?width=500')['media'][0]
+        self.assertEqual(best['best_url'], photo['variants']['medium']['url'])
+        largest = self._media(created['status_url'] + '?width=2000&height=2000')['media'][0]
+        self.assertEqual(largest['best_url'], photo['variants']['display']['url'])
+        invalid = self.client.get(created['status_url'] + '?width=abc', headers=self.headers)
+        self.assertEqual(invalid.status_code, 422)
+
+    def test_process_image_in_worker_pool(self):
+        """测试在子进程池中生成派生图"""
+        path = os.path.join(self.upload_folder, 'pooled.jpg')
+        with open(path, 'wb') as f:
+            f.write(_image_bytes())
+        try:
+            metadata = run_in_pool(1, process_image, path, {'thumb': 100})
+        finally:
+            reset_pool()
+        self.assertEqual((metadata['variants']['thumb']['width'], metadata['variants']['thumb']['height']), (100, 75))
+        self.assertTrue(os.path.exists(metadata['variants']['thumb']['path']))
+
+    def test_audio_transcoded_and_original_pruned(self):
+        """测试录音转码后健康记录引用转码文件并记录时长和大小，原始录音在保留期后删除"""
+        def fake_tools(command, **kwargs):
+            if command[0].endswith('ffprobe'):
+                return subprocess.CompletedProcess(command, 0, stdout=b'2.000\n', stderr=b'')
+            with open(command[-1], 'wb') as f:
+                f.write(b'OggS' + b'\x00' * 2000)
+            return subprocess.CompletedProcess(command, 0, stdout=b'', stderr=b'')
+
+        with mock.patch('app.utils.media.shutil.which', side_effect=lambda name: f'/usr/bin/{name}'), \
+                mock.patch('app.utils.media.subprocess.run', side_effect=fake_tools) as run:
+            created = self._create_record([], _wav_bytes(seconds=2, rate=16000))
+        command = run.call_args_list[0].args[0]
+        self.assertEqual(command[command.index('-ac') + 1], '1')
+        self.assertEqual(command[command.index('-c:a') + 1], 'libopus')
+
+        record = db.session.get(HealthRecord, created['record_id'])
+        audio = record.media[0]
+        self.assertTrue(record.audio_file.endswith('_speech.ogg'))
+        self.assertEqual((record.audio_duration_seconds, record.audio_size_bytes), (2.0, 2004))
+        self.assertGreater(audio.size_bytes, 10 * record.audio_size_bytes)
+        self.assertIsNotNone(audio.original_expires_at)
+        original_path = os.path.join(self.upload_folder, *audio.url[len('/static/uploads/'):].split('/'))
+        self.assertTrue(os.path.exists(original_path))
+
+        audio.original_expires_at = datetime.utcnow() - timedelta(minutes=1)
+        db.session.commit()
+        self.assertEqual(MediaService.prune_audio_originals(), 1)
+        self.assertFalse(os.path.exists(original_path))
+        self.assertEqual(db.session.get(MediaFile, audio.id).url, record.audio_file)
+
+if __name__ == '__main__':
+    unittest.main()
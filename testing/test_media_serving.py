@@ -0,0 +1,122 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import date, time
+from flask_jwt_extended import create_access_token
+from app import create_app, db
+from app.models.user import User, Recorder
+from app.models.appointment import ServicePackage
+from app.models.health_record import HealthRecord
+from app.services.family_service import FamilyService
+from app.services.media_service import MediaService, sign_download
+
+class MediaServingTestCase(unittest.TestCase):
+    """上传文件下载测试用例"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.app = create_app('testing')
+        self.upload_folder = tempfile.mkdtemp()
+        self.app.config['UPLOAD_FOLDER'] = self.upload_folder
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        users = []
+        for index, role in enumerate(('recorder', 'recorder', 'admin')):
+            user = User(username=f'media_user{index}', phone=f'1380013810{index}', role=role, name=f'下载用户{index}')
+            user.set_password('123456')
+            db.session.add(user)
+            db.session.flush()
+            if role == 'recorder':
+                db.session.add(Recorder(id=user.id, user_id=user.id, employee_id=f'R010{index}'))
+            users.append(user)
+        db.session.add(ServicePackage(name='基础保障型', price=100, duration_days=30, service_frequency=4, package_level=1))
+        db.session.commit()
+
+        owner = users[0]
+        family = FamilyService.create_family({
+            'householdHead': '钱有福', 'address': '测试地址', 'phone': '13800138109',
+            'householdHeadAge': 81, 'householdHeadGender': '男', 'householdHeadPackageType': '基础保障型'
+        }, owner.id)
+        self.audio = os.urandom(5000)
+        os.makedirs(os.path.join(self.upload_folder, 'audio'))
+        with open(os.path.join(self.upload_folder, 'audio', 'a1b2c3_speech.ogg'), 'wb') as f:
+            f.write(self.audio)
+        record = HealthRecord(patient_id=family.members[0].id, recorder_id=owner.id, visit_date=date.today(),
+                              visit_time=time(10, 0), audio_file='/static/uploads/audio/a1b2c3_speech.ogg')
+        record.media = MediaService.build_media([('audio', '/static/uploads/audio/a1b2c3.wav')])
+        db.session.add(record)
+        db.session.commit()
+        self.record_id = record.id
+
+        self.url = '/static/uploads/audio/a1b2c3_speech.ogg'
+        self.tokens = [create_access_token(identity=str(user.id)) for user in users]
+
+    def tearDown(self):
+        """测试后清理"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+        shutil.rmtree(self.upload_folder, ignore_errors=True)
+
+    def _get(self, token, url=None, **headers):
+        headers['Authorization'] = f'Bearer {token}'
+        return self.client.get(url or self.url, headers=headers)
+
+    def test_owner_access_with_range_and_cache_headers(self):
+        """测试记录员和管理员可以下载，支持Range分段读取并返回不可变缓存头；其他记录员无法访问"""
+        response = self._get(self.tokens[0])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, self.audio)
+        self.assertIn('immutable', response.headers['Cache-Control'])
+        self.assertIn('private', response.headers['Cache-Control'])
+
+        partial = self._get(self.tokens[0], Range='bytes=1000-1999')
+        self.assertEqual(partial.status_code, 206)
+        self.assertEqual(partial.data, self.audio[1000:2000])
+        self.assertEqual(partial.headers['Content-Range'], f'bytes 1000-1999/{len(self.audio)}')
+
+        # token不再通过查询参数传递，避免出现在访问日志中
+        token_in_query = self.client.get(f'{self.url}?jwt={self.tokens[0]}')
+        self.assertEqual(token_in_query.status_code, 422)
+        self.assertEqual(self._get(self.tokens[2]).status_code, 200)
+        self.assertEqual(self._get(self.tokens[1]).status_code, 404)
+        self.assertEqual(self._get(self.tokens[0], '/static/uploads/audio/ffffff.ogg').status_code, 404)
+        self.assertEqual(self.client.get(self.url).status_code, 422)
+
+    def test_signed_download_url(self):
+        """测试文件处理状态接口返回的签名参数只对该文件有效，过期或被篡改时返回403"""
+        response = self._get(self.tokens[0], f'/api/v1/health-records/{self.record_id}/media')
+        query = response.get_json()['data']['media'][0]['download_query']
+
+        signed = self.client.get(f'{self.url}?{query}', headers={'Range': 'bytes=0-99'})
+        self.assertEqual(signed.status_code, 206)
+        self.assertEqual(signed.data, self.audio[:100])
+        self.assertEqual(signed.headers['Referrer-Policy'], 'no-referrer')
+
+        other = sign_download('/static/uploads/audio/ffffff.wav')
+        self.assertEqual(self.client.get(f'{self.url}?{other}').status_code, 403)
+        self.assertEqual(self.client.get(f"{self.url}?{query.replace('signature=', 'signature=0')}").status_code, 403)
+        expired = sign_download('/static/uploads/audio/a1b2c3.wav', expires_in=-1)
+        self.assertEqual(self.client.get(f'{self.url}?{expired}').status_code, 403)
+
+    def test_offload_to_front_proxy(self):
+        """测试配置X-Accel-Redirect或X-Sendfile时Python进程不发送文件内容"""
+        self.app.config['MEDIA_SENDFILE'] = 'x-accel'
+        response = self._get(self.tokens[0])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['X-Accel-Redirect'], '/_protected_uploads/audio/a1b2c3_speech.ogg')
+        self.assertEqual(response.data, b'')
+        self.assertEqual(response.mimetype, 'audio/ogg')
+
+        self.app.config['MEDIA_SENDFILE'] = 'x-sendfile'
+        response = self._get(self.tokens[0])
+        self.assertEqual(response.headers['X-Sendfile'],
+                         os.path.abspath(os.path.join(self.upload_folder, 'audio', 'a1b2c3_speech.ogg')))
+        self.assertEqual(response.data, b'')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import json
+import tracemalloc
+import unittest
+from app import create_app, db
+from app.models.user import User
+from app.utils import memory_profiler
+from app.utils.memory_profiler import init_memory_profiler, endpoint_allocations
+from werkzeug.security import generate_password_hash
+from flask_jwt_extended import create_access_token
+
+class MemoryProfilerTestCase(unittest.TestCase):
+    """请求内存分析测试用例"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.app = create_app('testing')
+        self.app.config['MEMORY_PROFILING_ENABLED'] = True
+        self.app.config['MEMORY_PROFILING_SAMPLE_RATE'] = 1.0
+        init_memory_profiler(self.app)
+        endpoint_allocations.clear()
+
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.client = self.app.test_client()
+
+        db.create_all()
+
+        self.test_admin = User(
+            username='memoryadmin',
+            phone='13800138097',
+            password_hash=generate_password_hash('testpassword'),
+            role='admin',
+            name='测试管理员'
+        )
+        db.session.add(self.test_admin)
+        db.session.commit()
+
+        self.admin_header = {'Authorization': f'Bearer {create_access_token(identity=str(self.test_admin.id))}'}
+
+    def tearDown(self):
+        """测试后清理"""
+        tracemalloc.stop()
+        endpoint_allocations.clear()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_peak_memory_reported_per_endpoint(self):
+        """测试按端点汇总峰值内存和分配位置，并输出到指标"""
+        self.client.get('/api/v1/admin/slow-queries', headers=self.admin_header)
+
+        response = self.client.get('/api/v1/admin/memory', headers=self.admin_header)
+        data = json.loads(response.data)
+        self.assertEqual(data['code'], 200)
+        report = next(e for e in data['data']['endpoints'] if e['endpoint'] == 'admin.get_slow_queries')
+        self.assertEqual(report['requests'], 1)
+        self.assertGreater(report['max_peak_bytes'], 0)
+        self.assertEqual(report['snapshots'], 1)
+        self.assertTrue(report['top_sites'])
+
+        body = self.client.get('/metrics').get_data(as_text=True)
+        self.assertIn('recorder_http_request_peak_memory_bytes_count{endpoint="admin.get_slow_queries",method="GET"}', body)
+
+    def test_concurrent_request_skipped_while_sampling(self):
+        """测试已有请求在采样时，并发请求跳过采样且不影响后续采样"""
+        with memory_profiler._sample_lock:
+            self.client.get('/api/v1/admin/slow-queries', headers=self.admin_header)
+        self.assertEqual(endpoint_allocations.report(), [])
+
+        self.client.get('/api/v1/admin/slow-queries', headers=self.admin_header)
+        report = endpoint_allocations.report()
+        self.assertEqual([e['requests'] for e in report if e['endpoint'] == 'admin.get_slow_queries'], [1])
+        self.assertFalse(memory_profiler._sample_lock.locked())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+from app import create_app, db
+from app.models.user import User
+from werkzeug.security import generate_password_hash
+from flask_jwt_extended import create_access_token
+
+class MetricsTestCase(unittest.TestCase):
+    """请求指标接口测试用例"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.client = self.app.test_client()
+
+        db.create_all()
+
+        self.test_recorder = User(
+            username='metricsrecorder',
+            phone='13800138090',
+            password_hash=generate_password_hash('testpassword'),
+            role='recorder',
+            name='测试记录员'
+        )
+        db.session.add(self.test_recorder)
+        db.session.commit()
+
+        self.access_token = create_access_token(identity=str(self.test_recorder.id))
+        self.auth_header = {'Authorization': f'Bearer {self.access_token}'}
+
+    def tearDown(self):
+        """测试后清理"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_metrics_exposes_endpoint_latency_and_db_stats(self):
+        """测试/metrics输出按端点聚合的延迟和数据库指标"""
+        response = self.client.get('/api/v1/service-packages', headers=self.auth_header)
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('text/plain', response.content_type)
+
+        body = response.get_data(as_text=True)
+        label = 'endpoint="service_package.get_service_packages",method="GET"'
+        self.assertIn(f'recorder_http_request_duration_seconds_count{{{label}}}', body)
+        self.assertIn('recorder_http_requests_total{endpoint="service_package.get_service_packages",method="GET",status="200"}', body)
+        self.assertIn(f'recorder_http_request_db_queries_count{{{label}}}', body)
+        self.assertIn(f'recorder_http_requests_in_progress{{{label}}} 0.0', body)
+
+    def test_metrics_endpoint_not_tracked(self):
+        """测试/metrics自身请求不计入指标"""
+        self.client.get('/metrics')
+        body = self.client.get('/metrics').get_data(as_text=True)
+        self.assertNotIn('endpoint="metrics.get_metrics"', body)
+
+if __name__ == '__main__':
+    unittest.main()
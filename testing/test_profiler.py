@@ -0,0 +1,88 @@
+import json
+import shutil
+import tempfile
+import unittest
+from app import create_app, db
+from app.models.user import User
+from werkzeug.security import generate_password_hash
+from flask_jwt_extended import create_access_token
+
+class ProfilerTestCase(unittest.TestCase):
+    """按需请求性能分析测试用例"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.app = create_app('testing')
+        self.profile_dir = tempfile.mkdtemp()
+        self.app.config['PROFILE_DIR'] = self.profile_dir
+        self.app.config['PROFILE_SAMPLE_INTERVAL_MS'] = 1
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.client = self.app.test_client()
+
+        db.create_all()
+
+        self.test_admin = User(
+            username='profileadmin',
+            phone='13800138094',
+            password_hash=generate_password_hash('testpassword'),
+            role='admin',
+            name='测试管理员'
+        )
+        self.test_recorder = User(
+            username='profilerecorder',
+            phone='13800138095',
+            password_hash=generate_password_hash('testpassword'),
+            role='recorder',
+            name='测试记录员'
+        )
+        db.session.add_all([self.test_admin, self.test_recorder])
+        db.session.commit()
+
+        self.admin_header = {'Authorization': f'Bearer {create_access_token(identity=str(self.test_admin.id))}'}
+        self.recorder_header = {'Authorization': f'Bearer {create_access_token(identity=str(self.test_recorder.id))}'}
+
+    def tearDown(self):
+        """测试后清理"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+        shutil.rmtree(self.profile_dir, ignore_errors=True)
+
+    def test_admin_request_is_profiled(self):
+        """测试管理员携带X-Profile头时保存折叠栈结果"""
+        headers = dict(self.admin_header, **{'X-Profile': 'trace'})
+        response = self.client.get('/api/v1/admin/slow-queries', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        profile_id = response.headers.get('X-Profile-Id')
+        self.assertIsNotNone(profile_id)
+
+        response = self.client.get('/api/v1/admin/profiles', headers=self.admin_header)
+        data = json.loads(response.data)
+        self.assertEqual(data['data'][0]['id'], profile_id)
+        self.assertEqual(data['data'][0]['endpoint'], 'admin.get_slow_queries')
+
+        response = self.client.get(f'/api/v1/admin/profiles/{profile_id}', headers=self.admin_header)
+        self.assertEqual(response.status_code, 200)
+        collapsed = response.get_data(as_text=True)
+        self.assertIn('get_slow_queries', collapsed)
+        stack, weight = collapsed.splitlines()[0].rsplit(' ', 1)
+        self.assertIn(';', stack)
+        self.assertTrue(weight.isdigit())
+
+    def test_sampling_profiler(self):
+        """测试采样模式"""
+        headers = dict(self.admin_header, **{'X-Profile': 'sample'})
+        response = self.client.get('/api/v1/admin/profiles', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(response.headers.get('X-Profile-Id'))
+
+    def test_non_admin_request_not_profiled(self):
+        """测试非管理员的X-Profile头被忽略"""
+        headers = dict(self.recorder_header, **{'X-Profile': 'trace'})
+        response = self.client.get('/api/v1/service-packages', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.headers.get('X-Profile-Id'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,314 @@
+import os
+import io
+import json
+import shutil
+import hashlib
+import tempfile
+import unittest
+from datetime import date
+from unittest import mock
+from flask_jwt_extended import create_access_token
+from app import create_app, db
+from app.models.user import User
+from app.models.patient import Family, Patient
+from app.models.appointment import Appointment, PatientSubscription, ServicePackage
+from app.models.hospital import HospitalDepartment, HospitalDoctor, HospitalAppointment
+from app.models.import_job import ImportJob
+from app.models.health_record import HealthRecord, MediaFile
+from app.utils.query_guard import capture_statements
+from app.utils.seed import SeedGenerator
+from app.services.family_service import FamilyService
+from app.services.appointment_series_service import AppointmentSeriesService
+from app.services.upload_service import UploadService
+from app.views import health
+
+BUDGET_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'query_budgets.json')
+
+# 批量导入请求：两行有效数据，语句数按批计而不是按行计
+IMPORT_CSV = (
+    'householdHead,address,phone,householdHeadAge,householdHeadGender,householdHeadPackageType,members\n'
+    '导入户主甲,导入地址,13800138094,70,男,基础保障型,"[{""name"": ""导入成员"", ""age"": 68, ""gender"": ""女"", ""relationship"": ""配偶""}]"\n'
+    '导入户主乙,导入地址,13800138095,75,女,基础保障型,\n'
+)
+
+# 分片上传请求的分片内容
+UPLOAD_CHUNK = b'chunk'
+
+# 不访问数据库、无需预算的路由
+EXEMPT_RULES = {'/static/<path:filename>'}
+
+class QueryBudgetTestCase(unittest.TestCase):
+    """接口SQL语句数回归测试：每个路由的语句数不得超过query_budgets.json中的预算
+
+    设置 QUERY_BUDGET_REPORT=1 运行时打印各路由的实际语句数，便于更新预算文件。
+    """
+
+    def setUp(self):
+        """测试前准备"""
+        self.app = create_app('testing')
+        self.upload_folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.upload_folder, ignore_errors=True)
+        self.app.config['UPLOAD_FOLDER'] = self.upload_folder
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.client = self.app.test_client()
+        db.create_all()
+        # 就绪检查中的Redis/Celery不在统计范围内，替换为立即成功
+        for name in ('_check_redis', '_check_celery_broker'):
+            patcher = mock.patch.object(health, name, return_value=None)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        SeedGenerator(seed=3, history_days=20, future_days=7, chunk_size=500,
+                      echo=lambda message: None).run(recorders=2, families=40, hospitals=2)
+
+        admin = User(username='budget_admin', phone='13800138090', role='admin', name='预算管理员')
+        admin.set_password('123456')
+        db.session.add(admin)
+        db.session.commit()
+
+        with open(BUDGET_FILE, encoding='utf-8') as f:
+            self.budgets = json.load(f)
+        self.fixtures = self._pick_fixtures()
+        self.recorder_token = create_access_token(identity=str(self.fixtures['recorder_id']))
+        self.admin_token = create_access_token(identity=str(admin.id))
+        db.session.remove()
+
+    def tearDown(self):
+        """测试后清理"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def _pick_fixtures(self):
+        """选取记录员及其名下的各类数据，破坏性操作使用单独的对象"""
+        today = date.today()
+        recorder_id = db.session.query(Appointment.recorder_id)\
+            .filter(Appointment.scheduled_date == today)\
+            .group_by(Appointment.recorder_id)\
+            .order_by(db.func.count().desc()).limit(1).scalar()
+        appointments = Appointment.query.filter_by(recorder_id=recorder_id)\
+            .order_by(Appointment.id).limit(3).all()
+        families = db.session.query(Family)\
+            .join(Patient).join(PatientSubscription)\
+            .filter(PatientSubscription.recorder_id == recorder_id)\
+            .distinct().order_by(Family.id).limit(2).all()
+        # 删除操作使用没有历史数据的新建家庭（有预约/记录的患者受外键约束不能删除）
+        delete_family = FamilyService.create_family(self._family_data('待删家庭'), recorder_id)
+        member_family = FamilyService.create_family(self._family_data('成员家庭', members=2), recorder_id)
+        head, *members = sorted(member_family.members, key=lambda p: p.id)
+        package_id = PatientSubscription.query.filter_by(patient_id=head.id).first().package_id
+        for member in members:
+            db.session.add(PatientSubscription(patient_id=member.id, package_id=package_id, recorder_id=recorder_id,
+                                               start_date=date.today(), end_date=date.today(), status='active'))
+        # 周期预约：创建请求使用成员家庭户主的订阅，修改请求使用单独家庭已生成的周期预约
+        series_subscription_id = PatientSubscription.query.filter_by(patient_id=head.id).first().id
+        series_family = FamilyService.create_family(self._family_data('周期家庭'), recorder_id)
+        series, _ = AppointmentSeriesService.create_series({
+            'subscription_id': PatientSubscription.query.filter_by(patient_id=series_family.members[0].id).first().id,
+            'scheduled_time': '21:00'
+        }, recorder_id)
+        series_appointment_id = Appointment.query.filter_by(series_id=series.id)\
+            .order_by(Appointment.scheduled_date).first().id
+        import_job = ImportJob(id='budgetjob', recorder_id=recorder_id, filename='families.csv',
+                               file_format='csv', status='completed', total_rows=2, processed_rows=2)
+        db.session.add(import_job)
+        # 分片上传：一个等待写入分片，一个已接收全部字节等待完成
+        upload_data = {'filename': 'visit.mp3', 'file_type': 'audio', 'size': len(UPLOAD_CHUNK)}
+        chunk_upload = UploadService.create_session(upload_data, recorder_id)
+        complete_upload = UploadService.create_session(upload_data, recorder_id)
+        with open(complete_upload.temp_path, 'wb') as f:
+            f.write(UPLOAD_CHUNK)
+        complete_upload.received_size = len(UPLOAD_CHUNK)
+        health_record = HealthRecord.query.filter_by(recorder_id=recorder_id).order_by(HealthRecord.id).first()
+        db.session.add_all([MediaFile(health_record_id=health_record.id, kind='photo', url=f'/static/uploads/image/budget{i}.jpg',
+                                      storage_key=f'budget{i}') for i in range(3)])
+        os.makedirs(os.path.join(self.upload_folder, 'image'))
+        with open(os.path.join(self.upload_folder, 'image', 'budget0_thumb.webp'), 'wb') as f:
+            f.write(UPLOAD_CHUNK)
+        db.session.commit()
+        department = HospitalDepartment.query.order_by(HospitalDepartment.id).first()
+        doctor = HospitalDoctor.query.filter_by(department_id=department.id).first()
+        hospital_appointment = HospitalAppointment.query.filter_by(recorder_id=recorder_id).first()
+        return {
+            'recorder_id': recorder_id,
+            'appointment_id': appointments[0].id,
+            'update_appointment_id': appointments[1].id,
+            'delete_appointment_id': appointments[2].id,
+            'patient_id': appointments[0].patient_id,
+            'family_id': families[0].id,
+            'update_family_id': families[1].id,
+            'delete_family_id': delete_family.id,
+            'member_family_id': member_family.id,
+            'member_id': members[0].id,
+            'delete_member_id': members[1].id,
+            'import_job_id': import_job.id,
+            'health_record_id': health_record.id,
+            'chunk_upload_id': chunk_upload.id,
+            'complete_upload_id': complete_upload.id,
+            'series_subscription_id': series_subscription_id,
+            'series_id': series.id,
+            'series_appointment_id': series_appointment_id,
+            'hospital_id': department.hospital_id,
+            'department_id': department.id,
+            'doctor_id': doctor.id if doctor else None,
+            'hospital_appointment_id': hospital_appointment.id if hospital_appointment else 0,
+            'package_id': ServicePackage.query.order_by(ServicePackage.id).first().id
+        }
+
+    @staticmethod
+    def _family_data(head, members=0):
+        return {
+            'householdHead': head, 'address': '预算测试地址', 'phone': '13800138093',
+            'householdHeadAge': 72, 'householdHeadGender': '男', 'householdHeadPackageType': '基础保障型',
+            'members': [{'name': f'{head}成员{i}', 'age': 40 + i, 'gender': '女', 'relationship': '子女'}
+                        for i in range(members)]
+        }
+
+    def _requests(self):
+        """每个路由的代表性请求：(方法, 路由规则, URL, 调用参数)"""
+        fx = self.fixtures
+        today = date.today().isoformat()
+        recorder = {'headers': {'Authorization': f'Bearer {self.recorder_token}'}}
+        admin = {'headers': {'Authorization': f'Bearer {self.admin_token}'}}
+
+        def as_recorder(**kwargs):
+            return dict(recorder, **kwargs)
+
+        return [
+            ('GET', '/api/v1/admin/memory', '/api/v1/admin/memory', admin),
+            ('GET', '/api/v1/admin/profiles', '/api/v1/admin/profiles', admin),
+            ('GET', '/api/v1/admin/profiles/<profile_id>', '/api/v1/admin/profiles/abc123', admin),
+            ('GET', '/api/v1/admin/slow-queries', '/api/v1/admin/slow-queries', admin),
+            ('GET', '/api/v1/appointments', '/api/v1/appointments?limit=20', recorder),
+            ('POST', '/api/v1/appointments', '/api/v1/appointments', as_recorder(json={
+                'patient_id': fx['patient_id'], 'scheduled_date': today, 'scheduled_time': '19:00',
+                'end_time': '19:30', 'payment': {'amount': 50, 'payment_method': 'cash'}})),
+            ('GET', '/api/v1/appointments/<int:appointment_id>', f"/api/v1/appointments/{fx['appointment_id']}", recorder),
+            ('PUT', '/api/v1/appointments/<int:appointment_id>', f"/api/v1/appointments/{fx['update_appointment_id']}",
+             as_recorder(json={'notes': '预算测试', 'payment': {'amount': 80}})),
+            ('POST', '/api/v1/appointments/<int:appointment_id>/complete',
+             f"/api/v1/appointments/{fx['appointment_id']}/complete", recorder),
+            ('DELETE', '/api/v1/appointments/<int:appointment_id>', f"/api/v1/appointments/{fx['delete_appointment_id']}", recorder),
+            ('GET', '/api/v1/appointments/today', '/api/v1/appointments/today', recorder),
+            ('POST', '/api/v1/appointment-series', '/api/v1/appointment-series', as_recorder(json={
+                'subscription_id': fx['series_subscription_id'], 'scheduled_time': '06:00'})),
+            ('GET', '/api/v1/appointment-series/<int:series_id>', f"/api/v1/appointment-series/{fx['series_id']}", recorder),
+            ('PUT', '/api/v1/appointment-series/<int:series_id>/appointments/<int:appointment_id>',
+             f"/api/v1/appointment-series/{fx['series_id']}/appointments/{fx['series_appointment_id']}",
+             as_recorder(json={'scope': 'all', 'scheduled_time': '21:30', 'notes': '改时间'})),
+            ('POST', '/api/v1/batch', '/api/v1/batch', as_recorder(json={'requests': [
+                {'path': f"/api/v1/appointments/{fx['appointment_id']}"},
+                {'path': f"/api/v1/families/{fx['family_id']}"},
+                {'path': '/api/v1/service-packages'},
+                {'path': '/api/v1/hospitals'}]})),
+            ('POST', '/api/v1/auth/login', '/api/v1/auth/login', {'json': {'username': 'budget_admin', 'password': '123456'}}),
+            ('POST', '/api/v1/auth/register', '/api/v1/auth/register', {'json': {
+                'username': 'budget_new', 'password': '123456', 'confirmPassword': '123456',
+                'email': 'budget@example.com', 'phone': '13800138091', 'idCard': '110101199001011234',
+                'address': '测试地址', 'name': '新用户'}}),
+            ('GET', '/api/v1/families', '/api/v1/families?limit=20', recorder),
+            ('POST', '/api/v1/families', '/api/v1/families', as_recorder(json={
+                'householdHead': '预算户主', 'address': '预算地址', 'phone': '13800138092',
+                'householdHeadAge': 70, 'householdHeadGender': '男', 'householdHeadPackageType': '基础保障型',
+                'members': [{'name': '预算成员', 'age': 68, 'gender': '女', 'relationship': '配偶'}]})),
+            ('GET', '/api/v1/families/<int:family_id>', f"/api/v1/families/{fx['family_id']}", recorder),
+            ('PUT', '/api/v1/families/<int:family_id>', f"/api/v1/families/{fx['update_family_id']}",
+             as_recorder(json={'address': '新地址'})),
+            ('DELETE', '/api/v1/families/<int:family_id>', f"/api/v1/families/{fx['delete_family_id']}", recorder),
+            ('POST', '/api/v1/families/<int:family_id>/members', f"/api/v1/families/{fx['member_family_id']}/members",
+             as_recorder(json={'name': '新成员', 'age': 40, 'gender': '男', 'relationship': '子女'})),
+            ('PUT', '/api/v1/families/<int:family_id>/members/<int:member_id>',
+             f"/api/v1/families/{fx['member_family_id']}/members/{fx['member_id']}", as_recorder(json={'age': 71})),
+            ('DELETE', '/api/v1/families/<int:family_id>/members/<int:member_id>',
+             f"/api/v1/families/{fx['member_family_id']}/members/{fx['delete_member_id']}", recorder),
+            ('GET', '/api/v1/families/random', '/api/v1/families/random', recorder),
+            ('POST', '/api/v1/families/import', '/api/v1/families/import', as_recorder(
+                data={'file': (io.BytesIO(IMPORT_CSV.encode('utf-8')), 'families.csv')},
+                content_type='multipart/form-data')),
+            ('GET', '/api/v1/families/import/<job_id>', f"/api/v1/families/import/{fx['import_job_id']}", recorder),
+            ('POST', '/api/v1/health-records', '/api/v1/health-records', as_recorder(
+                data={'patient_id': str(fx['patient_id']), 'visit_date': today, 'visit_time': '10:00',
+                      'vital_signs': '{"heart_rate": 70}', 'photos': [(io.BytesIO(b'not-an-image'), 'a.txt')]},
+                content_type='multipart/form-data')),
+            ('GET', '/api/v1/health-records/<int:record_id>/media',
+             f"/api/v1/health-records/{fx['health_record_id']}/media", recorder),
+            ('POST', '/api/v1/hospital-appointments', '/api/v1/hospital-appointments', as_recorder(json={
+                'patient_id': fx['patient_id'], 'hospital_id': fx['hospital_id'], 'department_id': fx['department_id'],
+                'doctor_id': fx['doctor_id'], 'appointment_date': today, 'appointment_time': '09:00'})),
+            ('GET', '/api/v1/hospital-appointments/<int:appointment_id>',
+             f"/api/v1/hospital-appointments/{fx['hospital_appointment_id']}", recorder),
+            ('PUT', '/api/v1/hospital-appointments/<int:appointment_id>',
+             f"/api/v1/hospital-appointments/{fx['hospital_appointment_id']}", as_recorder(json={'status': 'confirmed'})),
+            ('GET', '/api/v1/hospitals', '/api/v1/hospitals', recorder),
+            ('GET', '/api/v1/hospitals/<int:hospital_id>/departments',
+             f"/api/v1/hospitals/{fx['hospital_id']}/departments", recorder),
+            ('GET', '/api/v1/hospitals/<int:hospital_id>/departments/<int:department_id>/doctors',
+             f"/api/v1/hospitals/{fx['hospital_id']}/departments/{fx['department_id']}/doctors", recorder),
+            ('GET', '/api/v1/service-packages', '/api/v1/service-packages', recorder),
+            ('GET', '/api/v1/service-packages/<int:package_id>', f"/api/v1/service-packages/{fx['package_id']}", recorder),
+            ('GET', '/api/v1/service-packages/system-defaults', '/api/v1/service-packages/system-defaults', recorder),
+            ('GET', '/api/v1/service-types', '/api/v1/service-types', recorder),
+            ('GET', '/api/v1/sync', '/api/v1/sync', recorder),
+            ('POST', '/api/v1/uploads', '/api/v1/uploads', as_recorder(json={
+                'filename': 'visit.mp3', 'file_type': 'audio', 'size': 1024})),
+            ('GET', '/api/v1/uploads/<upload_id>', f"/api/v1/uploads/{fx['chunk_upload_id']}", recorder),
+            ('PUT', '/api/v1/uploads/<upload_id>', f"/api/v1/uploads/{fx['chunk_upload_id']}", {
+                'headers': dict(recorder['headers'], **{
+                    'Content-Range': f'bytes 0-{len(UPLOAD_CHUNK) - 1}/{len(UPLOAD_CHUNK)}',
+                    'X-Chunk-SHA256': hashlib.sha256(UPLOAD_CHUNK).hexdigest()}),
+                'data': UPLOAD_CHUNK, 'content_type': 'application/octet-stream'}),
+            ('POST', '/api/v1/uploads/<upload_id>/complete', f"/api/v1/uploads/{fx['complete_upload_id']}/complete", recorder),
+            ('GET', '/static/uploads/<file_type>/<name>', '/static/uploads/image/budget0_thumb.webp', recorder),
+            ('GET', '/health', '/health', {}),
+            ('GET', '/health/live', '/health/live', {}),
+            ('GET', '/health/ready', '/health/ready', {}),
+            ('GET', '/metrics', '/metrics', {}),
+        ]
+
+    def _count(self, method, url, kwargs):
+        with capture_statements() as stats:
+            response = self.client.open(url, method=method, **kwargs)
+        db.session.remove()
+        return response, stats
+
+    def test_every_route_has_budget(self):
+        """测试每个注册的路由都有语句预算和对应的请求用例"""
+        covered = {(method, rule) for method, rule, _, _ in self._requests()}
+        for rule in self.app.url_map.iter_rules():
+            if rule.rule in EXEMPT_RULES:
+                continue
+            for method in rule.methods - {'HEAD', 'OPTIONS'}:
+                key = f'{method} {rule.rule}'
+                self.assertIn(key, self.budgets, f'{key} 缺少语句预算')
+                self.assertIn((method, rule.rule), covered, f'{key} 缺少测试请求')
+
+    def test_routes_within_budget(self):
+        """测试每个路由的SQL语句数不超过预算"""
+        report = {}
+        for method, rule, url, kwargs in self._requests():
+            key = f'{method} {rule}'
+            with self.subTest(route=key):
+                response, stats = self._count(method, url, kwargs)
+                report[key] = stats.total
+                self.assertLess(response.status_code, 500, f'{key} 返回 {response.status_code}')
+                self.assertLessEqual(stats.total, self.budgets[key],
+                                     f'{key} 执行了{stats.total}条语句，预算为{self.budgets[key]}条: {list(stats.shapes)}')
+        if os.environ.get('QUERY_BUDGET_REPORT'):
+            print(json.dumps(report, indent=2, ensure_ascii=False, sort_keys=True))
+
+    def test_list_budget_independent_of_page_size(self):
+        """测试列表接口的语句数与分页大小无关"""
+        headers = {'Authorization': f'Bearer {self.recorder_token}'}
+        for path in ('/api/v1/appointments', '/api/v1/families'):
+            with self.subTest(path=path):
+                counts = set()
+                for limit in (1, 5, 50):
+                    response, stats = self._count('GET', f'{path}?limit={limit}', {'headers': headers})
+                    self.assertEqual(response.status_code, 200)
+                    counts.add(stats.total)
+                self.assertEqual(len(counts), 1, f'{path} 语句数随分页大小变化: {sorted(counts)}')
+                self.assertLessEqual(counts.pop(), self.budgets[f'GET {path}'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+from app import create_app, db
+from app.models.user import User
+from app.models.patient import Family
+from app.utils.query_guard import (
+    QueryBudgetExceeded, capture_statements, get_statement_budget, normalize_sql, statement_budget
+)
+from werkzeug.security import generate_password_hash
+from flask_jwt_extended import create_access_token
+
+class QueryGuardTestCase(unittest.TestCase):
+    """N+1检测与语句预算测试用例"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.app = create_app('testing')
+
+        @self.app.route('/_budget_probe')
+        @statement_budget(1)
+        def budget_probe():
+            db.session.execute(db.text('SELECT 1'))
+            db.session.execute(db.text('SELECT 2'))
+            return 'ok'
+
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.client = self.app.test_client()
+
+        db.create_all()
+
+        self.test_recorder = User(
+            username='guardrecorder',
+            phone='13800138091',
+            password_hash=generate_password_hash('testpassword'),
+            role='recorder',
+            name='测试记录员'
+        )
+        db.session.add(self.test_recorder)
+        db.session.commit()
+
+        self.access_token = create_access_token(identity=str(self.test_recorder.id))
+        self.auth_header = {'Authorization': f'Bearer {self.access_token}'}
+
+    def tearDown(self):
+        """测试后清理"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_normalize_sql(self):
+        """测试语句归一化忽略字面量和IN列表长度"""
+        self.assertEqual(
+            normalize_sql("SELECT * FROM patients WHERE family_id = 12 AND name = 'x'"),
+            normalize_sql("SELECT * FROM patients  WHERE family_id = 7 AND name = 'y'")
+        )
+        self.assertEqual(
+            normalize_sql('SELECT * FROM patients WHERE id IN (?, ?, ?)'),
+            normalize_sql('SELECT * FROM patients WHERE id IN (?)')
+        )
+
+    def test_repeated_statement_raises_in_testing(self):
+        """测试同结构语句超过阈值时在测试环境抛出异常"""
+        threshold = self.app.config['N_PLUS_ONE_THRESHOLD']
+        for i in range(threshold + 1):
+            db.session.add(Family(householdHead=f'户主{i}', address='测试地址', phone='13800000000'))
+        db.session.commit()
+        families = Family.query.all()
+
+        with self.app.test_request_context('/'):
+            self.app.preprocess_request()
+            with self.assertRaises(QueryBudgetExceeded):
+                for family in families:
+                    family.get_last_service_date()
+
+    def test_endpoint_within_budget(self):
+        """测试端点语句数不超过声明的预算"""
+        with capture_statements() as stats:
+            response = self.client.get('/api/v1/service-packages', headers=self.auth_header)
+
+        self.assertEqual(response.status_code, 200)
+        budget = get_statement_budget('service_package.get_service_packages')
+        self.assertIsNotNone(budget)
+        self.assertLessEqual(stats.total, budget)
+
+    def test_endpoint_over_budget_raises(self):
+        """测试端点超出语句预算时抛出异常"""
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get('/_budget_probe')
+
+if __name__ == '__main__':
+    unittest.main()
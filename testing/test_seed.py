@@ -0,0 +1,60 @@
+import unittest
+from datetime import date
+from app import create_app, db
+from app.models.user import Recorder
+from app.models.patient import Family, Patient
+from app.models.appointment import Appointment, Payment
+from app.models.health_record import HealthRecord
+from app.utils.seed import SeedGenerator
+
+class SeedTestCase(unittest.TestCase):
+    """模拟数据生成测试用例"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+    def tearDown(self):
+        """测试后清理"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def _seed(self):
+        generator = SeedGenerator(seed=7, anchor_date=date(2026, 3, 2), history_days=30,
+                                  future_days=7, chunk_size=50, echo=lambda message: None)
+        return generator.run(recorders=3, families=30, hospitals=2)
+
+    def test_seed_inserts_related_rows(self):
+        """测试生成的数据数量与外键关联"""
+        counts = self._seed()
+        self.assertEqual(Recorder.query.count(), 3)
+        # 接口以登录用户ID作为记录员ID
+        self.assertTrue(all(r.id == r.user_id for r in Recorder.query))
+        self.assertEqual(Family.query.count(), 30)
+        self.assertEqual(Patient.query.count(), counts['patients'])
+        self.assertGreater(counts['appointments'], 0)
+        # 只有已完成的预约有支付和健康记录
+        completed = Appointment.query.filter_by(status='completed').count()
+        self.assertEqual(Payment.query.count(), completed)
+        self.assertEqual(HealthRecord.query.count(), completed)
+        record = HealthRecord.query.first()
+        self.assertIn('blood_pressure', record.get_vital_signs())
+        self.assertEqual(record.appointment.patient_id, record.patient_id)
+
+    def test_seed_is_deterministic(self):
+        """测试相同种子生成相同数据"""
+        self._seed()
+        first = [(p.name, p.age, p.packageType) for p in Patient.query.order_by(Patient.id)]
+        visits = [(a.scheduled_date, a.start_time, a.status) for a in Appointment.query.order_by(Appointment.id)]
+        db.drop_all()
+        db.create_all()
+        self._seed()
+        self.assertEqual(first, [(p.name, p.age, p.packageType) for p in Patient.query.order_by(Patient.id)])
+        self.assertEqual(visits, [(a.scheduled_date, a.start_time, a.status) for a in Appointment.query.order_by(Appointment.id)])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import os
+import json
+import tempfile
+import unittest
+from app import create_app, db
+from app.models.user import User
+from app.utils.slow_query import slow_query_log
+from werkzeug.security import generate_password_hash
+from flask_jwt_extended import create_access_token
+
+class SlowQueryTestCase(unittest.TestCase):
+    """慢查询日志测试用例"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.client = self.app.test_client()
+
+        db.create_all()
+
+        self.test_admin = User(
+            username='slowadmin',
+            phone='13800138092',
+            password_hash=generate_password_hash('testpassword'),
+            role='admin',
+            name='测试管理员'
+        )
+        self.test_recorder = User(
+            username='slowrecorder',
+            phone='13800138093',
+            password_hash=generate_password_hash('testpassword'),
+            role='recorder',
+            name='测试记录员'
+        )
+        db.session.add_all([self.test_admin, self.test_recorder])
+        db.session.commit()
+
+        self.admin_header = {'Authorization': f'Bearer {create_access_token(identity=str(self.test_admin.id))}'}
+        self.auth_header = {'Authorization': f'Bearer {create_access_token(identity=str(self.test_recorder.id))}'}
+
+        fd, self.log_file = tempfile.mkstemp(suffix='.jsonl')
+        os.close(fd)
+        # 阈值设为0，记录全部语句
+        self.app.config['SLOW_QUERY_THRESHOLD_MS'] = 0
+        self.app.config['SLOW_QUERY_LOG_FILE'] = self.log_file
+        slow_query_log.clear()
+
+    def tearDown(self):
+        """测试后清理"""
+        self.app.config['SLOW_QUERY_THRESHOLD_MS'] = None
+        slow_query_log.wait(timeout=5)
+        slow_query_log.clear()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+        os.remove(self.log_file)
+
+    def test_slow_queries_recorded_with_plan(self):
+        """测试慢查询记录端点、记录员和执行计划"""
+        self.client.get('/api/v1/service-packages', headers=self.auth_header)
+        slow_query_log.wait(timeout=5)
+
+        records = [r for r in slow_query_log.records() if 'service_packages' in r['sql']]
+        self.assertTrue(records)
+        record = records[0]
+        self.assertEqual(record['endpoint'], 'service_package.get_service_packages')
+        self.assertEqual(record['recorder_id'], str(self.test_recorder.id))
+        self.assertIsNotNone(record['plan'])
+        self.assertNotIn('error', record['plan'][0])
+
+        with open(self.log_file, encoding='utf-8') as f:
+            lines = [json.loads(line) for line in f]
+        self.assertTrue(any('service_packages' in line['sql'] for line in lines))
+
+    def test_admin_slow_query_endpoint(self):
+        """测试管理员查看最慢语句结构"""
+        for _ in range(3):
+            self.client.get('/api/v1/service-packages', headers=self.auth_header)
+
+        response = self.client.get('/api/v1/admin/slow-queries?limit=5', headers=self.admin_header)
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertEqual(data['code'], 200)
+        queries = data['data']['queries']
+        self.assertLessEqual(len(queries), 5)
+        package_query = next(q for q in queries if 'service_packages' in q['sql'])
+        self.assertEqual(package_query['count'], 3)
+        self.assertIn('p95_ms', package_query)
+
+if __name__ == '__main__':
+    unittest.main()
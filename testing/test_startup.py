@@ -0,0 +1,58 @@
+import os
+import sys
+import json
+import unittest
+import subprocess
+from app import create_app, db, celery, get_celery, reset_after_fork
+from app.utils import helpers
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class StartupTestCase(unittest.TestCase):
+    """应用启动与预加载测试用例"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+    def tearDown(self):
+        """测试后清理"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_heavy_modules_not_imported(self):
+        """测试创建应用时不导入Celery、Pillow和Redis"""
+        probe = ("import sys, json; from app import create_app; create_app('testing'); "
+                 "print(json.dumps([m for m in ('celery', 'kombu', 'PIL', 'redis') if m in sys.modules]))")
+        output = subprocess.run([sys.executable, '-W', 'ignore', '-c', probe], cwd=ROOT_DIR,
+                                capture_output=True, text=True, check=True).stdout
+        self.assertEqual(json.loads(output.strip().splitlines()[-1]), [])
+
+    def test_celery_bound_to_latest_app(self):
+        """测试Celery实例延迟创建并绑定到最近创建的应用"""
+        instance = get_celery()
+        self.assertIs(celery._get_current_object(), instance)
+        self.assertEqual(instance.conf['CELERY_BROKER_URL'], self.app.config['CELERY_BROKER_URL'])
+
+        @instance.task(name='tests.current_app_name')
+        def current_app_name():
+            from flask import current_app
+            return current_app.config['TESTING']
+
+        self.assertTrue(current_app_name.run())
+        self.assertTrue(current_app_name())
+
+    def test_reset_after_fork(self):
+        """测试fork后丢弃继承的连接"""
+        helpers.redis_client = object()
+        reset_after_fork(self.app)
+        self.assertIsNone(helpers.redis_client)
+        # 连接池被替换后仍可正常查询
+        self.assertEqual(db.session.execute(db.text('SELECT 1')).scalar(), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import io
+import os
+import shutil
+import hashlib
+import tempfile
+import unittest
+from app import create_app
+from app.utils import storage
+
+class StorageTestCase(unittest.TestCase):
+    """内容寻址存储测试用例"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.app = create_app('testing')
+        self.upload_folder = tempfile.mkdtemp()
+        self.app.config['UPLOAD_FOLDER'] = self.upload_folder
+        self.app.config['STORAGE_SPOOL_MAX_BYTES'] = 100 * 1024
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+
+    def tearDown(self):
+        """测试后清理"""
+        self.app_context.pop()
+        shutil.rmtree(self.upload_folder, ignore_errors=True)
+
+    def _path(self, url):
+        return os.path.join(self.upload_folder, *url[len('/static/uploads/'):].split('/'))
+
+    def _objects(self):
+        return [os.path.join(root, name) for root, _, files in os.walk(storage.objects_folder()) for name in files]
+
+    def test_identical_content_stored_once(self):
+        """测试相同内容只保存一份，每次上传仍得到各自的URL"""
+        for size in (1000, 300 * 1024):  # 内存中处理 / 写入临时文件
+            content = os.urandom(size)
+            digest = hashlib.sha256(content).hexdigest()
+            first = storage.store_stream(io.BytesIO(content), 'image', '.jpg')
+            second = storage.store_stream(io.BytesIO(content), 'image', '.jpg')
+
+            self.assertNotEqual(first, second)
+            self.assertRegex(first, r'^/static/uploads/image/[0-9a-f]{32}\.jpg$')
+            self.assertEqual(os.stat(self._path(first)).st_ino, os.stat(self._path(second)).st_ino)
+            with open(self._path(second), 'rb') as f:
+                self.assertEqual(f.read(), content)
+            self.assertTrue(os.path.exists(os.path.join(storage.objects_folder(), digest[:2], digest[2:4], digest)))
+            self.assertEqual(storage.reference_count(digest), 2)
+
+        self.assertEqual(len(self._objects()), 2)
+        self.assertEqual(os.listdir(storage.incoming_folder()), [])
+
+    def test_collect_garbage_after_release(self):
+        """测试释放全部URL后对象才会被清理"""
+        content = b'signature' * 100
+        digest = hashlib.sha256(content).hexdigest()
+        first = storage.store_stream(io.BytesIO(content), 'image', '.png')
+        second = storage.store_stream(io.BytesIO(content), 'image', '.png')
+
+        storage.release(first)
+        self.assertEqual(storage.collect_garbage(grace_seconds=0), (0, 0))
+        self.assertEqual(storage.reference_count(digest), 1)
+
+        storage.release(second)
+        self.assertEqual(storage.collect_garbage(grace_seconds=0), (1, len(content)))
+        self.assertEqual(self._objects(), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import gzip
+import json
+import unittest
+from datetime import date, datetime, time, timedelta
+from flask_jwt_extended import create_access_token
+from app import create_app, db
+from app.models.user import User, Recorder
+from app.models.appointment import Appointment, ServicePackage
+from app.models.sync import SyncTombstone
+from app.services.family_service import FamilyService
+from app.services.sync_service import encode_cursor
+
+class SyncTestCase(unittest.TestCase):
+    """增量同步测试用例"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.app = create_app('testing')
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        users = []
+        for index in range(2):
+            user = User(username=f'sync_recorder{index}', phone=f'1380013807{index}', role='recorder', name='同步记录员')
+            user.set_password('123456')
+            db.session.add(user)
+            db.session.flush()
+            db.session.add(Recorder(id=user.id, user_id=user.id, employee_id=f'R007{index}'))
+            users.append(user)
+        db.session.add(ServicePackage(name='基础保障型', price=100, duration_days=30, service_frequency=4, package_level=1))
+        db.session.commit()
+
+        family = FamilyService.create_family({
+            'householdHead': '郑国强', 'address': '测试地址', 'phone': '13800138075',
+            'householdHeadAge': 70, 'householdHeadGender': '男', 'householdHeadPackageType': '基础保障型'
+        }, users[0].id)
+        # 其他记录员的家庭不应同步给当前记录员
+        FamilyService.create_family({
+            'householdHead': '王其他', 'address': '测试地址', 'phone': '13800138076',
+            'householdHeadAge': 66, 'householdHeadGender': '女', 'householdHeadPackageType': '基础保障型'
+        }, users[1].id)
+
+        self.family_id = family.id
+        self.patient_id = family.members[0].id
+        self.recorder_id = users[0].id
+        self.headers = {'Authorization': f'Bearer {create_access_token(identity=str(users[0].id))}'}
+
+    def tearDown(self):
+        """测试后清理"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def _sync(self, cursor=None, limit=None, headers=None):
+        query = {key: value for key, value in (('cursor', cursor), ('limit', limit)) if value is not None}
+        return self.client.get('/api/v1/sync', headers=headers or self.headers, query_string=query)
+
+    def _changes(self, cursor=None, limit=None):
+        response = self._sync(cursor, limit)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.data)['data']
+
+    def test_full_then_delta(self):
+        """测试全量同步只包含本记录员的数据，之后只返回游标之后的变更"""
+        full = self._changes()
+        self.assertFalse(full['has_more'])
+        entities = {(c['entity'], c['id']) for c in full['changes']}
+        self.assertIn(('families', self.family_id), entities)
+        self.assertIn(('patients', self.patient_id), entities)
+        self.assertEqual(len([c for c in full['changes'] if c['entity'] == 'families']), 1)
+        self.assertIn('service_packages', {c['entity'] for c in full['changes']})
+
+        self.assertEqual(self._changes(full['cursor'])['changes'], [])
+
+        appointment = Appointment(patient_id=self.patient_id, recorder_id=self.recorder_id,
+                                  scheduled_date=date.today(), start_time=time(9, 0))
+        db.session.add(appointment)
+        db.session.commit()
+        delta = self._changes(full['cursor'])
+        self.assertEqual([(c['entity'], c['id'], c['op']) for c in delta['changes']],
+                         [('appointments', appointment.id, 'upsert')])
+
+    def test_delete_produces_tombstone(self):
+        """测试删除预约后增量同步返回删除记录，墓碑超过保留期的游标返回410"""
+        appointment = Appointment(patient_id=self.patient_id, recorder_id=self.recorder_id,
+                                  scheduled_date=date.today(), start_time=time(9, 0))
+        db.session.add(appointment)
+        db.session.commit()
+        cursor = self._changes()['cursor']
+
+        response = self.client.delete(f'/api/v1/appointments/{appointment.id}', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(SyncTombstone.query.filter_by(entity='appointments').count(), 1)
+
+        delta = self._changes(cursor)
+        self.assertEqual([(c['entity'], c['id'], c['op']) for c in delta['changes']],
+                         [('appointments', appointment.id, 'delete')])
+
+        expired = encode_cursor(datetime.utcnow() - timedelta(days=365), 0, 0)
+        self.assertEqual(self._sync(expired).status_code, 410)
+        self.assertEqual(self._sync('not-a-cursor').status_code, 422)
+
+    def test_pagination_and_compression(self):
+        """测试分页游标不重复不遗漏，大响应按Accept-Encoding压缩"""
+        full = self._changes()['changes']
+        seen, cursor = [], None
+        while True:
+            page = self._changes(cursor, limit=2)
+            self.assertLessEqual(len(page['changes']), 2)
+            seen.extend(page['changes'])
+            cursor = page['cursor']
+            if not page['has_more']:
+                break
+        self.assertEqual([(c['entity'], c['id']) for c in seen], [(c['entity'], c['id']) for c in full])
+
+        response = self._sync(headers=dict(self.headers, **{'Accept-Encoding': 'gzip'}))
+        self.assertEqual(response.headers.get('Content-Encoding'), 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(response.data))['data']['changes'], full)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import os
+import json
+import tempfile
+import unittest
+from types import SimpleNamespace
+from app import create_app, db
+from app.models.user import User
+from app.utils.tracing import span, task_span, inject_task_headers
+from werkzeug.security import generate_password_hash
+from flask_jwt_extended import create_access_token
+
+class TracingTestCase(unittest.TestCase):
+    """调用链追踪测试用例"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.app = create_app('testing')
+        fd, self.trace_file = tempfile.mkstemp(suffix='.jsonl')
+        os.close(fd)
+        self.app.config['TRACE_EXPORT_FILE'] = self.trace_file
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.client = self.app.test_client()
+
+        db.create_all()
+
+        self.test_recorder = User(
+            username='tracerecorder',
+            phone='13800138096',
+            password_hash=generate_password_hash('testpassword'),
+            role='recorder',
+            name='测试记录员'
+        )
+        db.session.add(self.test_recorder)
+        db.session.commit()
+
+        self.access_token = create_access_token(identity=str(self.test_recorder.id))
+        self.auth_header = {'Authorization': f'Bearer {self.access_token}'}
+
+    def tearDown(self):
+        """测试后清理"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+        os.remove(self.trace_file)
+
+    def read_spans(self):
+        with open(self.trace_file, encoding='utf-8') as f:
+            return [json.loads(line)['span'] for line in f]
+
+    def test_request_spans_propagate_trace(self):
+        """测试请求、服务和SQL的span归属同一追踪"""
+        trace_id = '0af7651916cd43dd8448eb211c80319c'
+        headers = dict(self.auth_header, **{
+            'traceparent': f'00-{trace_id}-b7ad6b7169203331-01',
+            'X-Request-ID': 'req-123'
+        })
+        response = self.client.get('/api/v1/hospitals', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['X-Request-ID'], 'req-123')
+        self.assertTrue(response.headers['traceparent'].startswith(f'00-{trace_id}-'))
+
+        spans = self.read_spans()
+        self.assertTrue(all(s['traceId'] == trace_id for s in spans))
+        root = next(s for s in spans if s['kind'] == 'server')
+        self.assertEqual(root['parentSpanId'], 'b7ad6b7169203331')
+        service = next(s for s in spans if s['name'] == 'HospitalService.get_hospitals')
+        self.assertEqual(service['parentSpanId'], root['spanId'])
+        db_spans = [s for s in spans if s['name'] == 'db.query']
+        self.assertTrue(any(s['parentSpanId'] == service['spanId'] for s in db_spans))
+
+    def test_request_id_generated(self):
+        """测试未携带请求ID时自动生成"""
+        response = self.client.get('/api/v1/hospitals', headers=self.auth_header)
+        self.assertTrue(response.headers.get('X-Request-ID'))
+
+    def test_celery_task_continues_trace(self):
+        """测试Celery任务沿用发布方的追踪上下文"""
+        with self.app.test_request_context('/'):
+            self.app.preprocess_request()
+            headers = {}
+            with span('family.create'):
+                inject_task_headers(headers)
+            self.app.process_response(self.app.response_class())
+            self.app.do_teardown_request()
+
+        task = SimpleNamespace(
+            name='tasks.process_media',
+            request=SimpleNamespace(id='task-1', traceparent=headers['traceparent'], request_id=headers.get('request_id'))
+        )
+        with task_span(task):
+            db.session.execute(db.text('SELECT 1'))
+
+        spans = self.read_spans()
+        publisher = next(s for s in spans if s['name'] == 'family.create')
+        consumer = next(s for s in spans if s['name'] == 'celery.task tasks.process_media')
+        self.assertEqual(consumer['traceId'], publisher['traceId'])
+        self.assertEqual(consumer['parentSpanId'], publisher['spanId'])
+        self.assertTrue(any(s['name'] == 'db.query' and s['parentSpanId'] == consumer['spanId'] for s in spans))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import unittest
+from datetime import date
+from unittest import mock
+from flask_jwt_extended import create_access_token
+from app import create_app, db
+from app.models.user import User, Recorder
+from app.models.appointment import ServicePackage
+from app.models.health_record import HealthRecord
+from app.models.upload import UploadSession
+from app.services.family_service import FamilyService
+
+class UploadTestCase(unittest.TestCase):
+    """分片续传测试用例"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.app = create_app('testing')
+        self.upload_folder = tempfile.mkdtemp()
+        self.app.config['UPLOAD_FOLDER'] = self.upload_folder
+        self.client = self.app.test_client()
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        user = User(username='upload_recorder', phone='13800138087', role='recorder', name='上传记录员')
+        user.set_password('123456')
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(Recorder(id=user.id, user_id=user.id, employee_id='R0087'))
+        db.session.add(ServicePackage(name='基础保障型', price=100, duration_days=30, service_frequency=4, package_level=1))
+        db.session.commit()
+
+        family = FamilyService.create_family({
+            'householdHead': '周福生', 'address': '测试地址', 'phone': '13800138088',
+            'householdHeadAge': 80, 'householdHeadGender': '男', 'householdHeadPackageType': '基础保障型'
+        }, user.id)
+        self.patient_id = family.members[0].id
+        self.headers = {'Authorization': f'Bearer {create_access_token(identity=str(user.id))}'}
+        self.content = os.urandom(10000)
+
+    def tearDown(self):
+        """测试后清理"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+        shutil.rmtree(self.upload_folder, ignore_errors=True)
+
+    def _create(self, **overrides):
+        body = dict({'filename': 'visit.mp3', 'file_type': 'audio', 'size': len(self.content),
+                     'sha256': hashlib.sha256(self.content).hexdigest()}, **overrides)
+        response = self.client.post('/api/v1/uploads', headers=self.headers, json=body)
+        self.assertEqual(response.status_code, 201)
+        return json.loads(response.data)['data']
+
+    def _put(self, upload_id, start, end, chunk=None):
+        chunk = self.content[start:end + 1] if chunk is None else chunk
+        headers = dict(self.headers, **{
+            'Content-Range': f'bytes {start}-{end}/{len(self.content)}',
+            'X-Chunk-SHA256': hashlib.sha256(self.content[start:end + 1]).hexdigest()
+        })
+        return self.client.put(f'/api/v1/uploads/{upload_id}', headers=headers, data=chunk,
+                               content_type='application/octet-stream')
+
+    def _upload(self):
+        upload = self._create()
+        for start in range(0, len(self.content), 4096):
+            self.assertEqual(self._put(upload['id'], start, min(start + 4096, len(self.content)) - 1).status_code, 200)
+        response = self.client.post(f"/api/v1/uploads/{upload['id']}/complete", headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.data)['data']
+
+    def test_resume_after_interrupted_chunk(self):
+        """测试损坏或中断的分片被丢弃，客户端查询offset后继续上传"""
+        upload = self._create()
+        self.assertEqual(self._put(upload['id'], 0, 4095).status_code, 200)
+
+        # 传输中损坏的分片：校验失败，不计入offset
+        corrupted = self._put(upload['id'], 4096, 8191, chunk=b'\x00' * 4096)
+        self.assertEqual(corrupted.status_code, 422)
+        # 跳过了一段的分片：返回409和应继续的位置
+        skipped = self._put(upload['id'], 8192, len(self.content) - 1)
+        self.assertEqual(skipped.status_code, 409)
+        self.assertEqual(json.loads(skipped.data)['data']['offset'], 4096)
+
+        status = self.client.get(f"/api/v1/uploads/{upload['id']}", headers=self.headers)
+        self.assertEqual(status.headers['Upload-Offset'], '4096')
+        incomplete = self.client.post(f"/api/v1/uploads/{upload['id']}/complete", headers=self.headers)
+        self.assertEqual(incomplete.status_code, 422)
+
+        self.assertEqual(self._put(upload['id'], 4096, len(self.content) - 1).status_code, 200)
+        response = self.client.post(f"/api/v1/uploads/{upload['id']}/complete", headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        url = json.loads(response.data)['data']['url']
+        with open(os.path.join(self.upload_folder, *url[len('/static/uploads/'):].split('/')), 'rb') as f:
+            self.assertEqual(f.read(), self.content)
+
+    def test_attach_to_health_record(self):
+        """测试完成的上传可在创建健康记录时按id引用，且只能使用一次"""
+        upload = self._upload()
+        form = {'patient_id': str(self.patient_id), 'visit_date': date.today().isoformat(), 'visit_time': '10:00',
+                'audio_upload_id': upload['id']}
+
+        with mock.patch('app.services.media_service.MediaService.dispatch'):
+            response = self.client.post('/api/v1/health-records', headers=self.headers, data=form,
+                                        content_type='multipart/form-data')
+            self.assertEqual(response.status_code, 200)
+            record = db.session.get(HealthRecord, json.loads(response.data)['data']['record_id'])
+            self.assertEqual(record.audio_file, upload['url'])
+            self.assertEqual([m.kind for m in record.media], ['audio'])
+            self.assertEqual(db.session.get(UploadSession, upload['id']).status, 'attached')
+
+            again = self.client.post('/api/v1/health-records', headers=self.headers, data=form,
+                                     content_type='multipart/form-data')
+            self.assertEqual(again.status_code, 422)
+
+if __name__ == '__main__':
+    unittest.main()